@@ -1,215 +1,226 @@
 from crewai import Agent, Task, Crew, Process
-from crewai.tools import BaseTool
 from langchain.tools import tool
-from typing import Dict, List
+from typing import Any, Dict, List, Union
+import json
+import product_catalog
+from catalog_analytics import catalog_analytics
+from task_checkpoint import run_with_checkpoints, format_checkpoint_report
+from crew_tasks import ManagedTask
+from iteration_budget import iteration_budgets
+from context_assembler import format_context_report
+from completion_cache import install_completion_cache
+from llm_config import build_llm
+
+# Reuse completions from earlier runs and other processes (including batch workers)
+install_completion_cache()
+
+# Products covered when no scenario is given
+DEFAULT_PRODUCTS = ["iPhone", "Samsung Galaxy"]
+# Pipeline stages in task order, used to label per-stage timings
+STAGES = ["market_analysis", "product_analysis", "marketing_strategy", "business_recommendation"]
+# Prompt token budgets for the context handed to the downstream stages
+MARKETING_CONTEXT_BUDGET = 1200
+BUSINESS_CONTEXT_BUDGET = 1500
+
+def _join_products(products: List[str]) -> str:
+    """Render a product list as 'A, B and C' for task descriptions."""
+    if len(products) == 1:
+        return products[0]
+    return ", ".join(products[:-1]) + " and " + products[-1]
+
+# Tools take one product name or a list (also comma-separated or JSON) and look them all up in one call
+ProductsInput = Union[str, List[str]]
+
+
+def _lookup(fetch, products: ProductsInput) -> Any:
+    # crewai calls tool._run(**arguments), which skips pydantic validation, so parse here
+    return product_catalog.keyed_records([fetch(product) for product in product_catalog.parse_products(products)])
+
 
 # Define custom tools
 @tool("Fetch Product Data")
-def fetch_product_data(product: str) -> Dict:
-    """Fetch product pricing, availability, and rating for a given product name."""
-    if product.lower() == "iphone":
-        return {
-            "product": "iPhone",
-            "price": "$999",
-            "availability": "In Stock",
-            "rating": 4.8
-        }
-    elif product.lower() == "samsung galaxy":
-        return {
-            "product": "Samsung Galaxy",
-            "price": "$899",
-            "availability": "In Stock",
-            "rating": 4.6
-        }
-    return {
-        "product": product, 
-        "price": "$199", 
-        "availability": "Out of Stock",
-        "rating": 3.5
-    }
+def fetch_product_data(product: ProductsInput) -> Dict:
+    """Fetch product pricing, availability, and rating for one product name or a list of product names;
+    several products come back keyed by name."""
+    return _lookup(product_catalog.get_product_data, product)
 
 
 @tool("Fetch Market Trends")
-def fetch_market_trends(product: str) -> Dict:
-    """Fetch trend status and popularity metrics for the given product name."""
-    if product.lower() == "iphone":
-        return {
-            "product": "iPhone",
-            "trend": "Rising",
-            "popularity_score": 92,
-            "monthly_searches": 45000
-        }
-    elif product.lower() == "samsung galaxy":
-        return {
-            "product": "Samsung Galaxy",
-            "trend": "Stable",
-            "popularity_score": 85,
-            "monthly_searches": 38000
-        }
-    return {
-        "product": product,
-        "trend": "Stable",
-        "popularity_score": 70,
-        "monthly_searches": 12000
-    }
+def fetch_market_trends(product: ProductsInput) -> Dict:
+    """Fetch trend status and popularity metrics for one product name or a list of product names;
+    several products come back keyed by name."""
+    return _lookup(product_catalog.get_market_trends, product)
 
 
 @tool("Get Competitor Analysis")
-def get_competitor_analysis(product: str) -> Dict:
-    """Get competitive analysis data for a specific product."""
-    if product.lower() == "iphone":
-        return {
-            "product": "iPhone",
-            "main_competitors": ["Samsung Galaxy", "Google Pixel", "Xiaomi"],
-            "market_share": "23%",
-            "competitive_advantage": "Brand loyalty and ecosystem integration"
-        }
-    elif product.lower() == "samsung galaxy":
-        return {
-            "product": "Samsung Galaxy",
-            "main_competitors": ["iPhone", "Google Pixel", "OnePlus"],
-            "market_share": "19%",
-            "competitive_advantage": "Hardware innovation and display technology"
-        }
-    return {
-        "product": product,
-        "main_competitors": ["Various brands"],
-        "market_share": "5%",
-        "competitive_advantage": "Price point"
-    }
+def get_competitor_analysis(product: ProductsInput) -> Dict:
+    """Get competitive analysis data for one product name or a list of product names;
+    several products come back keyed by name."""
+    return _lookup(product_catalog.get_competitor_analysis, product)
+
+
+@tool("Market Analytics Summary")
+def market_analytics_summary(products: ProductsInput = "") -> Dict:
+    """Get precomputed popularity, search volume and market share metrics with ranks, percentiles,
+    share of search and pairwise differences for a list of product names (empty for all)."""
+    return catalog_analytics.summary(product_catalog.parse_products(products))
 
 
 @tool("Get Customer Feedback")
-def get_customer_feedback(product: str) -> Dict:
-    """Get summarized customer feedback for a specific product."""
-    if product.lower() == "iphone":
-        return {
-            "product": "iPhone",
-            "positive_points": ["Camera quality", "Performance", "Ecosystem"],
-            "negative_points": ["Battery life", "Price", "Charging speed"],
-            "common_issues": ["Screen durability", "Storage limitations"],
-            "satisfaction_score": 87
-        }
-    elif product.lower() == "samsung galaxy":
-        return {
-            "product": "Samsung Galaxy",
-            "positive_points": ["Display quality", "Customization", "Camera versatility"],
-            "negative_points": ["Software updates", "Bloatware"],
-            "common_issues": ["Battery degradation", "Overheating during gaming"],
-            "satisfaction_score": 83
-        }
-    return {
-        "product": product,
-        "positive_points": ["Affordable", "Basic functionality"],
-        "negative_points": ["Performance", "Build quality"],
-        "common_issues": ["Short lifespan", "Limited support"],
-        "satisfaction_score": 65
-    }
-
-
-# Define agents
-market_analyst = Agent(
-    role="Market Research Analyst",
-    goal="Analyze market trends and provide strategic insights",
-    backstory="""You are an experienced market analyst with expertise in 
-    consumer electronics. You provide detailed analysis of product performance 
-    and market trends to help guide business decisions.""",
-    verbose=True,
-    tools=[fetch_market_trends, get_competitor_analysis]
-)
-
-product_specialist = Agent(
-    role="Product Specialist",
-    goal="Analyze product specifications and consumer demand",
-    backstory="""You are a product specialist with deep knowledge of consumer 
-    electronics. Your expertise helps companies understand product details
-    and market positioning.""",
-    verbose=True,
-    tools=[fetch_product_data, get_customer_feedback]
-)
-
-marketing_strategist = Agent(
-    role="Marketing Strategist",
-    goal="Develop effective marketing strategies based on market and product data",
-    backstory="""You are a marketing expert who specializes in creating 
-    data-driven marketing strategies. You understand how to position products 
-    in competitive markets and highlight key selling points.""",
-    verbose=True,
-    tools=[get_competitor_analysis, get_customer_feedback]
-)
-
-business_advisor = Agent(
-    role="Business Strategy Advisor",
-    goal="Synthesize insights and provide actionable business recommendations",
-    backstory="""You are a seasoned business consultant who helps companies make 
-    strategic decisions. You excel at integrating various data points and analyses 
-    to form coherent business strategies.""",
-    verbose=True,
-    tools=[]  # This agent will rely on the outputs from other agents
-)
-
-# Define tasks
-market_analysis_task = Task(
-    description="""Analyze the smartphone market trends with a focus on iPhone and Samsung Galaxy.
-    Be sure to include:
-    1. Current trend status for both products
-    2. Popularity score interpretation
-    3. Monthly search volume comparison
-    4. Competitive landscape analysis
-    Your output will be used by the business advisor to form recommendations.
-    """,
-    agent=market_analyst
-)
-
-product_analysis_task = Task(
-    description="""Analyze the iPhone and Samsung Galaxy product details and customer feedback.
-    Focus on:
-    1. Price point comparison
-    2. Availability status
-    3. Customer rating and satisfaction scores
-    4. Key positive and negative feedback points
-    Compare these products and identify their strengths and weaknesses.
-    """,
-    agent=product_specialist
-)
-
-marketing_strategy_task = Task(
-    description="""Develop marketing strategy recommendations for a smartphone manufacturer
-    looking to compete with iPhone and Samsung Galaxy. Use competitor analysis and customer 
-    feedback to identify:
-    1. Key differentiators to emphasize
-    2. Target audience segments
-    3. Positioning strategy
-    4. Marketing message priorities
-    Your strategies should be data-driven and actionable.
-    """,
-    agent=marketing_strategist,
-    context=[market_analysis_task, product_analysis_task]
-)
-
-business_recommendation_task = Task(
-    description="""Based on the market analysis, product analysis, and marketing strategy,
-    develop comprehensive business recommendations for a smartphone manufacturer. Include:
-    1. Product development priorities
-    2. Market positioning strategy
-    3. Competitive strategy
-    4. Key investment areas
-    5. Risk assessment and mitigation strategies
-    Your recommendations should be specific, actionable, and backed by the data provided.
-    """,
-    agent=business_advisor,
-    context=[market_analysis_task, product_analysis_task, marketing_strategy_task]
-)
-
-# Create crew
-smartphone_market_crew = Crew(
-    agents=[market_analyst, product_specialist, marketing_strategist, business_advisor],
-    tasks=[market_analysis_task, product_analysis_task, marketing_strategy_task, business_recommendation_task],
-    verbose=2,
-    process=Process.sequential
-)
+def get_customer_feedback(product: ProductsInput) -> Dict:
+    """Get summarized customer feedback for one product name or a list of product names;
+    several products come back keyed by name."""
+    return _lookup(product_catalog.get_customer_feedback, product)
+
+
+# Define agents and tasks for a scenario
+def create_market_crew(products: List[str] = DEFAULT_PRODUCTS, task_callback=None, verbose: bool = True,
+                       llm=None) -> Crew:
+    """Create the four-agent market, product, marketing and business crew for the given products."""
+    focus = _join_products(products)
+    # One chat model shared by the agents (LLM_PROVIDER=stub runs offline)
+    llm = llm or build_llm()
+    market_analyst = Agent(
+        role="Market Research Analyst",
+        goal="Analyze market trends and provide strategic insights",
+        backstory="""You are an experienced market analyst with expertise in 
+        consumer electronics. You provide detailed analysis of product performance 
+        and market trends to help guide business decisions.""",
+        verbose=verbose,
+        llm=llm,
+        # One summary call covers every product; the per-product tools remain for details
+        tools=[market_analytics_summary, fetch_market_trends, get_competitor_analysis]
+    )
+
+    product_specialist = Agent(
+        role="Product Specialist",
+        goal="Analyze product specifications and consumer demand",
+        backstory="""You are a product specialist with deep knowledge of consumer 
+        electronics. Your expertise helps companies understand product details
+        and market positioning.""",
+        verbose=verbose,
+        llm=llm,
+        tools=[fetch_product_data, get_customer_feedback]
+    )
+
+    marketing_strategist = Agent(
+        role="Marketing Strategist",
+        goal="Develop effective marketing strategies based on market and product data",
+        backstory="""You are a marketing expert who specializes in creating 
+        data-driven marketing strategies. You understand how to position products 
+        in competitive markets and highlight key selling points.""",
+        verbose=verbose,
+        llm=llm,
+        tools=[get_competitor_analysis, get_customer_feedback]
+    )
+
+    business_advisor = Agent(
+        role="Business Strategy Advisor",
+        goal="Synthesize insights and provide actionable business recommendations",
+        backstory="""You are a seasoned business consultant who helps companies make 
+        strategic decisions. You excel at integrating various data points and analyses 
+        to form coherent business strategies.""",
+        verbose=verbose,
+        llm=llm,
+        tools=[]  # This agent will rely on the outputs from other agents
+    )
+
+    # Define tasks
+    market_analysis_task = ManagedTask(
+        description=f"""Analyze the smartphone market trends with a focus on {focus}.
+        Be sure to include:
+        1. Current trend status for each product
+        2. Popularity score interpretation
+        3. Monthly search volume comparison
+        4. Competitive landscape analysis
+        Start with a single Market Analytics Summary call for "{', '.join(products)}"; it already
+        ranks and compares the products, so only use the per-product tools for anything it lacks.
+        Your output will be used by the business advisor to form recommendations.
+        """,
+        expected_output=f"""A market trend analysis of {focus} covering trend status, popularity scores,
+        monthly search volumes and the competitive landscape.""",
+        agent=market_analyst,
+        callback=task_callback
+    )
+
+    product_analysis_task = ManagedTask(
+        description=f"""Analyze the {focus} product details and customer feedback.
+        Focus on:
+        1. Price point comparison
+        2. Availability status
+        3. Customer rating and satisfaction scores
+        4. Key positive and negative feedback points
+        Compare these products and identify their strengths and weaknesses.
+        Each tool accepts a list of products, so look up all of them in one call per tool.
+        """,
+        expected_output=f"""A product comparison of {focus} covering price, availability, ratings, satisfaction
+        scores and key customer feedback, with each product's strengths and weaknesses.""",
+        agent=product_specialist,
+        callback=task_callback
+    )
+
+    marketing_strategy_task = ManagedTask(
+        description=f"""Develop marketing strategy recommendations for a smartphone manufacturer
+        looking to compete with {focus}. Use competitor analysis and customer 
+        feedback to identify:
+        1. Key differentiators to emphasize
+        2. Target audience segments
+        3. Positioning strategy
+        4. Marketing message priorities
+        Your strategies should be data-driven and actionable.
+        Each tool accepts a list of products, so look up all of them in one call per tool.
+        """,
+        expected_output="""Marketing strategy recommendations listing key differentiators, target audience
+        segments, positioning and message priorities, each tied to the data.""",
+        agent=marketing_strategist,
+        context=[market_analysis_task, product_analysis_task],
+        context_token_budget=MARKETING_CONTEXT_BUDGET,
+        callback=task_callback
+    )
+
+    business_recommendation_task = ManagedTask(
+        description="""Based on the market analysis, product analysis, and marketing strategy,
+        develop comprehensive business recommendations for a smartphone manufacturer. Include:
+        1. Product development priorities
+        2. Market positioning strategy
+        3. Competitive strategy
+        4. Key investment areas
+        5. Risk assessment and mitigation strategies
+        Your recommendations should be specific, actionable, and backed by the data provided.
+        """,
+        expected_output="""Business recommendations covering product development priorities, market positioning,
+        competitive strategy, key investment areas and risks with their mitigations.""",
+        agent=business_advisor,
+        context=[market_analysis_task, product_analysis_task, marketing_strategy_task],
+        context_token_budget=BUSINESS_CONTEXT_BUDGET,
+        callback=task_callback
+    )
+
+    # Create crew
+    return Crew(
+        agents=[market_analyst, product_specialist, marketing_strategist, business_advisor],
+        tasks=[market_analysis_task, product_analysis_task, marketing_strategy_task, business_recommendation_task],
+        verbose=2 if verbose else False,
+        process=Process.sequential,
+        # kickoff() replaces every task's callback with the crew's
+        task_callback=task_callback
+    )
+
+
+# Default scenario used when running this script directly
+smartphone_market_crew = create_market_crew(DEFAULT_PRODUCTS)
+market_analysis_task, product_analysis_task, marketing_strategy_task, business_recommendation_task = smartphone_market_crew.tasks
 
 # Execute crew
-result = smartphone_market_crew.kickoff()
-print("\n==== Advanced CrewAI POC Results ====\n")
-print(result) 
\ No newline at end of file
+if __name__ == "__main__":
+    # Unchanged stages are served from the task store, so a failed run only repeats what is left
+    result, checkpoint_report = run_with_checkpoints(smartphone_market_crew)
+    print("\n==== Advanced CrewAI POC Results ====\n")
+    print(result)
+    print("\n==== Task Checkpoints ====\n")
+    print(format_checkpoint_report(checkpoint_report))
+    print("\n==== Context Prompt Tokens ====\n")
+    print(format_context_report())
+    if iteration_budgets:
+        print("\n==== Iteration Budgets ====\n")
+        print(json.dumps(iteration_budgets.snapshot(), indent=2))
@@ -0,0 +1,244 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import deque
+import argparse
+import json
+import os
+import threading
+import time
+
+import product_catalog
+from percentiles import percentile
+
+# Catalog datasets each chatbot query type's response is built from
+QUERY_DATASETS = {
+    "price": ("product_data",),
+    "availability": ("product_data",),
+    "rating": ("product_data",),
+    "market": ("market_trends",),
+    "comprehensive": ("product_data", "market_trends")
+}
+QUERY_TYPES = tuple(QUERY_DATASETS)
+DEFAULT_HOT_PRODUCTS = ["iPhone", "Samsung Galaxy", "Google Pixel"]
+
+
+class _Entry:
+    __slots__ = ("response", "refreshed_at", "version", "refresh_seconds")
+
+    def __init__(self, response: Any, refreshed_at: float, version: int, refresh_seconds: float):
+        self.response = response
+        self.refreshed_at = refreshed_at
+        self.version = version
+        self.refresh_seconds = refresh_seconds
+
+
+class AnswerMaterializer:
+    """Keeps full chatbot responses for hot (product, query type) pairs precomputed in the background.
+
+    A refresher thread regenerates each pair every ``refresh_seconds``, and at once when one of
+    the catalog records it is built from changes. ``get`` only serves a response younger than
+    ``max_staleness_seconds`` (timed from when its refresh started) and built after the latest
+    change to its source data; otherwise the caller generates it live. Refreshes run one at a
+    time, and their cost is tracked apart from the latency of serving materialized responses.
+    """
+
+    def __init__(self, generate: Callable[[str, str], Any], products: Optional[List[str]] = None,
+                 query_types: Optional[List[str]] = None, refresh_seconds: float = 300.0,
+                 max_staleness_seconds: float = 600.0, retry_seconds: float = 30.0, history: int = 1000):
+        self.generate = generate
+        self.products = [product_catalog.display_name(product_catalog.canonical_key(product))
+                         for product in products or DEFAULT_HOT_PRODUCTS]
+        self.query_types = list(query_types or QUERY_TYPES)
+        self.refresh_seconds = refresh_seconds
+        self.max_staleness_seconds = max_staleness_seconds
+        self.retry_seconds = retry_seconds
+        self._hot = [(product_catalog.canonical_key(product), query_type)
+                     for product in self.products for query_type in self.query_types]
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], _Entry] = {}
+        # Bumped on every change to a product's source data; entries built from older data are not served
+        self._versions: Dict[Tuple[str, str], int] = {}
+        self._not_before: Dict[Tuple[str, str], float] = {}
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.changes = 0
+        self._refresh_times: deque = deque(maxlen=history)
+        self.hits = 0
+        self.misses: Dict[str, int] = {"not_hot": 0, "missing": 0, "stale": 0, "changed": 0}
+        self._serve_times: deque = deque(maxlen=history)
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        product_catalog.subscribe(self._on_change)
+        self._refresher = threading.Thread(target=self._refresh_loop, name="answer-materializer", daemon=True)
+        self._refresher.start()
+
+    @classmethod
+    def from_env(cls, generate: Callable[[str, str], Any]) -> Optional["AnswerMaterializer"]:
+        """Materializer configured by ``MATERIALIZER_*`` variables, or None unless ``MATERIALIZER=on``."""
+        if os.getenv("MATERIALIZER", "off").lower() not in ("1", "on", "true", "yes"):
+            return None
+        products = os.getenv("MATERIALIZER_PRODUCTS")
+        query_types = os.getenv("MATERIALIZER_QUERY_TYPES")
+        return cls(
+            generate,
+            products=[name.strip() for name in products.split(",") if name.strip()] if products else None,
+            query_types=[name.strip() for name in query_types.split(",") if name.strip()] if query_types else None,
+            refresh_seconds=float(os.getenv("MATERIALIZER_REFRESH_SECONDS", "300")),
+            max_staleness_seconds=float(os.getenv("MATERIALIZER_MAX_STALENESS_SECONDS", "600"))
+        )
+
+    def _on_change(self, dataset: str, key: str):
+        with self._lock:
+            changed = [entry_key for entry_key in self._hot
+                       if entry_key[0] == key and dataset in QUERY_DATASETS[entry_key[1]]]
+            for entry_key in changed:
+                self._versions[entry_key] = self._versions.get(entry_key, 0) + 1
+                self._not_before.pop(entry_key, None)
+            self.changes += len(changed)
+        if changed:
+            self._wake.set()
+
+    def get(self, product: str, query_type: str) -> Optional[Any]:
+        """The materialized response, or None when it is not hot, not built yet, too old or outdated."""
+        start = time.perf_counter()
+        key = (product_catalog.canonical_key(product), query_type)
+        with self._lock:
+            entry = self._entries.get(key)
+            if key not in self._hot:
+                reason = "not_hot"
+            elif entry is None:
+                reason = "missing"
+            elif entry.version != self._versions.get(key, 0):
+                reason = "changed"
+            elif time.monotonic() - entry.refreshed_at > self.max_staleness_seconds:
+                reason = "stale"
+            else:
+                reason = None
+            if reason:
+                self.misses[reason] += 1
+                return None
+            self.hits += 1
+            self._serve_times.append(time.perf_counter() - start)
+            return entry.response
+
+    def _due(self) -> Tuple[List[Tuple[str, str]], float]:
+        """Pairs to refresh now (missing or changed first, then oldest), and seconds until the next one is due."""
+        now = time.monotonic()
+        due, wait = [], self.refresh_seconds
+        with self._lock:
+            for key in self._hot:
+                entry = self._entries.get(key)
+                not_before = self._not_before.get(key, 0.0)
+                if entry is None or entry.version != self._versions.get(key, 0):
+                    next_at, age = not_before, float("inf")
+                else:
+                    next_at, age = max(entry.refreshed_at + self.refresh_seconds, not_before), now - entry.refreshed_at
+                if next_at <= now:
+                    due.append((age, key))
+                else:
+                    wait = min(wait, next_at - now)
+        return [key for _, key in sorted(due, key=lambda item: -item[0])], wait
+
+    def refresh(self, product: str, query_type: str) -> bool:
+        """Regenerate one pair's response now; False when generation failed."""
+        key = (product_catalog.canonical_key(product), query_type)
+        with self._lock:
+            version = self._versions.get(key, 0)
+        started = time.monotonic()
+        start = time.perf_counter()
+        try:
+            response = self.generate(product_catalog.display_name(key[0]), query_type)
+        except Exception as e:
+            print(f"Materializing {product} ({query_type}) failed: {e}")
+            with self._lock:
+                self.refresh_failures += 1
+                self._not_before[key] = time.monotonic() + self.retry_seconds
+            return False
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._entries[key] = _Entry(response, started, version, elapsed)
+            self._not_before.pop(key, None)
+            self.refreshes += 1
+            self._refresh_times.append(elapsed)
+        return True
+
+    def _refresh_loop(self):
+        while not self._stopped.is_set():
+            due, wait = self._due()
+            for key, query_type in due:
+                if self._stopped.is_set():
+                    return
+                self.refresh(product_catalog.display_name(key), query_type)
+            if not due:
+                self._wake.wait(wait)
+                self._wake.clear()
+
+    def close(self, timeout: float = 5.0):
+        """Stop the refresher after its current refresh."""
+        self._stopped.set()
+        self._wake.set()
+        self._refresher.join(timeout)
+
+    def snapshot(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            entries = {}
+            for key in self._hot:
+                entry = self._entries.get(key)
+                label = f"{product_catalog.display_name(key[0])} / {key[1]}"
+                if entry is None:
+                    entries[label] = {"materialized": False}
+                    continue
+                age = now - entry.refreshed_at
+                entries[label] = {
+                    "materialized": True,
+                    "age_seconds": round(age, 1),
+                    "servable": entry.version == self._versions.get(key, 0) and age <= self.max_staleness_seconds,
+                    "last_refresh_seconds": round(entry.refresh_seconds, 3)
+                }
+            refresh_times = sorted(self._refresh_times)
+            serve_times = sorted(self._serve_times)
+            lookups = self.hits + sum(self.misses.values())
+            return {
+                "settings": {"products": self.products, "query_types": self.query_types,
+                             "refresh_seconds": self.refresh_seconds,
+                             "max_staleness_seconds": self.max_staleness_seconds},
+                "entries": entries,
+                "refresh": {
+                    "count": self.refreshes,
+                    "failures": self.refresh_failures,
+                    "source_changes": self.changes,
+                    "total_seconds": round(sum(refresh_times), 3),
+                    "seconds_p50": round(percentile(refresh_times, 0.5), 3) if refresh_times else None,
+                    "seconds_p95": round(percentile(refresh_times, 0.95), 3) if refresh_times else None
+                },
+                "serving": {
+                    "hits": self.hits,
+                    "misses": dict(self.misses),
+                    "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                    "ms_p50": round(percentile(serve_times, 0.5) * 1000, 3) if serve_times else None,
+                    "ms_p95": round(percentile(serve_times, 0.95) * 1000, 3) if serve_times else None
+                }
+            }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Materialize hot chatbot answers once and compare refresh and serving cost.")
+    parser.add_argument("--products", nargs="+", default=DEFAULT_HOT_PRODUCTS)
+    parser.add_argument("--query-types", nargs="+", choices=QUERY_TYPES, default=list(QUERY_TYPES))
+    parser.add_argument("--lookups", type=int, default=1000, help="Materialized lookups to time after the refresh")
+    args = parser.parse_args()
+
+    # Offline by default: the chatbot's crews run on the stub LLM
+    os.environ.setdefault("LLM_PROVIDER", "stub")
+    os.environ["MATERIALIZER"] = "off"
+    from chatbot_app import materialized_product_response
+
+    materializer = AnswerMaterializer(materialized_product_response, products=args.products,
+                                      query_types=args.query_types, refresh_seconds=3600)
+    # The refresher thread materializes every pair once; wait for it
+    while materializer.refreshes + materializer.refresh_failures < len(args.products) * len(args.query_types):
+        time.sleep(0.1)
+    for index in range(args.lookups):
+        materializer.get(args.products[index % len(args.products)], args.query_types[index % len(args.query_types)])
+    materializer.close()
+    print(json.dumps(materializer.snapshot(), indent=2))
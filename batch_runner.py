@@ -0,0 +1,186 @@
+from typing import Dict, Iterator, List, Set
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import argparse
+import csv
+import hashlib
+import json
+import os
+import statistics
+import time
+import traceback
+
+from percentiles import percentile
+
+# Loaded once per worker process by _init_worker; a failed import is reported by every scenario
+_advanced_crew_poc = None
+_import_error = None
+
+
+def _split_products(value) -> List[str]:
+    """Accept a list or a ';'/','-separated string of product names."""
+    if isinstance(value, list):
+        return [str(product).strip() for product in value if str(product).strip()]
+    separator = ";" if ";" in value else ","
+    return [product.strip() for product in value.split(separator) if product.strip()]
+
+
+def _scenario_id(products: List[str]) -> str:
+    """Derive a stable id for scenarios that do not carry one."""
+    return hashlib.sha1("|".join(products).lower().encode("utf-8")).hexdigest()[:12]
+
+
+def read_scenarios(path: str) -> Iterator[Dict]:
+    """Yield scenarios ({'id', 'products'}) from a CSV or JSONL file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            products = _split_products(row.get("products") or row.get("product") or "")
+            if not products:
+                continue
+            yield {"id": str(row.get("id") or _scenario_id(products)), "products": products}
+
+
+def load_checkpoint(output_path: str) -> Set[str]:
+    """Return the ids already completed in the output file, repairing a torn last line."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    good_bytes = 0
+    with open(output_path, "rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if not line.endswith(b"\n"):
+                break
+            good_bytes += len(line)
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    # A crash mid-write leaves a partial record behind; drop it before appending
+    if good_bytes != os.path.getsize(output_path):
+        with open(output_path, "rb+") as f:
+            f.truncate(good_bytes)
+    return done
+
+
+def _init_worker():
+    """Import crewai and the crew definitions once per worker process."""
+    global _advanced_crew_poc, _import_error
+    try:
+        import advanced_crew_poc
+    except Exception as e:
+        # Raising here would break the whole pool; the scenarios record the error instead
+        _import_error = (f"{type(e).__name__}: {e}", traceback.format_exc())
+        return
+    _advanced_crew_poc = advanced_crew_poc
+
+
+def _error_record(scenario: Dict, error: str, trace: str) -> Dict:
+    return {"id": scenario["id"], "products": scenario["products"], "pid": os.getpid(), "status": "error",
+            "error": error, "traceback": trace, "stage_seconds": {}, "total_seconds": 0.0}
+
+
+def run_scenario(scenario: Dict) -> Dict:
+    """Run the four-stage crew for one scenario and time each stage."""
+    if _advanced_crew_poc is None:
+        error, trace = _import_error or ("RuntimeError: crew definitions were not loaded", "")
+        return _error_record(scenario, error, trace)
+    marks = [time.perf_counter()]
+
+    def stage_done(output):
+        marks.append(time.perf_counter())
+
+    record = {"id": scenario["id"], "products": scenario["products"], "pid": os.getpid()}
+    try:
+        crew = _advanced_crew_poc.create_market_crew(scenario["products"], task_callback=stage_done, verbose=False)
+        result = crew.kickoff()
+        record.update(status="ok", result=str(result))
+    except Exception as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+    record["stage_seconds"] = {
+        stage: round(end - start, 3)
+        for stage, start, end in zip(_advanced_crew_poc.STAGES, marks, marks[1:])
+    }
+    record["total_seconds"] = round(time.perf_counter() - marks[0], 3)
+    return record
+
+
+def summarize(records: List[Dict], elapsed: float) -> Dict:
+    """Compute throughput and per-stage latency for the records produced by this run."""
+    ok = [record for record in records if record["status"] == "ok"]
+    stages = {}
+    for record in ok:
+        for stage, seconds in record["stage_seconds"].items():
+            stages.setdefault(stage, []).append(seconds)
+    return {
+        "completed": len(ok),
+        "failed": len(records) - len(ok),
+        "elapsed_seconds": round(elapsed, 3),
+        "scenarios_per_minute": round(len(ok) / elapsed * 60, 2) if elapsed else 0.0,
+        "stage_latency_seconds": {
+            stage: {
+                "mean": round(statistics.mean(values), 3),
+                "p50": round(percentile(sorted(values), 0.50), 3),
+                "p95": round(percentile(sorted(values), 0.95), 3),
+                "max": round(max(values), 3)
+            }
+            for stage, values in stages.items()
+        }
+    }
+
+
+def run_batch(input_path: str, output_path: str, workers: int) -> Dict:
+    """Run every pending scenario on a process pool, streaming results to JSONL as they finish."""
+    done = load_checkpoint(output_path)
+    pending = [scenario for scenario in read_scenarios(input_path) if scenario["id"] not in done]
+    print(f"{len(done)} scenarios already completed, {len(pending)} to run on {workers} workers")
+
+    records = []
+    start = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        queue = iter(pending)
+        in_flight = set()
+        scenarios = {}
+        while True:
+            # Keep a bounded window of submissions so huge inputs are not materialized as futures
+            for scenario in queue:
+                future = pool.submit(run_scenario, scenario)
+                scenarios[future] = scenario
+                in_flight.add(future)
+                if len(in_flight) >= workers * 2:
+                    break
+            if not in_flight:
+                break
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                scenario = scenarios.pop(future)
+                try:
+                    record = future.result()
+                except Exception as e:
+                    # e.g. a worker that died mid-scenario; the scenario is retried on resume
+                    record = _error_record(scenario, f"{type(e).__name__}: {e}", traceback.format_exc())
+                records.append(record)
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                os.fsync(out.fileno())
+                print(f"[{len(done) + len(records)}/{len(done) + len(pending)}] {record['id']} "
+                      f"{record['status']} in {record['total_seconds']}s")
+
+    return summarize(records, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the advanced market crew for many product scenarios.")
+    parser.add_argument("input", help="CSV (id,products) or JSONL ({'id', 'products'}) scenario file")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL results file, also used to resume")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    args = parser.parse_args()
+
+    report = run_batch(args.input, args.output, args.workers)
+    print("\n==== Batch Report ====\n")
+    print(json.dumps(report, indent=2))
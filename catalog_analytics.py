@@ -0,0 +1,172 @@
+from typing import Dict, List, Optional
+import argparse
+import json
+import re
+import threading
+
+import numpy as np
+
+import product_catalog
+
+# Numeric columns, by the dataset and field they come from
+COLUMNS = {
+    "popularity_score": ("market_trends", "popularity_score"),
+    "monthly_searches": ("market_trends", "monthly_searches"),
+    "market_share": ("competitor_analysis", "market_share"),
+    "price": ("product_data", "price"),
+    "rating": ("product_data", "rating"),
+    "satisfaction_score": ("customer_feedback", "satisfaction_score")
+}
+# Columns compared pairwise between the requested products
+DELTA_COLUMNS = ("popularity_score", "monthly_searches", "market_share", "price")
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def _number(value) -> float:
+    """Parse 92, 4.8, "23%" or "$999" into a float; NaN when there is no number."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    match = _NUMBER.search(str(value).replace(",", "")) if value is not None else None
+    return float(match.group()) if match else float("nan")
+
+
+def _rounded(value: float, digits: int = 2) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+class CatalogAnalytics:
+    """Column-oriented view of the catalog with derived market statistics.
+
+    Each metric is a float array with one row per product (NaN where a dataset has no record).
+    Catalog changes rewrite the affected cell and mark the statistics stale; ranks, percentiles
+    and share of search are recomputed for all products in one vectorized pass on the next read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+        # Storage grows by doubling; ``columns`` holds views of the filled rows
+        self._storage = {name: np.full(16, np.nan) for name in COLUMNS}
+        self.columns = {name: storage[:0] for name, storage in self._storage.items()}
+        self._stats: Optional[Dict[str, np.ndarray]] = None
+        self.rebuilds = 0
+        self.refreshes = 0
+        keys = []
+        for db in product_catalog.DATASETS.values():
+            keys += [key for key in db if key not in keys]
+        for key in keys:
+            self._ensure_row(key)
+        for dataset in product_catalog.DATASETS:
+            for key in keys:
+                self._load(dataset, key)
+        self._derived()
+        product_catalog.subscribe(self._on_change)
+
+    def _ensure_row(self, key: str) -> int:
+        if key not in self._rows:
+            self._rows[key] = len(self.keys)
+            self.keys.append(key)
+            size = len(self.keys)
+            for name, storage in self._storage.items():
+                if size > len(storage):
+                    storage = self._storage[name] = np.concatenate([storage, np.full(len(storage), np.nan)])
+                self.columns[name] = storage[:size]
+        return self._rows[key]
+
+    def _load(self, dataset: str, key: str):
+        record = product_catalog.DATASETS[dataset].get(key)
+        row = self._rows[key]
+        for name, (source, field) in COLUMNS.items():
+            if source == dataset:
+                self.columns[name][row] = _number(record.get(field)) if record else np.nan
+
+    def _on_change(self, dataset: str, key: str):
+        with self._lock:
+            self._ensure_row(key)
+            self._load(dataset, key)
+            self._stats = None
+            self.refreshes += 1
+
+    def _derived(self) -> Dict[str, np.ndarray]:
+        if self._stats is not None:
+            return self._stats
+        stats = {}
+        for name, column in self.columns.items():
+            present = ~np.isnan(column)
+            ordered = np.sort(column[present])
+            # Rank 1 is the highest value; products without the metric get no rank
+            order = np.argsort(-np.where(present, column, -np.inf), kind="stable")
+            rank = np.empty(len(column))
+            rank[order] = np.arange(1, len(column) + 1)
+            stats[f"{name}_rank"] = np.where(present, rank, np.nan)
+            # Percentile: share of products with a value at or below this one
+            below = np.searchsorted(ordered, np.where(present, column, 0.0), side="right")
+            stats[f"{name}_percentile"] = np.where(present, 100.0 * below / max(len(ordered), 1), np.nan)
+        searches = self.columns["monthly_searches"]
+        stats["share_of_search"] = 100.0 * searches / np.nansum(searches) if np.nansum(searches) else searches * np.nan
+        self._stats = stats
+        self.rebuilds += 1
+        return stats
+
+    def _select(self, products: Optional[List[str]]) -> List[int]:
+        if not products:
+            return list(range(len(self.keys)))
+        rows = []
+        for product in products:
+            row = self._rows.get(product_catalog.canonical_key(product))
+            if row is not None and row not in rows:
+                rows.append(row)
+        return rows
+
+    def summary(self, products: Optional[List[str]] = None) -> Dict:
+        """Metrics, ranks, percentiles, leaders and pairwise deltas for the given products (all by default)."""
+        with self._lock:
+            stats = self._derived()
+            rows = self._select(products)
+            idx = np.array(rows, dtype=int)
+            names = [product_catalog.display_name(self.keys[row]) for row in rows]
+            unknown = [product for product in products or []
+                       if product_catalog.canonical_key(product) not in self._rows]
+            report = {"products": {}, "leaders": {}, "pairwise_deltas": {}, "catalog_size": len(self.keys)}
+            for position, row in enumerate(rows):
+                key = self.keys[row]
+                entry = {"trend": product_catalog.TRENDS_DB.get(key, {}).get("trend")}
+                for name, column in self.columns.items():
+                    entry[name] = _rounded(column[row])
+                    entry[f"{name}_rank"] = _rounded(stats[f"{name}_rank"][row], 0)
+                    entry[f"{name}_percentile"] = _rounded(stats[f"{name}_percentile"][row], 1)
+                entry["share_of_search"] = _rounded(stats["share_of_search"][row], 1)
+                report["products"][names[position]] = entry
+            if rows:
+                for name, column in self.columns.items():
+                    values = column[idx]
+                    if not np.all(np.isnan(values)):
+                        report["leaders"][name] = names[int(np.nanargmax(values))]
+                for name in DELTA_COLUMNS:
+                    values = self.columns[name][idx]
+                    # deltas[i, j] = value of product i minus value of product j
+                    deltas = values[:, None] - values[None, :]
+                    report["pairwise_deltas"][name] = {
+                        f"{names[i]} vs {names[j]}": _rounded(deltas[i, j])
+                        for i in range(len(rows)) for j in range(i + 1, len(rows))
+                    }
+            if unknown:
+                report["unknown_products"] = unknown
+            return report
+
+    def snapshot(self) -> Dict:
+        return {"products": len(self.keys), "refreshes": self.refreshes, "rebuilds": self.rebuilds,
+                "stale": self._stats is None}
+
+
+# Shared by the tools; kept current through product_catalog.subscribe
+catalog_analytics = CatalogAnalytics()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the precomputed catalog analytics summary.")
+    parser.add_argument("products", nargs="*", help="Products to include (default: the whole catalog)")
+    args = parser.parse_args()
+    print(json.dumps(catalog_analytics.summary(args.products), indent=2))
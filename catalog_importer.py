@@ -0,0 +1,289 @@
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import re
+import sys
+import time
+
+import product_catalog
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+# Availability phrasings in supplier feeds, mapped to the catalog's wording
+AVAILABILITY = {
+    "in stock": "In Stock", "instock": "In Stock", "available": "In Stock", "yes": "In Stock",
+    "limited stock": "Limited Stock", "limited": "Limited Stock", "low stock": "Limited Stock",
+    "few left": "Limited Stock",
+    "out of stock": "Out of Stock", "outofstock": "Out of Stock", "sold out": "Out of Stock",
+    "unavailable": "Out of Stock", "no": "Out of Stock", "backorder": "Out of Stock"
+}
+TRENDS = {
+    "rising": "Rising", "up": "Rising", "growing": "Rising",
+    "stable": "Stable", "flat": "Stable", "steady": "Stable",
+    "declining": "Declining", "down": "Declining", "falling": "Declining"
+}
+
+
+class InvalidRow(ValueError):
+    """Raised for a feed row that cannot be normalized into a catalog record."""
+
+
+def _number(value: Any, field: str) -> float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    match = _NUMBER.search(str(value).replace(",", ""))
+    if not match:
+        raise InvalidRow(f"{field} {value!r} is not a number")
+    return float(match.group())
+
+
+def _bounded(value: Any, field: str, low: float, high: float) -> float:
+    number = _number(value, field)
+    if not low <= number <= high:
+        raise InvalidRow(f"{field} {value!r} is outside {low:g}-{high:g}")
+    return number
+
+
+def _price(value: Any) -> str:
+    amount = _bounded(value, "price", 0, 1_000_000)
+    return f"${amount:,.2f}".replace(".00", "")
+
+
+def _availability(value: Any) -> str:
+    text = " ".join(str(value).lower().replace("_", " ").split())
+    if text not in AVAILABILITY:
+        raise InvalidRow(f"availability {value!r} is not a known status")
+    return AVAILABILITY[text]
+
+
+def _rating(value: Any) -> float:
+    text = str(value)
+    # "96%" is a rating out of 100; "4.8/5" and "4.8 out of 5" are out of 5
+    if text.strip().endswith("%"):
+        return round(_bounded(text, "rating", 0, 100) / 20, 1)
+    return round(_bounded(text, "rating", 0, 5), 1)
+
+
+def _trend(value: Any) -> str:
+    text = str(value).strip().lower()
+    if text not in TRENDS:
+        raise InvalidRow(f"trend {value!r} is not Rising, Stable or Declining")
+    return TRENDS[text]
+
+
+def _score(field: str) -> Callable[[Any], int]:
+    return lambda value: int(round(_bounded(value, field, 0, 100)))
+
+
+def _count(value: Any) -> int:
+    return int(_bounded(value, "monthly_searches", 0, 1e12))
+
+
+def _share(value: Any) -> str:
+    return f"{_bounded(value, 'market_share', 0, 100):g}%"
+
+
+def _names(value: Any) -> List[str]:
+    """A JSON list, or a ';' or '|' separated string of names."""
+    if isinstance(value, str):
+        text = value.strip()
+        if text.startswith("["):
+            try:
+                value = json.loads(text)
+            except ValueError:
+                raise InvalidRow(f"list {value!r} is not valid JSON")
+        else:
+            value = re.split(r"[;|]", text)
+    if not isinstance(value, list):
+        raise InvalidRow(f"{value!r} is not a list")
+    return [str(name).strip() for name in value if str(name).strip()]
+
+
+def _text(value: Any) -> str:
+    return str(value).strip()
+
+
+# Normalizer for every field a dataset accepts; other columns are ignored
+FIELDS: Dict[str, Dict[str, Callable[[Any], Any]]] = {
+    "product_data": {"price": _price, "availability": _availability, "rating": _rating},
+    "market_trends": {"trend": _trend, "popularity_score": _score("popularity_score"),
+                      "monthly_searches": _count},
+    "competitor_analysis": {"main_competitors": _names, "market_share": _share,
+                            "competitive_advantage": _text},
+    "customer_feedback": {"positive_points": _names, "negative_points": _names, "common_issues": _names,
+                          "satisfaction_score": _score("satisfaction_score")}
+}
+
+
+def normalize_row(row: Dict, dataset: Optional[str] = None) -> Tuple[str, str, Dict]:
+    """Return ``(dataset, product, fields)`` for a feed row, or raise InvalidRow.
+
+    Empty cells are skipped, so a row may update only some of a record's fields.
+    """
+    if not isinstance(row, dict):
+        raise InvalidRow(f"row {row!r} is not an object")
+    dataset = dataset or row.get("dataset")
+    if dataset not in FIELDS:
+        raise InvalidRow(f"unknown dataset {dataset!r}")
+    product = str(row.get("product") or "").strip()
+    if not product:
+        raise InvalidRow("missing product")
+    fields = {field: normalize(row[field]) for field, normalize in FIELDS[dataset].items()
+              if row.get(field) not in (None, "")}
+    if not fields:
+        raise InvalidRow(f"no {dataset} fields")
+    return dataset, product, fields
+
+
+def read_rows(path: str, fmt: Optional[str] = None) -> Iterator[Dict]:
+    """Stream rows from a CSV or JSONL file (optionally gzipped, ``-`` for stdin), one line at a time."""
+    name = path[:-3] if path.endswith(".gz") else path
+    fmt = fmt or ("csv" if name.endswith(".csv") else "jsonl")
+    if path == "-":
+        stream = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+    elif path.endswith(".gz"):
+        stream = gzip.open(path, "rt", encoding="utf-8", newline="")
+    else:
+        stream = open(path, encoding="utf-8", newline="")
+    with stream:
+        if fmt == "csv":
+            yield from csv.DictReader(stream)
+        else:
+            for line in stream:
+                if line.strip():
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        row = None
+                    # Unparseable lines and non-objects are reported as invalid rows rather than aborting the import
+                    yield row if isinstance(row, dict) else {"__invalid__": line.strip()[:200]}
+
+
+def _chunks(rows: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ImportReport:
+    """Running counts of one import, with the first few invalid rows kept as samples."""
+
+    def __init__(self, max_errors: int = 20):
+        self.max_errors = max_errors
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.superseded = 0
+        self.invalid = 0
+        self.errors: List[Dict] = []
+        self.by_dataset: Dict[str, int] = {}
+        self._start = time.perf_counter()
+
+    def reject(self, line: int, error: str):
+        self.invalid += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": line, "error": error})
+
+    def to_dict(self) -> Dict:
+        elapsed = time.perf_counter() - self._start
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "superseded": self.superseded,
+            "invalid": self.invalid,
+            "by_dataset": self.by_dataset,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows / elapsed, 1) if elapsed else 0.0,
+            "errors": self.errors
+        }
+
+
+def _apply(chunk: List[Tuple[str, str, Dict]], report: ImportReport):
+    """Upsert the fields that differ from the catalog, one batch per dataset."""
+    changes: Dict[str, List[Tuple[str, Dict]]] = {}
+    for dataset, product, fields in chunk:
+        current = product_catalog.DATASETS[dataset].get(product_catalog.canonical_key(product))
+        if current is None:
+            report.inserted += 1
+            changes.setdefault(dataset, []).append((product, fields))
+            continue
+        changed = {field: value for field, value in fields.items() if current.get(field) != value}
+        if changed:
+            report.updated += 1
+            changes.setdefault(dataset, []).append((product, changed))
+        else:
+            report.unchanged += 1
+    # Each changed record notifies product_catalog's subscribers, which invalidate what they cached
+    for dataset, updates in changes.items():
+        product_catalog.update_records(dataset, updates)
+
+
+def import_rows(rows: Iterable[Dict], dataset: Optional[str] = None, chunk_size: int = 1000,
+                report: Optional[ImportReport] = None) -> ImportReport:
+    """Validate, normalize and upsert rows in chunks; memory stays bounded by the chunk size."""
+    report = report or ImportReport()
+    for chunk in _chunks(rows, chunk_size):
+        valid = []
+        for row in chunk:
+            report.rows += 1
+            try:
+                if isinstance(row, dict) and "__invalid__" in row:
+                    raise InvalidRow(f"line {row['__invalid__']!r} is not a JSON object")
+                valid.append(normalize_row(row, dataset))
+            except InvalidRow as e:
+                report.reject(report.rows, str(e))
+        # Within a chunk the last row for a product wins
+        latest = {}
+        for entry in valid:
+            latest[(entry[0], product_catalog.canonical_key(entry[1]))] = entry
+            report.by_dataset[entry[0]] = report.by_dataset.get(entry[0], 0) + 1
+        report.superseded += len(valid) - len(latest)
+        _apply(list(latest.values()), report)
+    return report
+
+
+def import_feed(path: str, dataset: Optional[str] = None, fmt: Optional[str] = None,
+                chunk_size: int = 1000) -> Dict:
+    """Import one CSV or JSONL feed into the catalog and return the report."""
+    return import_rows(read_rows(path, fmt), dataset, chunk_size).to_dict()
+
+
+def import_feeds_from_env() -> Dict[str, Dict]:
+    """Import the feeds listed in ``CATALOG_FEEDS`` (comma-separated; ``path=dataset`` pins a dataset)."""
+    reports = {}
+    for entry in filter(None, (part.strip() for part in os.getenv("CATALOG_FEEDS", "").split(","))):
+        path, _, dataset = entry.partition("=")
+        reports[path] = import_feed(path, dataset or None)
+        print(f"Imported catalog feed {path}: {reports[path]['rows']} rows, "
+              f"{reports[path]['inserted']} inserted, {reports[path]['updated']} updated, "
+              f"{reports[path]['invalid']} invalid")
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Validate CSV or JSONL feeds and report what importing them would change in the product catalog. "
+                    "This is a dry run: the catalog lives in each process, so the chatbot and its crew workers "
+                    "import feeds at startup through CATALOG_FEEDS.")
+    parser.add_argument("feeds", nargs="+", help="Feed files (.csv, .jsonl, optionally .gz; - for stdin)")
+    parser.add_argument("--dataset", choices=list(FIELDS),
+                        help="Dataset for every row (default: each row's 'dataset' column)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Feed format (default: from the extension)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    # Applied to this process's copy of the catalog only, which is discarded on exit
+    reports = {path: import_feed(path, args.dataset, args.format, args.chunk_size) for path in args.feeds}
+    print(json.dumps({"dry_run": True, "feeds": reports}, indent=2))
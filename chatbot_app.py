@@ -1,91 +1,109 @@
-from flask import Flask, render_template, request, jsonify
-import json
+from flask import Flask, render_template, request, jsonify, send_file
 import os
 from dotenv import load_dotenv
 from langchain.agents import tool
-from typing import Annotated, Any
-from pydantic import BeforeValidator
-import re
-from crewai import Agent, Task, Crew, Process
+from typing import Any, List, Union
+from crewai import Agent, Crew, Process
 import traceback
+import time
+import contextlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from product_catalog import get_product_data, get_market_trends, find_products_in_text, keyed_records, parse_products
+from qa_stage import DeterministicQATask, MARKET_FIELDS, PRODUCT_FIELDS, qa_stage_stats
+from crew_tasks import ManagedTask
+from iteration_budget import iteration_budgets
+from similarity_cache import install_similarity_cache, threshold_from_env as similarity_threshold_from_env
+from completion_cache import install_completion_cache, track_cache_lookups
+from traffic_capture import TrafficRecorder
+from memory_instrumentation import MemoryProfiler
+from answer_materializer import AnswerMaterializer
+from crew_workers import CrewWorkerError, CrewWorkerPool, in_crew_worker
+from step_events import StepRecorder
+from response_models import (ChatResponse, MarketData, ProductData, QAComparison, QAResult, ThinkingStep,
+                             dumps, to_json)
+from llm_config import build_llm
+from llm_pool import llm_client_pool
+from catalog_importer import import_feeds_from_env
+from request_profiler import RequestProfiler, follow
 
 # Load environment variables from .env file
 load_dotenv()
 
 app = Flask(__name__)
 
-# Helper function to extract product name from various input formats
-def parse_product_input(value: Any) -> str:
-    """Extract product name from various input formats."""
-    if isinstance(value, dict):
-        # Handle dictionary formats
-        if 'product' in value and isinstance(value['product'], str):
-            return value['product']
-    elif isinstance(value, str):
-        # Handle string inputs
-        return value
-    # Return value as is for other cases
-    return str(value)
-
-# Define the annotated type with validator
-ProductInput = Annotated[str, BeforeValidator(parse_product_input)]
+# Catalog feeds streamed in at startup (CATALOG_FEEDS=path[=dataset],...); crew workers import them too
+catalog_feeds = import_feeds_from_env()
+
+# Shared pool for per-product crews in comparison queries; bounds concurrent crews across requests
+COMPARISON_MAX_WORKERS = int(os.getenv("COMPARISON_MAX_WORKERS", "4"))
+comparison_pool = ThreadPoolExecutor(max_workers=COMPARISON_MAX_WORKERS, thread_name_prefix="comparison")
+
+# Completions shared on disk with every other process; LLM_CACHE=off disables it
+completion_cache = install_completion_cache()
+
+# Optional pool of pre-warmed worker processes that run the product crews (CREW_WORKERS=N)
+crew_workers = CrewWorkerPool.from_env()
+
+# Optional capture of sampled /api/chat traffic for replay (TRAFFIC_CAPTURE=on)
+traffic_recorder = TrafficRecorder.from_env()
+
+# Optional per-request sampling profiles, by header or sampling rate (REQUEST_PROFILING=on)
+request_profiler = RequestProfiler.from_env()
+
+# Optional tracemalloc snapshots per query type and live crew object counts (MEMORY_PROFILING=on)
+memory_profiler = MemoryProfiler.from_env()
+
+# Optional LLM cache that reuses answers for near-duplicate prompts of opted-in tasks, backed by the disk cache
+SIMILARITY_CACHE_THRESHOLD = similarity_threshold_from_env()
+llm_cache = None
+if SIMILARITY_CACHE_THRESHOLD is not None:
+    llm_cache = install_similarity_cache(threshold=SIMILARITY_CACHE_THRESHOLD, inner=completion_cache)
+
+# Helper function to extract product names from various input formats
+def parse_product_input(value: Any) -> List[str]:
+    """Extract product names from one name, a list, a comma-separated or JSON string, or a dict,
+    resolved to catalog products even when misspelled."""
+    return parse_products(value)
 
 # Define tools using the simpler @tool decorator with type annotations
 @tool("Fetch Product Data")
-def fetch_product_data(product: ProductInput) -> str:
-    """Fetch product pricing, availability, and rating for a given product name."""
+def fetch_product_data(product: Union[str, List[str]]) -> str:
+    """Fetch product pricing, availability, and rating for one product name or a list of product names;
+    several products come back keyed by name."""
     try:
-        print(f"Fetching product data for: {product}")
-        data = _get_product_data(product)
-        return json.dumps(data)
+        # crewai calls tool._run(**arguments), which skips pydantic validation, so parse here
+        products = parse_product_input(product)
+        print(f"Fetching product data for: {', '.join(products)}")
+        return to_json(keyed_records([_get_product_data(name) for name in products]))
     except Exception as e:
         return f"Error fetching product data: {str(e)}"
 
 @tool("Fetch Market Trends")
-def fetch_market_trends(product: ProductInput) -> str:
-    """Fetch trend status and popularity metrics for the given product name."""
+def fetch_market_trends(product: Union[str, List[str]]) -> str:
+    """Fetch trend status and popularity metrics for one product name or a list of product names;
+    several products come back keyed by name."""
     try:
-        print(f"Fetching market trends for: {product}")
-        data = _get_market_trends(product)
-        return json.dumps(data)
+        products = parse_product_input(product)
+        print(f"Fetching market trends for: {', '.join(products)}")
+        return to_json(keyed_records([_get_market_trends(name) for name in products]))
     except Exception as e:
         return f"Error fetching market trends: {str(e)}"
 
-def _get_product_data(product: str) -> dict:
-    """Fetch product data from a simulated database."""
-    if product.lower() == "iphone":
-        return {
-            "product": "iPhone",
-            "price": "$999",
-            "availability": "In Stock",
-            "rating": 4.8
-        }
-    return {
-        "product": product, 
-        "price": "$199", 
-        "availability": "Out of Stock",
-        "rating": 3.5
-    }
-
-def _get_market_trends(product: str) -> dict:
-    """Fetch market trends from a simulated database."""
-    if product.lower() == "iphone":
-        return {
-            "product": "iPhone",
-            "trend": "Rising",
-            "popularity_score": 92,
-            "monthly_searches": 45000
-        }
-    return {
-        "product": product,
-        "trend": "Stable",
-        "popularity_score": 70,
-        "monthly_searches": 12000
-    }
+def _get_product_data(product: str) -> ProductData:
+    """Fetch product data from the shared product catalog."""
+    return ProductData.from_dict(get_product_data(product))
+
+def _get_market_trends(product: str) -> MarketData:
+    """Fetch market trends from the shared product catalog."""
+    return MarketData.from_dict(get_market_trends(product))
 
 # Define CrewAI agents for the chatbot
-def create_agents_and_tasks(product: str, query_type: str):
+def create_agents_and_tasks(product: str, query_type: str, llm=None):
     """Create CrewAI agents and tasks for processing the query."""
+    # One chat model shared by the crew's agents (LLM_PROVIDER=stub runs offline)
+    llm = llm or build_llm()
+
     # Define agents with specific instructions on tool usage
     market_analyst = Agent(
         role="Market Research Analyst",
@@ -94,6 +112,7 @@ def create_agents_and_tasks(product: str, query_type: str):
         consumer electronics. You provide detailed analysis of product performance 
         and market trends to help guide business decisions.""",
         verbose=True,
+        llm=llm,
         tools=[fetch_market_trends],
         allow_delegation=False
     )
@@ -106,6 +125,7 @@ def create_agents_and_tasks(product: str, query_type: str):
         and market positioning. When describing product availability, always use the
         exact phrase 'In Stock' when available.""",
         verbose=True,
+        llm=llm,
         tools=[fetch_product_data],
         allow_delegation=False
     )
@@ -121,6 +141,7 @@ def create_agents_and_tasks(product: str, query_type: str):
         the meaning is the same, and you normalize these differences 
         in your reporting to ensure consistency.""",
         verbose=True,
+        llm=llm,
         # QA agent uses both tools for verification
         tools=[fetch_product_data, fetch_market_trends],
         allow_delegation=False
@@ -131,58 +152,67 @@ def create_agents_and_tasks(product: str, query_type: str):
     
     if query_type in ["price", "availability", "rating"]:
         # Product-related query
-        product_task = Task(
+        product_task = ManagedTask(
             description=f"""Analyze the {product} product details focusing on {query_type}.
             Provide comprehensive information about the {query_type} of {product}.
             Use the 'Fetch Product Data' tool with '{product}' as the product.
             """,
             expected_output=f"""A detailed analysis of {product}'s {query_type}, 
             with comparisons to industry standards and actionable insights.""",
-            agent=product_specialist
+            agent=product_specialist,
+            similarity_cache=True
         )
         tasks.append(product_task)
         
     elif query_type in ["trend", "market", "popularity"]:
         # Market-related query
-        market_task = Task(
+        market_task = ManagedTask(
             description=f"""Analyze the {product} market trends focusing on market position.
             Provide detailed insights on popularity metrics and trend status.
             Use the 'Fetch Market Trends' tool with '{product}' as the product.
             """,
             expected_output=f"""A comprehensive market trend analysis for {product}
             including trend status, popularity score, and monthly search volume significance.""",
-            agent=market_analyst
+            agent=market_analyst,
+            similarity_cache=True
         )
         tasks.append(market_task)
         
     else:
         # Comprehensive query needs both
-        product_task = Task(
+        product_task = ManagedTask(
             description=f"""Analyze the {product} product details and provide a comprehensive report.
             Focus on price point, availability status, and customer rating significance.
             Use the 'Fetch Product Data' tool with '{product}' as the product.
             """,
             expected_output=f"""A detailed product analysis for {product} covering price point analysis,
             availability status, and customer rating significance.""",
-            agent=product_specialist
+            agent=product_specialist,
+            similarity_cache=True
         )
         
-        market_task = Task(
+        market_task = ManagedTask(
             description=f"""Analyze the {product} market trends and provide detailed insights.
             Be sure to include popularity metrics and comparison with industry averages.
             Use the 'Fetch Market Trends' tool with '{product}' as the product.
             """,
             expected_output=f"""A comprehensive market trend analysis for {product} including trend status,
             popularity score interpretation, and monthly search volume significance.""",
-            agent=market_analyst
+            agent=market_analyst,
+            similarity_cache=True
         )
         
         tasks.append(product_task)
         tasks.append(market_task)
     
-    # Add QA verification task if needed
+    # Add QA verification task if needed; it verifies in Python and only calls the QA agent when unsure
     if len(tasks) > 0:
-        qa_task = Task(
+        qa_sources = {}
+        if query_type not in ["price", "availability", "rating"]:
+            qa_sources["Market Analysis Data"] = (_get_market_trends, MARKET_FIELDS)
+        if query_type not in ["trend", "market", "popularity"]:
+            qa_sources["Product Analysis Data"] = (_get_product_data, PRODUCT_FIELDS)
+        qa_task = DeterministicQATask(
             description=f"""Your job is to verify data accuracy by comparing the data points
             in the analyses with the source data for {product}.
             
@@ -194,7 +224,9 @@ def create_agents_and_tasks(product: str, query_type: str):
             """,
             expected_output="""A detailed data comparison followed by a verification result (PASS/FAIL).""",
             agent=qa_specialist,
-            context=tasks
+            context=list(tasks),
+            qa_product=product,
+            qa_sources=qa_sources
         )
         tasks.append(qa_task)
     
@@ -250,11 +282,7 @@ def perform_qa_check(response_data):
         
         # Directly fetch the data again for verification
         actual_data = None
-        qa_result = {
-            "passed": True,
-            "comparison": [],
-            "message": "QA verification passed"
-        }
+        qa_result = QAResult(passed=True, comparison=[], message="QA verification passed")
         
         # Determine which data type we're dealing with and fetch the reference data
         if 'popularity_score' in reported_data:
@@ -266,15 +294,10 @@ def perform_qa_check(response_data):
             for key in ['trend', 'popularity_score', 'monthly_searches']:
                 if key in reported_data and key in actual_data:
                     matches = compare_values(reported_data[key], actual_data[key])
-                    qa_result["comparison"].append({
-                        "field": key,
-                        "reported": reported_data[key],
-                        "actual": actual_data[key],
-                        "matches": matches
-                    })
+                    qa_result.comparison.append(QAComparison(key, reported_data[key], actual_data[key], matches))
                     if not matches:
-                        qa_result["passed"] = False
-                        qa_result["message"] = f"QA failed: Discrepancy found in {key}"
+                        qa_result.passed = False
+                        qa_result.message = f"QA failed: Discrepancy found in {key}"
         
         elif 'price' in reported_data:
             # It's product data
@@ -285,15 +308,10 @@ def perform_qa_check(response_data):
             for key in ['price', 'availability', 'rating']:
                 if key in reported_data and key in actual_data:
                     matches = compare_values(reported_data[key], actual_data[key])
-                    qa_result["comparison"].append({
-                        "field": key,
-                        "reported": reported_data[key],
-                        "actual": actual_data[key],
-                        "matches": matches
-                    })
+                    qa_result.comparison.append(QAComparison(key, reported_data[key], actual_data[key], matches))
                     if not matches:
-                        qa_result["passed"] = False
-                        qa_result["message"] = f"QA failed: Discrepancy found in {key}"
+                        qa_result.passed = False
+                        qa_result.message = f"QA failed: Discrepancy found in {key}"
         
         # Add QA results to the response
         response_data['qa_result'] = qa_result
@@ -310,154 +328,34 @@ def perform_qa_check(response_data):
         actual_product_data = _get_product_data(product_name)
         actual_market_data = _get_market_trends(product_name)
         
-        qa_result = {
-            "passed": True,
-            "product_comparison": [],
-            "market_comparison": [],
-            "message": "QA verification passed"
-        }
+        qa_result = QAResult(passed=True, product_comparison=[], market_comparison=[],
+                             message="QA verification passed")
         
         # Check product data
         for key in ['price', 'availability', 'rating']:
             if key in product_data and key in actual_product_data:
                 matches = compare_values(product_data[key], actual_product_data[key])
-                qa_result["product_comparison"].append({
-                    "field": key,
-                    "reported": product_data[key],
-                    "actual": actual_product_data[key],
-                    "matches": matches
-                })
+                qa_result.product_comparison.append(QAComparison(key, product_data[key], actual_product_data[key], matches))
                 if not matches:
-                    qa_result["passed"] = False
-                    qa_result["message"] = f"QA failed: Discrepancy found in product {key}"
+                    qa_result.passed = False
+                    qa_result.message = f"QA failed: Discrepancy found in product {key}"
         
         # Check market data
         for key in ['trend', 'popularity_score', 'monthly_searches']:
             if key in market_data and key in actual_market_data:
                 matches = compare_values(market_data[key], actual_market_data[key])
-                qa_result["market_comparison"].append({
-                    "field": key,
-                    "reported": market_data[key],
-                    "actual": actual_market_data[key],
-                    "matches": matches
-                })
+                qa_result.market_comparison.append(QAComparison(key, market_data[key], actual_market_data[key], matches))
                 if not matches:
-                    qa_result["passed"] = False
-                    qa_result["message"] = f"QA failed: Discrepancy found in market {key}"
+                    qa_result.passed = False
+                    qa_result.message = f"QA failed: Discrepancy found in market {key}"
         
         # Add QA results to the response
         response_data['qa_result'] = qa_result
     
     return response_data
 
-# Process CrewAI output to extract thinking steps
-def extract_thinking_steps(task_outputs):
-    """Extract thinking steps from CrewAI task outputs."""
-    thinking_steps = []
-    
-    try:
-        for i, output in enumerate(task_outputs):
-            try:
-                # TaskOutput objects need to be converted to strings
-                output_text = str(output)
-                
-                # Extract agent role from output
-                agent_role = "Agent"
-                if "Market Research Analyst" in output_text:
-                    agent_role = "Market Research Analyst"
-                elif "Product Specialist" in output_text:
-                    agent_role = "Product Specialist"
-                elif "Data Quality Checker" in output_text:
-                    agent_role = "Data Quality Checker"
-                
-                # Split the output by steps
-                steps = output_text.split("\n\n")
-                
-                # Process initial analysis
-                thinking_steps.append({
-                    "step": f"{agent_role} - Initial Analysis",
-                    "content": steps[0] if steps else output_text
-                })
-                
-                # Look for tool usage patterns - try multiple variations
-                tool_patterns = [
-                    r"I'll use the '([^']+)' tool with product = '([^']+)'",
-                    r"I will use the '([^']+)' tool with product = '([^']+)'", 
-                    r"Using the '([^']+)' tool with '([^']+)'",
-                    r"Calling '([^']+)' tool with product = '([^']+)'",
-                    r"Executing '([^']+)' tool with '([^']+)'"
-                ]
-                
-                tool_found = False
-                for pattern in tool_patterns:
-                    tool_matches = re.findall(pattern, output_text)
-                    if tool_matches:
-                        tool_found = True
-                        for tool_name, product in tool_matches:
-                            thinking_steps.append({
-                                "step": f"{agent_role} - Tool Execution",
-                                "content": f"Using '{tool_name}' tool with product = '{product}'"
-                            })
-                
-                # If no tool patterns matched but we see keywords, add a generic tool step
-                if not tool_found and ('tool' in output_text and ('fetch' in output_text.lower() or 'data' in output_text.lower())):
-                    thinking_steps.append({
-                        "step": f"{agent_role} - Tool Execution",
-                        "content": "Using data retrieval tools to gather information"
-                    })
-                
-                # Look for JSON data patterns
-                json_pattern = r"({[\s\S]*?})"
-                json_matches = re.findall(json_pattern, output_text)
-                
-                if json_matches:
-                    for json_str in json_matches:
-                        try:
-                            # Verify it's valid JSON
-                            json_data = json.loads(json_str)
-                            thinking_steps.append({
-                                "step": f"{agent_role} - Data Analysis",
-                                "content": f"Analyzing data:\n{json.dumps(json_data, indent=2)}"
-                            })
-                        except:
-                            # Not valid JSON, skip
-                            continue
-                
-                # Add conclusion/synthesis step
-                if len(steps) > 1:
-                    thinking_steps.append({
-                        "step": f"{agent_role} - Conclusion",
-                        "content": steps[-1]
-                    })
-            except Exception as e:
-                # Handle errors for individual outputs
-                thinking_steps.append({
-                    "step": f"Processing Error",
-                    "content": f"Error processing agent output {i+1}: {str(e)}\nRaw output: {str(output)[:200]}..."
-                })
-    except Exception as e:
-        # Fallback for any unexpected errors
-        thinking_steps.append({
-            "step": "Error Processing Agent Thinking",
-            "content": f"Error extracting thinking steps: {str(e)}"
-        })
-    
-    # Ensure we return at least one thinking step
-    if not thinking_steps:
-        thinking_steps.append({
-            "step": "Agent Processing",
-            "content": "The agents processed your request, but detailed thinking steps were not available."
-        })
-    
-    return thinking_steps
-
-def generate_response(user_query: str) -> dict:
-    """Generate a response based on the user query using CrewAI."""
-    
-    # Extract product from query - simple logic to identify iPhone
-    product = "iPhone" if "iphone" in user_query.lower() else "unknown product"
-    
-    # Determine query type for generating agent thinking
+def detect_query_type(user_query: str) -> str:
+    """Classify the user query into one of the supported query types."""
     query_type = ""
     if "price" in user_query.lower() or "cost" in user_query.lower():
         query_type = "price"
@@ -470,10 +368,50 @@ def generate_response(user_query: str) -> dict:
     else:
         # If no specific category is detected, provide comprehensive data
         query_type = "comprehensive"
-    
+    return query_type
+
+def generate_response(user_query: str) -> ChatResponse:
+    """Generate a response based on the user query using CrewAI."""
+
+    # Extract every catalog product mentioned in the query
+    products = find_products_in_text(user_query)
+
+    # Determine query type for generating agent thinking
+    query_type = detect_query_type(user_query)
+
+    if len(products) > 1:
+        return generate_comparison_response(products, query_type)
+
+    product = products[0] if products else "unknown product"
+    return _product_response(product, query_type)
+
+def _product_response(product: str, query_type: str) -> ChatResponse:
+    """Serve the materialized response when there is a fresh one, otherwise run the crew."""
+    if answer_materializer is not None:
+        response = answer_materializer.get(product, query_type)
+        if response is not None:
+            return response
+    return run_product_crew(product, query_type)
+
+def run_product_crew(product: str, query_type: str) -> ChatResponse:
+    """Run the product crew on the worker pool when it is enabled, in this thread otherwise."""
+    if crew_workers is None:
+        return generate_product_response(product, query_type)
+    try:
+        return crew_workers.run(product, query_type)
+    except CrewWorkerError as e:
+        print(f"Crew worker job failed ({e.reason}): {e}")
+        return _fallback_response(product, query_type, e)
+
+def generate_product_response(product: str, query_type: str) -> ChatResponse:
+    """Run the specialist crew for a single product and build the verified response."""
     try:
         # Create agents and tasks
         tasks = create_agents_and_tasks(product, query_type)
+
+        # Capture every agent step and task result as it happens
+        recorder = StepRecorder.from_env()
+        recorder.attach(tasks)
         
         # Create and run crew
         crew = Crew(
@@ -486,15 +424,8 @@ def generate_response(user_query: str) -> dict:
         # Get crew result
         crew_result = crew.kickoff()
         
-        # Collect task outputs safely
-        task_outputs = []
-        for task in tasks:
-            if hasattr(task, 'output') and task.output is not None:
-                task_outputs.append(task.output)
-                print(f"Task output type: {type(task.output)}")
-        
-        # Extract thinking steps from task outputs
-        thinking_steps = extract_thinking_steps(task_outputs)
+        # Thinking steps straight from the recorded events
+        thinking_steps = recorder.thinking_steps()
         
         # Prepare response based on query type
         if query_type in ["price", "availability", "rating"]:
@@ -508,28 +439,28 @@ def generate_response(user_query: str) -> dict:
             elif query_type == "rating":
                 response_text = f"The {product} has a rating of {product_data['rating']} out of 5."
             
-            response = {
-                "response": response_text,
-                "data": product_data,
-                "thinking_steps": thinking_steps
-            }
+            response = ChatResponse(
+                response=response_text,
+                data=product_data,
+                thinking_steps=thinking_steps
+            )
             
         elif query_type == "market":
             # Market data query
             market_data = _get_market_trends(product)
-            response = {
-                "response": f"The {product} is currently showing a {market_data['trend']} trend with a popularity score of {market_data['popularity_score']} and {market_data['monthly_searches']} monthly searches.",
-                "data": market_data,
-                "thinking_steps": thinking_steps
-            }
+            response = ChatResponse(
+                response=f"The {product} is currently showing a {market_data['trend']} trend with a popularity score of {market_data['popularity_score']} and {market_data['monthly_searches']} monthly searches.",
+                data=market_data,
+                thinking_steps=thinking_steps
+            )
             
         else:
             # Comprehensive query
             product_data = _get_product_data(product)
             market_data = _get_market_trends(product)
             
-            response = {
-                "response": f"Here's what I found about the {product}:\n\n" + 
+            response = ChatResponse(
+                response=f"Here's what I found about the {product}:\n\n" + 
                            f"Price: {product_data['price']}\n" +
                            f"Availability: {product_data['availability']}\n" +
                            f"Rating: {product_data['rating']} out of 5\n\n" +
@@ -537,10 +468,10 @@ def generate_response(user_query: str) -> dict:
                            f"Trend: {market_data['trend']}\n" +
                            f"Popularity Score: {market_data['popularity_score']}\n" +
                            f"Monthly Searches: {market_data['monthly_searches']}",
-                "product_data": product_data,
-                "market_data": market_data,
-                "thinking_steps": thinking_steps
-            }
+                product_data=product_data,
+                market_data=market_data,
+                thinking_steps=thinking_steps
+            )
         
         # Run QA verification on the response data
         verified_response = perform_qa_check(response)
@@ -551,48 +482,281 @@ def generate_response(user_query: str) -> dict:
         # Handle any errors and return a friendly message
         error_trace = traceback.format_exc()
         print(f"Error generating response: {str(e)}\n{error_trace}")
+        return _fallback_response(product, query_type, e)
+
+def _fallback_response(product: str, query_type: str, error: Exception) -> ChatResponse:
+    """Basic response straight from the catalog, used when the crew could not run."""
+    if query_type in ["price", "availability", "rating"]:
+        product_data = _get_product_data(product)
+        if query_type == "price":
+            response_text = f"The {product} is priced at {product_data['price']}."
+        elif query_type == "availability":
+            response_text = f"The {product} is currently {product_data['availability']}."
+        else:
+            response_text = f"The {product} has a rating of {product_data['rating']} out of 5."
         
-        # Fallback to basic response
-        if query_type in ["price", "availability", "rating"]:
-            product_data = _get_product_data(product)
-            if query_type == "price":
-                response_text = f"The {product} is priced at {product_data['price']}."
-            elif query_type == "availability":
-                response_text = f"The {product} is currently {product_data['availability']}."
-            else:
-                response_text = f"The {product} has a rating of {product_data['rating']} out of 5."
-            
-            return {
-                "response": response_text,
-                "data": product_data,
-                "thinking_steps": [{
-                    "step": "Error Information",
-                    "content": f"There was an error running CrewAI: {str(e)}\nUsing fallback data instead."
-                }]
-            }
+        return ChatResponse(
+            response=response_text,
+            data=product_data,
+            thinking_steps=[ThinkingStep(
+                "Error Information",
+                f"There was an error running CrewAI: {str(error)}\nUsing fallback data instead."
+            )]
+        )
+    else:
+        return ChatResponse(
+            response=f"I encountered an error while processing your query about {product}. Here's some basic information instead.",
+            product_data=_get_product_data(product),
+            market_data=_get_market_trends(product),
+            thinking_steps=[ThinkingStep(
+                "Error Information",
+                f"There was an error running CrewAI: {str(error)}\nUsing fallback data instead."
+            )]
+        )
+
+def _timed_product_response(product: str, query_type: str):
+    """Run a single product crew and measure how long it took."""
+    start = time.perf_counter()
+    response = _product_response(product, query_type)
+    return response, time.perf_counter() - start
+
+def _comparison_line(product: str, query_type: str, response: ChatResponse) -> str:
+    """Format one product's line in the comparison answer."""
+    product_data = response.get('product_data') or _get_product_data(product)
+    market_data = response.get('market_data') or _get_market_trends(product)
+    if 'data' in response:
+        if query_type == "market":
+            market_data = response['data']
+        else:
+            product_data = response['data']
+
+    if query_type == "price":
+        return f"{product}: {product_data['price']}"
+    elif query_type == "availability":
+        return f"{product}: {product_data['availability']}"
+    elif query_type == "rating":
+        return f"{product}: {product_data['rating']} out of 5"
+    elif query_type == "market":
+        return (f"{product}: {market_data['trend']} trend, popularity score {market_data['popularity_score']}, "
+                f"{market_data['monthly_searches']} monthly searches")
+    return (f"{product}: {product_data['price']}, {product_data['availability']}, "
+            f"rated {product_data['rating']} out of 5, {market_data['trend']} trend "
+            f"(popularity {market_data['popularity_score']})")
+
+def generate_comparison_response(products: list, query_type: str) -> ChatResponse:
+    """Run the per-product crews concurrently and merge them into one comparison response."""
+    start = time.perf_counter()
+
+    # Every product gets its own crew; the shared pool bounds how many run at once.
+    # Each crew runs in a copy of this request's context so per-request tracking follows it,
+    # and a profiled request samples the pool threads only while they run its crews.
+    futures = [
+        comparison_pool.submit(contextvars.copy_context().run, follow, _timed_product_response, product, query_type)
+        for product in products
+    ]
+    results = [future.result() for future in futures]
+
+    wall_time = time.perf_counter() - start
+
+    comparison_data = {}
+    thinking_steps = []
+    qa_products = []
+    lines = []
+    for product, (response, elapsed) in zip(products, results):
+        lines.append(_comparison_line(product, query_type, response))
+
+        if 'data' in response:
+            comparison_data[product] = response['data']
         else:
-            return {
-                "response": f"I encountered an error while processing your query about {product}. Here's some basic information instead.",
-                "product_data": _get_product_data(product),
-                "market_data": _get_market_trends(product),
-                "thinking_steps": [{
-                    "step": "Error Information",
-                    "content": f"There was an error running CrewAI: {str(e)}\nUsing fallback data instead."
-                }]
-            }
+            comparison_data[product] = {**response.get('product_data', {}), **response.get('market_data', {})}
+
+        for step in response.get('thinking_steps', []):
+            thinking_steps.append(ThinkingStep(
+                f"[{product}] {step['step']}",
+                step['content']
+            ))
+
+        qa_result = response.get('qa_result') or QAResult(passed=False, message="QA verification was not run")
+        qa_products.append({"product": product, **qa_result})
+
+    failed = [entry['product'] for entry in qa_products if not entry['passed']]
+    qa_result = QAResult(
+        passed=not failed,
+        message="QA verification passed for all products" if not failed
+                else f"QA failed for: {', '.join(failed)}",
+        products=qa_products
+    )
+
+    return ChatResponse(
+        response=f"Here's how {', '.join(products[:-1])} and {products[-1]} compare:\n\n" + "\n".join(lines),
+        comparison_data=comparison_data,
+        thinking_steps=thinking_steps,
+        qa_result=qa_result,
+        timing={
+            "wall_time_seconds": round(wall_time, 3),
+            "per_product_seconds": {product: round(elapsed, 3) for product, (_, elapsed) in zip(products, results)}
+        }
+    )
+
+def _is_fallback(response: ChatResponse) -> bool:
+    """Whether the response came from the fallback path after a crew error."""
+    return any(step.get('step', '').endswith("Error Information") for step in response.get('thinking_steps', []))
+
+def materialized_product_response(product: str, query_type: str) -> ChatResponse:
+    """Run the crew for the materializer, raising instead of returning a fallback response."""
+    response = run_product_crew(product, query_type)
+    if _is_fallback(response):
+        raise RuntimeError("the crew failed and the fallback response was not materialized")
+    return response
+
+# Optional background refresh of full responses for hot products and query types (MATERIALIZER=on)
+# (never inside a crew worker, which only runs the jobs it is sent)
+answer_materializer = None if in_crew_worker() else AnswerMaterializer.from_env(materialized_product_response)
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def _generate_captured_response(user_message: str) -> ChatResponse:
+    """Generate the response and record the request for traffic replay."""
+    received = time.time()
+    start = time.perf_counter()
+    with track_cache_lookups() as cache_lookups:
+        response_data = generate_response(user_message)
+    traffic_recorder.record({
+        "timestamp": received,
+        "completed": time.time(),
+        "message": user_message,
+        "products": find_products_in_text(user_message),
+        "query_type": detect_query_type(user_message),
+        "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        "cache": cache_lookups,
+        "qa_passed": (response_data.get('qa_result') or {}).get('passed'),
+        "fallback": _is_fallback(response_data)
+    })
+    return response_data
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     user_message = request.json.get('message', '')
-    
+
+    profiling = contextlib.nullcontext()
+    if request_profiler is not None and request_profiler.wanted(request.headers.get(request_profiler.header)):
+        query_type = detect_query_type(user_message)
+        profiling = request_profiler.profile(query_type, query_type=query_type,
+                                             products=find_products_in_text(user_message))
+
     # Generate response based on user message
-    response_data = generate_response(user_message)
-    
-    return jsonify(response_data)
+    with profiling as profile:
+        if traffic_recorder is not None and traffic_recorder.sampled():
+            response_data = _generate_captured_response(user_message)
+        else:
+            response_data = generate_response(user_message)
+
+    if memory_profiler is not None:
+        memory_profiler.after_request(detect_query_type(user_message))
+
+    # Records serialize straight to JSON, without building intermediate dicts for jsonify
+    response = app.response_class(dumps(response_data), mimetype="application/json")
+    if profile is not None:
+        response.headers["X-Profile-File"] = profile["file"]
+    return response
+
+@app.route('/admin/qa-stats')
+def qa_stats():
+    """Report how often the QA stage needed the LLM QA agent."""
+    return jsonify(qa_stage_stats.snapshot())
+
+@app.route('/admin/iteration-budgets')
+def iteration_budget_stats():
+    """Report agents' iteration and latency percentiles and the budgets derived from them."""
+    if iteration_budgets is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **iteration_budgets.snapshot()})
+
+@app.route('/admin/memory')
+def memory_stats():
+    """Report RSS, traced memory and live crew objects."""
+    if memory_profiler is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **memory_profiler.snapshot()})
+
+@app.route('/admin/memory/diff')
+def memory_diff():
+    """Diff the baseline and latest tracemalloc snapshots of a query type."""
+    if memory_profiler is None:
+        return jsonify({"enabled": False})
+    query_type = request.args.get('query_type', 'comprehensive')
+    top = request.args.get('top', '20')
+    if not top.isdigit() or int(top) == 0:
+        return jsonify({"error": "top must be a positive integer"}), 400
+    top = int(top)
+    key_type = request.args.get('key', 'lineno')
+    if key_type not in ('lineno', 'filename', 'traceback'):
+        return jsonify({"error": "key must be lineno, filename or traceback"}), 400
+    return jsonify(memory_profiler.diff(query_type, top=top, key_type=key_type))
+
+@app.route('/admin/traffic-capture')
+def traffic_capture_stats():
+    """Report how many requests were captured or dropped."""
+    if traffic_recorder is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **traffic_recorder.snapshot()})
+
+@app.route('/admin/completion-cache')
+def completion_cache_stats():
+    """Report hits and misses of the on-disk completion cache across all processes."""
+    if completion_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **completion_cache.snapshot()})
+
+@app.route('/admin/similarity-cache')
+def similarity_cache_stats():
+    """Report hit rate and latency saved by the near-duplicate LLM cache."""
+    if llm_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **llm_cache.snapshot()})
+
+@app.route('/admin/materialized-answers')
+def materialized_answer_stats():
+    """Report materialized answers' age, refresh cost and serving hit rate."""
+    if answer_materializer is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **answer_materializer.snapshot()})
+
+@app.route('/admin/llm-pool')
+def llm_pool_stats():
+    """Report LLM calls, retries, 429s and queueing in this process's client pool."""
+    if llm_client_pool is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **llm_client_pool.snapshot()})
+
+@app.route('/admin/crew-workers')
+def crew_worker_stats():
+    """Report crew worker jobs, timeouts, crashes, recycling and per-worker RSS."""
+    if crew_workers is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **crew_workers.snapshot()})
+
+@app.route('/admin/profiles')
+def request_profiles():
+    """List recent request profiles with their duration and hottest functions."""
+    if request_profiler is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **request_profiler.snapshot()})
+
+@app.route('/admin/profiles/<filename>')
+def request_profile_file(filename):
+    """Download a recent profile (open speedscope files at https://www.speedscope.app)."""
+    path = request_profiler.path(filename) if request_profiler is not None else None
+    if path is None:
+        return jsonify({"error": "unknown profile"}), 404
+    return send_file(os.path.abspath(path), as_attachment=True)
+
+@app.route('/admin/catalog-feeds')
+def catalog_feed_stats():
+    """Report the rows inserted, updated and rejected by each startup catalog feed."""
+    return jsonify({"enabled": bool(catalog_feeds), "feeds": catalog_feeds})
 
 if __name__ == '__main__':
     # Create templates directory if it doesn't exist
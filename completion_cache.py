@@ -0,0 +1,265 @@
+from typing import Any, Dict, Iterator, Optional, Sequence
+from contextlib import contextmanager
+import argparse
+import atexit
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+DEFAULT_CACHE_PATH = ".llm_cache.sqlite3"
+DEFAULT_MAX_MB = 256
+# Eviction trims the cache to this fraction of its limit so it does not run on every insert
+EVICTION_TARGET = 0.9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key TEXT PRIMARY KEY,
+    llm_string TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS completions_last_access ON completions (last_access);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+# Per-request tally of cache outcomes, filled in by every cache while a track_cache_lookups() block is open
+_lookup_tally = contextvars.ContextVar("lookup_tally", default=None)
+
+
+@contextmanager
+def track_cache_lookups() -> Iterator[Dict[str, int]]:
+    """Count LLM cache hits and misses for the calls made inside the block (and contexts copied from it)."""
+    tally = {"hits": 0, "misses": 0}
+    token = _lookup_tally.set(tally)
+    try:
+        yield tally
+    finally:
+        _lookup_tally.reset(token)
+
+
+def record_lookup(hit: bool):
+    """Add one cache outcome to the current request's tally, if one is being tracked."""
+    tally = _lookup_tally.get()
+    if tally is not None:
+        tally["hits" if hit else "misses"] += 1
+
+
+def merge_lookups(counts: Dict[str, int]):
+    """Add outcomes tallied elsewhere (e.g. in a crew worker process) to the current request's tally."""
+    tally = _lookup_tally.get()
+    if tally is not None:
+        tally["hits"] += counts.get("hits", 0)
+        tally["misses"] += counts.get("misses", 0)
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """Hash of the model, its parameters (both in ``llm_string``) and the prompt."""
+    return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class SQLiteCompletionCache(BaseCache):
+    """LLM completion cache in a SQLite file shared by every process that opens it.
+
+    The database runs in WAL mode so readers never block; writers serialize on
+    ``BEGIN IMMEDIATE`` and wait up to ``busy_timeout`` seconds for each other. Lookups are plain
+    reads: hit and miss counts and ``last_access`` refreshes older than ``touch_seconds`` are
+    collected in memory and written in one transaction at most every ``flush_seconds`` (or with
+    the next update). The total size of the stored completions is kept in the counters table, and
+    once it exceeds ``max_bytes`` the least recently used completions are deleted.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+                 busy_timeout: float = 30.0, flush_seconds: float = 5.0, touch_seconds: float = 60.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.busy_timeout = busy_timeout
+        self.flush_seconds = flush_seconds
+        self.touch_seconds = touch_seconds
+        self._local = threading.local()
+        self._pending_lock = threading.Lock()
+        self._pending_counts: Dict[str, int] = {"hits": 0, "misses": 0}
+        self._pending_touches: Dict[str, float] = {}
+        self._flushed = time.monotonic()
+        conn = self._connection()
+        conn.executescript(_SCHEMA)
+        # Seeds the running size total of a cache file created before it was tracked
+        conn.execute("INSERT OR IGNORE INTO counters (name, value) "
+                     "SELECT 'bytes', COALESCE(SUM(size), 0) FROM completions")
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread and process; a connection inherited across fork is not reused
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _count(conn: sqlite3.Connection, name: str, amount: int = 1):
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Any]]:
+        """Return the cached generations for this model, parameters and prompt, if any."""
+        key = cache_key(prompt, llm_string)
+        row = self._connection().execute(
+            "SELECT value, last_access FROM completions WHERE key = ?", (key,)
+        ).fetchone()
+        record_lookup(row is not None)
+        now = time.time()
+        with self._pending_lock:
+            self._pending_counts["hits" if row is not None else "misses"] += 1
+            if row is not None and now - row[1] > self.touch_seconds:
+                self._pending_touches[key] = now
+            due = time.monotonic() - self._flushed >= self.flush_seconds
+        if due:
+            self.flush()
+        if row is None:
+            return None
+        return [loads(generation) for generation in json.loads(row[0])]
+
+    def _take_pending(self, conn: sqlite3.Connection):
+        """Write the counts and access times collected since the last flush."""
+        with self._pending_lock:
+            counts, self._pending_counts = self._pending_counts, {"hits": 0, "misses": 0}
+            touches, self._pending_touches = self._pending_touches, {}
+            self._flushed = time.monotonic()
+        for name, amount in counts.items():
+            if amount:
+                self._count(conn, name, amount)
+        if touches:
+            conn.executemany("UPDATE completions SET last_access = ? WHERE key = ?",
+                             [(accessed, key) for key, accessed in touches.items()])
+
+    def flush(self):
+        """Write pending hit/miss counts and access times now."""
+        with self._transaction() as conn:
+            self._take_pending(conn)
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Any]):
+        """Store generations, evicting least recently used completions past the size limit."""
+        value = json.dumps([dumps(generation) for generation in return_val])
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+        with self._transaction() as conn:
+            replaced = conn.execute("SELECT size FROM completions WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO completions (key, llm_string, value, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, llm_string, value, len(value), now, now)
+            )
+            self._count(conn, "writes")
+            self._count(conn, "bytes", len(value) - (replaced[0] if replaced else 0))
+            self._take_pending(conn)
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT value FROM counters WHERE name = 'bytes'").fetchone()
+        total = total[0] if total else 0
+        if total <= self.max_bytes:
+            return
+        excess = total - int(self.max_bytes * EVICTION_TARGET)
+        evicted = freed = 0
+        for key, size in conn.execute("SELECT key, size FROM completions ORDER BY last_access").fetchall():
+            if freed >= excess:
+                break
+            conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+            freed += size
+            evicted += 1
+        self._count(conn, "evictions", evicted)
+        self._count(conn, "bytes", -freed)
+
+    def clear(self, **kwargs: Any):
+        with self._pending_lock:
+            self._pending_counts = {"hits": 0, "misses": 0}
+            self._pending_touches = {}
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM completions")
+            conn.execute("DELETE FROM counters")
+
+    def snapshot(self) -> Dict:
+        """Hit/miss statistics across every process sharing the cache file (other processes' counts
+        lag by up to their ``flush_seconds``)."""
+        self.flush()
+        conn = self._connection()
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        entries = conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+        size = counters.get("bytes", 0)
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "writes": counters.get("writes", 0),
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0
+        }
+
+
+_installed: Optional[SQLiteCompletionCache] = None
+
+
+def install_completion_cache() -> Optional[SQLiteCompletionCache]:
+    """Install the shared completion cache as langchain's global LLM cache.
+
+    Every agent's chat model consults the global cache, so crews pick it up without changes to
+    their definitions. ``LLM_CACHE_PATH`` and ``LLM_CACHE_MAX_MB`` configure the store and
+    ``LLM_CACHE=off`` disables it. Repeated calls return the same cache.
+    """
+    global _installed
+    if os.getenv("LLM_CACHE", "on").lower() in ("0", "off", "false", "no"):
+        return None
+    if _installed is None:
+        from langchain.globals import set_llm_cache
+        max_mb = float(os.getenv("LLM_CACHE_MAX_MB", DEFAULT_MAX_MB))
+        _installed = SQLiteCompletionCache(os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH), int(max_mb * 1024 * 1024))
+        # Counts still pending at exit would otherwise be lost
+        atexit.register(_installed.flush)
+        set_llm_cache(_installed)
+    return _installed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the shared LLM completion cache.")
+    parser.add_argument("command", choices=["stats", "clear"])
+    parser.add_argument("--path", default=os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH))
+    args = parser.parse_args()
+
+    cache = SQLiteCompletionCache(args.path)
+    if args.command == "clear":
+        cache.clear()
+    print(json.dumps(cache.snapshot(), indent=2))
@@ -0,0 +1,159 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from collections import deque
+import json
+import math
+import os
+import re
+import threading
+import time
+
+# Lines that carry no information for a downstream agent
+BOILERPLATE_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE) for pattern in [
+        r"^i hope (this|these|that)\b",
+        r"^(please )?(let me know|feel free)\b",
+        r"^(thought|action|action input|observation)\s*:",
+        r"^i now (know|can give)\b",
+        r"^(in )?(conclusion|summary)[,:.]?$",
+        r"^(here is|here's|below is) (my|the|a) ",
+        r"^as (a|an) [\w\s]+(analyst|specialist|strategist|advisor|ai)\b",
+        r"^[-=*_#\s]{3,}$"
+    ]
+]
+_FINAL_ANSWER_PREFIX = re.compile(r"^final answer\s*:\s*", re.IGNORECASE)
+_HEADING = re.compile(r"^(#{1,6}\s+.+|\*\*[^*]+\*\*:?|[A-Z][^.!?]{0,60}:)$")
+_BULLET = re.compile(r"^([-*+•]|\d+[.)])\s+")
+_DATA = re.compile(r"\d|[$%|]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Prompt sizes recorded by the most recent budgeted assemblies, newest last
+context_usage = deque(maxlen=1000)
+_usage_lock = threading.Lock()
+CONTEXT_LOG_PATH = os.getenv("CONTEXT_LOG_PATH")
+
+_encoding = None
+_encoding_loaded = False
+
+
+def count_tokens(text: str) -> int:
+    """Count prompt tokens with tiktoken when available, else estimate four characters per token."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            # tiktoken is optional and may not have its encoding files offline
+            _encoding = None
+        _encoding_loaded = True
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+class AssembledContext(NamedTuple):
+    text: str
+    tokens_before: int
+    tokens_after: int
+    condensed: bool
+
+
+def _priority(line: str) -> int:
+    """Rank a line: headings first, then data points, then bullets, then prose."""
+    if _HEADING.match(line):
+        return 3
+    if _DATA.search(line):
+        return 2
+    if _BULLET.match(line):
+        return 1
+    return 0
+
+
+def condense(text: str) -> List[Tuple[int, str]]:
+    """Strip boilerplate and prose padding, returning (priority, line) pairs in original order."""
+    lines = []
+    seen = set()
+    for raw_line in text.splitlines():
+        line = _FINAL_ANSWER_PREFIX.sub("", raw_line.strip())
+        line = re.sub(r"\s+", " ", line)
+        if not line or any(pattern.search(line) for pattern in BOILERPLATE_PATTERNS):
+            continue
+        priority = _priority(line)
+        if priority == 0:
+            # Keep only the opening sentence of plain prose
+            line = _SENTENCE_END.split(line, 1)[0]
+        if line.lower() in seen:
+            continue
+        seen.add(line.lower())
+        lines.append((priority, line))
+    return lines
+
+
+def _fit(lines: List[Tuple[int, str]], budget: int) -> List[str]:
+    """Keep the highest-priority lines that fit the budget, preserving their order."""
+    costs = [count_tokens(line) + 1 for _, line in lines]
+    ranked = sorted(range(len(lines)), key=lambda i: (-lines[i][0], i))
+    kept = set()
+    used = 0
+    for i in ranked:
+        if used + costs[i] <= budget:
+            kept.add(i)
+            used += costs[i]
+    return [lines[i][1] for i in sorted(kept)]
+
+
+def assemble_context(outputs: List[Tuple[str, str]], budget: int) -> AssembledContext:
+    """Build downstream context from (label, output) pairs within a token budget.
+
+    Outputs that already fit are passed through verbatim, the same way crewai joins them.
+    """
+    verbatim = "\n".join(text for _, text in outputs)
+    tokens_before = count_tokens(verbatim)
+    if tokens_before <= budget:
+        return AssembledContext(verbatim, tokens_before, tokens_before, False)
+
+    sections = [(f"## {label}", condense(text)) for label, text in outputs]
+    header_cost = sum(count_tokens(header) + 1 for header, _ in sections)
+    remaining = max(0, budget - header_cost)
+
+    # Split the budget evenly, handing unused share from short sections to the longer ones
+    needs = [sum(count_tokens(line) + 1 for _, line in lines) for _, lines in sections]
+    shares = [0] * len(sections)
+    order = sorted(range(len(sections)), key=lambda i: needs[i])
+    for rank, i in enumerate(order):
+        shares[i] = min(needs[i], remaining // (len(sections) - rank))
+        remaining -= shares[i]
+
+    parts = []
+    for (header, lines), share in zip(sections, shares):
+        kept = _fit(lines, share)
+        if kept:
+            parts.append("\n".join([header] + kept))
+    text = "\n\n".join(parts)
+    return AssembledContext(text, tokens_before, count_tokens(text), True)
+
+
+def record_context_usage(task_name: str, budget: int, assembled: AssembledContext):
+    """Remember the prompt tokens a task's context used before and after assembly."""
+    entry = {
+        "task": task_name,
+        "budget": budget,
+        "tokens_before": assembled.tokens_before,
+        "tokens_after": assembled.tokens_after,
+        "condensed": assembled.condensed,
+        "timestamp": time.time()
+    }
+    with _usage_lock:
+        context_usage.append(entry)
+        if CONTEXT_LOG_PATH:
+            with open(CONTEXT_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+
+def format_context_report(entries: Optional[List[Dict]] = None) -> str:
+    """Render the recorded context sizes as a small text table."""
+    entries = list(context_usage) if entries is None else entries
+    lines = [f"{'Task':<40}{'Budget':>8}{'Before':>8}{'After':>8}"]
+    for entry in entries:
+        lines.append(f"{entry['task'][:38]:<40}{entry['budget']:>8}{entry['tokens_before']:>8}{entry['tokens_after']:>8}")
+    return "\n".join(lines)
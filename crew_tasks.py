@@ -0,0 +1,161 @@
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from collections import deque
+import threading
+import time
+
+from crewai import Task
+from crewai.tasks.task_output import TaskOutput
+from pydantic import Field
+
+from context_assembler import assemble_context, record_context_usage
+from iteration_budget import iteration_budgets
+from similarity_cache import similarity_scope
+
+
+class TaskGuard(NamedTuple):
+    """Skip a task when ``condition`` holds for its upstream outputs (in context order).
+
+    The skipped task's output becomes ``template`` formatted with ``guard`` (the guard name).
+    """
+    name: str
+    condition: Callable[[List[str]], bool]
+    template: str
+
+
+class RunMetadata:
+    """Durations of executed managed tasks and the tasks skipped by guards."""
+
+    def __init__(self, history: int = 50):
+        self._lock = threading.Lock()
+        self._history = history
+        self.durations: Dict[str, deque] = {}
+        self.skipped: List[Dict] = []
+
+    def record_execution(self, task_name: str, seconds: float):
+        with self._lock:
+            self.durations.setdefault(task_name, deque(maxlen=self._history)).append(seconds)
+
+    def estimate_seconds(self, task_name: str) -> Optional[float]:
+        """Estimate a task's duration from its own history, else from every executed task."""
+        with self._lock:
+            samples = list(self.durations.get(task_name, ()))
+            if not samples:
+                samples = [seconds for history in self.durations.values() for seconds in history]
+        return sum(samples) / len(samples) if samples else None
+
+    def record_skip(self, task_name: str, guard: str):
+        estimate = self.estimate_seconds(task_name)
+        with self._lock:
+            self.skipped.append({
+                "task": task_name,
+                "guard": guard,
+                "estimated_seconds_saved": round(estimate, 3) if estimate is not None else None,
+                "timestamp": time.time()
+            })
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "tasks_executed": sum(len(history) for history in self.durations.values()),
+                "tasks_skipped": len(self.skipped),
+                "estimated_seconds_saved": round(
+                    sum(entry["estimated_seconds_saved"] or 0.0 for entry in self.skipped), 3
+                ),
+                "skipped": list(self.skipped)
+            }
+
+    def reset(self):
+        with self._lock:
+            self.durations.clear()
+            self.skipped.clear()
+
+
+# Process-wide record of managed task executions and guard skips
+run_metadata = RunMetadata()
+
+
+class ManagedTask(Task):
+    """Task with per-task controls over how it is executed inside a crew."""
+
+    context_token_budget: Optional[int] = Field(
+        default=None,
+        description="Maximum prompt tokens for the upstream context; None passes it through verbatim."
+    )
+    guards: List[Any] = Field(
+        default_factory=list,
+        description="TaskGuards checked in order before the task runs; the first that holds skips it."
+    )
+    similarity_cache: bool = Field(
+        default=False,
+        description="Let the installed SimilarityCache answer this task's LLM calls from near-duplicate prompts."
+    )
+
+    @property
+    def label(self) -> str:
+        """Short label for reports: the first line of the description."""
+        return self.description.strip().splitlines()[0]
+
+    def _assemble_context(self, upstream: List[Task]) -> str:
+        """Condense the outputs of the upstream tasks into the token budget."""
+        outputs = [
+            (task.agent.role if task.agent else "Upstream task", task.output.raw_output)
+            for task in upstream
+            if task.output is not None
+        ]
+        assembled = assemble_context(outputs, self.context_token_budget)
+        record_context_usage(self.label, self.context_token_budget, assembled)
+        return assembled.text
+
+    def _triggered_guard(self, context: Optional[str]) -> Optional[TaskGuard]:
+        """Return the first guard whose condition holds for the upstream outputs."""
+        if self.context:
+            upstream = [task.output.raw_output for task in self.context if task.output is not None]
+        else:
+            upstream = [context] if context else []
+        for guard in self.guards:
+            if guard.condition(upstream):
+                return guard
+        return None
+
+    def complete_without_llm(self, result: str) -> str:
+        """Record a result produced in Python as this task's output, as crewai does after an agent run."""
+        self.output = TaskOutput(description=self.description, exported_output=result, raw_output=result)
+        if self.callback:
+            self.callback(self.output)
+        return result
+
+    def _execute(self, agent, task, context, tools):
+        """Run the agent within its iteration budget, then record the output as crewai does."""
+        def run() -> str:
+            return agent.execute_task(task=task, context=context, tools=tools)
+
+        result = iteration_budgets.execute(agent, self.label, run) if iteration_budgets else run()
+        exported_output = self._export_output(result)
+        self.output = TaskOutput(description=self.description, exported_output=exported_output, raw_output=result)
+        if self.callback:
+            self.callback(self.output)
+        return exported_output
+
+    def execute(self, agent: Any = None, context: Optional[str] = None, tools: Optional[List[Any]] = None) -> str:
+        """Execute the task unless a guard skips it, assembling its context within the token budget."""
+        guard = self._triggered_guard(context) if self.guards else None
+        if guard is not None:
+            run_metadata.record_skip(self.label, guard.name)
+            return self.complete_without_llm(guard.template.format(guard=guard.name))
+
+        start = time.perf_counter()
+        # Near-duplicates are only matched against earlier calls from the same task
+        with similarity_scope(self.label if self.similarity_cache else None):
+            if not (self.context and self.context_token_budget):
+                result = super().execute(agent=agent, context=context, tools=tools)
+            else:
+                # Hand crewai the assembled string instead of letting it join every upstream output verbatim
+                upstream = self.context
+                self.context = None
+                try:
+                    result = super().execute(agent=agent, context=self._assemble_context(upstream), tools=tools)
+                finally:
+                    self.context = upstream
+        if not self.async_execution:
+            run_metadata.record_execution(self.label, time.perf_counter() - start)
+        return result
@@ -0,0 +1,286 @@
+from typing import Dict, Optional
+from collections import deque
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from completion_cache import merge_lookups
+from response_models import ChatResponse
+from percentiles import percentile
+
+# Worker processes are named with this prefix; spawn sets the name before it re-imports the main module
+WORKER_NAME_PREFIX = "crew-worker"
+
+
+class CrewWorkerError(RuntimeError):
+    """Raised when a crew job cannot be completed by a worker process."""
+
+    def __init__(self, message: str, reason: str = "error"):
+        super().__init__(message)
+        self.reason = reason
+
+
+def in_crew_worker() -> bool:
+    """Whether this process is one of the pool's crew workers."""
+    return multiprocessing.current_process().name.startswith(WORKER_NAME_PREFIX)
+
+
+def _worker_main(conn):
+    """Import the chatbot's crews once, then run product crews for the parent until told to stop.
+
+    Each response goes back as its compact JSON body plus the job's cache lookups and this
+    process's RSS, rather than as pickled crew objects.
+    """
+    import chatbot_app
+    from completion_cache import track_cache_lookups
+    from memory_instrumentation import rss_mb
+    from response_models import dumps
+
+    conn.send(("ready", os.getpid(), rss_mb()))
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message[0] == "stop":
+            return
+        _, job_id, product, query_type = message
+        try:
+            with track_cache_lookups() as lookups:
+                response = chatbot_app.generate_product_response(product, query_type)
+            conn.send(("ok", job_id, dumps(response), lookups, rss_mb()))
+        except Exception as e:
+            conn.send(("error", job_id, f"{type(e).__name__}: {e}", {}, rss_mb()))
+
+
+class _Worker:
+    def __init__(self, context, name: str):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), name=name, daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.name = name
+        self.jobs = 0
+        self.rss_mb = 0.0
+
+    def stop(self, timeout: float = 5.0):
+        """Ask the worker to exit after its current job, killing it if it does not."""
+        try:
+            self.conn.send(("stop",))
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1.0)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+        self.conn.close()
+
+
+class CrewWorkerPool:
+    """Runs the chatbot's product crews in pre-warmed worker processes.
+
+    Each worker imports crewai and the crew definitions before it takes jobs, so requests never
+    pay for startup. A request thread checks out an idle worker, sends it the job and waits on
+    the pipe, which releases the GIL; the worker returns the response's JSON body. A job whose
+    queue wait plus run time overruns ``job_timeout`` gets its worker killed, and a worker that dies takes only its own
+    job down; both are replaced in the background. Workers are also recycled after
+    ``max_jobs_per_worker`` jobs or once their RSS exceeds ``max_rss_mb``.
+    """
+
+    def __init__(self, workers: int = 2, job_timeout: float = 120.0, max_jobs_per_worker: int = 100,
+                 max_rss_mb: Optional[float] = None, startup_timeout: float = 120.0, history: int = 1000):
+        self.size = workers
+        self.job_timeout = job_timeout
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_rss_mb = max_rss_mb
+        self.startup_timeout = startup_timeout
+        # Spawned, not forked: the web process runs threads that a fork would copy mid-operation
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._names = itertools.count(1)
+        self._job_ids = itertools.count(1)
+        self._closed = False
+        self.live: Dict[str, _Worker] = {}
+        self.counts = {"jobs": 0, "ok": 0, "errors": 0, "timeouts": 0, "crashes": 0, "started": 0,
+                       "start_failures": 0, "recycled_jobs": 0, "recycled_memory": 0}
+        self._job_times: deque = deque(maxlen=history)
+        self._wait_times: deque = deque(maxlen=history)
+        self._payload_bytes: deque = deque(maxlen=history)
+        for _ in range(workers):
+            self._replace()
+
+    @classmethod
+    def from_env(cls) -> Optional["CrewWorkerPool"]:
+        """Pool configured by ``CREW_WORKER_*`` variables, or None unless ``CREW_WORKERS`` is above 0.
+
+        Also None inside a crew worker, so a worker importing the chatbot does not start a pool of its own.
+        """
+        workers = int(os.getenv("CREW_WORKERS", "0") or 0)
+        if workers <= 0 or in_crew_worker():
+            return None
+        max_rss = os.getenv("CREW_WORKER_MAX_RSS_MB")
+        return cls(
+            workers=workers,
+            job_timeout=float(os.getenv("CREW_WORKER_JOB_TIMEOUT", "120")),
+            max_jobs_per_worker=int(os.getenv("CREW_WORKER_MAX_JOBS", "100")),
+            max_rss_mb=float(max_rss) if max_rss else None
+        )
+
+    def _start(self):
+        """Start one worker and hand it out once it has imported the crews."""
+        while not self._closed:
+            worker = _Worker(self._context, f"{WORKER_NAME_PREFIX}-{next(self._names)}")
+            try:
+                ready = worker.conn.poll(self.startup_timeout) and worker.conn.recv()[0] == "ready"
+            except (EOFError, OSError):
+                ready = False
+            if ready:
+                with self._lock:
+                    self.counts["started"] += 1
+                    self.live[worker.name] = worker
+                self._idle.put(worker)
+                return
+            print(f"Crew worker {worker.name} failed to start; retrying")
+            worker.kill()
+            with self._lock:
+                self.counts["start_failures"] += 1
+            time.sleep(1.0)
+
+    def _replace(self, worker: Optional[_Worker] = None, kill: bool = False):
+        """Retire a worker (if any) and start its replacement, both off the request thread."""
+        def run():
+            if worker is not None:
+                with self._lock:
+                    self.live.pop(worker.name, None)
+                if kill:
+                    worker.kill()
+                else:
+                    worker.stop()
+            self._start()
+
+        threading.Thread(target=run, name="crew-worker-start", daemon=True).start()
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def run(self, product: str, query_type: str):
+        """Run the product crew in a worker and return its ChatResponse, or raise CrewWorkerError."""
+        self._count("jobs")
+        start = time.perf_counter()
+        try:
+            worker = self._idle.get(timeout=self.job_timeout)
+        except queue.Empty:
+            self._count("timeouts")
+            raise CrewWorkerError(f"No crew worker became free within {self.job_timeout}s", "timeout")
+        waited = time.perf_counter() - start
+        self._wait_times.append(waited)
+        # The job gets whatever the wait for a worker left of the timeout; with nothing left, the
+        # healthy worker goes back to the pool instead of being killed right after the dispatch
+        remaining = self.job_timeout - waited
+        if remaining <= 0:
+            self._idle.put(worker)
+            self._count("timeouts")
+            raise CrewWorkerError(f"No crew worker became free within {self.job_timeout}s", "timeout")
+
+        job_id = next(self._job_ids)
+        try:
+            worker.conn.send(("run", job_id, product, query_type))
+            if not worker.conn.poll(remaining):
+                self._count("timeouts")
+                self._replace(worker, kill=True)
+                raise CrewWorkerError(f"Crew for {product} ({query_type}) exceeded {self.job_timeout}s", "timeout")
+            status, _, payload, lookups, rss = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            self._count("crashes")
+            self._replace(worker, kill=True)
+            raise CrewWorkerError(f"Crew worker {worker.name} died running {product} ({query_type}): {e!r}", "crash")
+
+        worker.jobs += 1
+        worker.rss_mb = rss
+        if self.max_rss_mb is not None and rss > self.max_rss_mb:
+            self._count("recycled_memory")
+            self._replace(worker)
+        elif worker.jobs >= self.max_jobs_per_worker:
+            self._count("recycled_jobs")
+            self._replace(worker)
+        else:
+            self._idle.put(worker)
+
+        merge_lookups(lookups)
+        if status != "ok":
+            self._count("errors")
+            raise CrewWorkerError(payload)
+        self._count("ok")
+        self._job_times.append(time.perf_counter() - start)
+        self._payload_bytes.append(len(payload))
+        return ChatResponse.from_dict(json.loads(payload))
+
+    def close(self):
+        """Stop every worker."""
+        self._closed = True
+        with self._lock:
+            workers = list(self.live.values())
+            self.live.clear()
+        for worker in workers:
+            worker.stop()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            job_times = sorted(self._job_times)
+            wait_times = sorted(self._wait_times)
+            payloads = list(self._payload_bytes)
+            return {
+                "settings": {"workers": self.size, "job_timeout": self.job_timeout,
+                             "max_jobs_per_worker": self.max_jobs_per_worker, "max_rss_mb": self.max_rss_mb},
+                **self.counts,
+                "idle": self._idle.qsize(),
+                "workers": {name: {"pid": worker.process.pid, "jobs": worker.jobs, "rss_mb": round(worker.rss_mb, 1)}
+                            for name, worker in self.live.items()},
+                "job_seconds_p50": round(percentile(job_times, 0.5), 3) if job_times else None,
+                "job_seconds_p95": round(percentile(job_times, 0.95), 3) if job_times else None,
+                "wait_seconds_p95": round(percentile(wait_times, 0.95), 3) if wait_times else None,
+                "mean_payload_bytes": round(sum(payloads) / len(payloads)) if payloads else None
+            }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run chatbot crews on the worker pool and report its stats.")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--max-jobs-per-worker", type=int, default=5)
+    parser.add_argument("--job-timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    # Offline by default: the workers' crews run on the stub LLM
+    os.environ.setdefault("LLM_PROVIDER", "stub")
+    pool = CrewWorkerPool(workers=args.workers, job_timeout=args.job_timeout,
+                          max_jobs_per_worker=args.max_jobs_per_worker)
+    products = ["iPhone", "Samsung Galaxy", "Google Pixel"]
+    query_types = ["price", "availability", "rating", "market", "comprehensive"]
+
+    def job(index: int):
+        try:
+            pool.run(products[index % len(products)], query_types[index % len(query_types)])
+        except CrewWorkerError as e:
+            print(f"Job {index} failed ({e.reason}): {e}")
+
+    threads = [threading.Thread(target=job, args=(index,)) for index in range(args.jobs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pool.close()
+    print(json.dumps(pool.snapshot(), indent=2))
@@ -1,171 +1,63 @@
 from crewai import Agent, Task, Crew, Process
-from crewai.tools import BaseTool
-from typing import Dict, List, Optional
+from langchain.tools import BaseTool
+from typing import Dict, List, Optional, Union
+import argparse
 import json
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+from data_sources import get_data_source
+from completion_cache import install_completion_cache
+from crew_tasks import ManagedTask
+from iteration_budget import iteration_budgets
+from llm_config import build_llm
+from product_catalog import keyed_records, parse_products
 
-# Custom tool classes
-class ProductDataTool(BaseTool):
-    name: str = "Fetch Product Data"
-    description: str = "Fetch product pricing, availability, and rating for a given product name."
-    
-    def _run(self, product: str) -> str:
+# Reuse completions from earlier runs and other processes
+install_completion_cache()
+
+# Custom tool classes; each call looks up one product or a whole list in a single bulk fetch
+class ProductBatchTool(BaseTool):
+    """Base for the product tools: fetches ``dataset`` records for one or many products."""
+
+    dataset: str = ""
+
+    def _run(self, product: Union[str, List[str]]) -> str:
         """Run the tool."""
-        data = self._fetch_product_data(product)
-        return json.dumps(data)
-    
-    def _fetch_product_data(self, product: str) -> Dict:
-        """Fetch product data from a simulated database."""
-        product_db = {
-            "iphone": {
-                "product": "iPhone",
-                "price": "$999",
-                "availability": "In Stock",
-                "rating": 4.8
-            },
-            "samsung galaxy": {
-                "product": "Samsung Galaxy",
-                "price": "$899",
-                "availability": "In Stock",
-                "rating": 4.6
-            },
-            "google pixel": {
-                "product": "Google Pixel",
-                "price": "$799",
-                "availability": "Limited Stock",
-                "rating": 4.5
-            }
-        }
-        
-        return product_db.get(product.lower(), {
-            "product": product,
-            "price": "$199",
-            "availability": "Out of Stock",
-            "rating": 3.5
-        })
+        records = get_data_source().fetch_many(self.dataset, parse_products(product))
+        return json.dumps(keyed_records(list(records.values())))
+
+    async def _arun(self, product: Union[str, List[str]]) -> str:
+        """Run the tool without blocking the event loop."""
+        records = await get_data_source().afetch_many(self.dataset, parse_products(product))
+        return json.dumps(keyed_records(list(records.values())))
+
+
+class ProductDataTool(ProductBatchTool):
+    name: str = "Fetch Product Data"
+    description: str = ("Fetch product pricing, availability, and rating for one product name or a list of "
+                        "product names; several products come back keyed by name.")
+    dataset: str = "product_data"
 
 
-class MarketTrendsTool(BaseTool):
+class MarketTrendsTool(ProductBatchTool):
     name: str = "Fetch Market Trends"
-    description: str = "Fetch trend status and popularity metrics for the given product name."
-    
-    def _run(self, product: str) -> str:
-        """Run the tool."""
-        data = self._fetch_market_trends(product)
-        return json.dumps(data)
-    
-    def _fetch_market_trends(self, product: str) -> Dict:
-        """Fetch market trends from a simulated database."""
-        trends_db = {
-            "iphone": {
-                "product": "iPhone",
-                "trend": "Rising",
-                "popularity_score": 92,
-                "monthly_searches": 45000
-            },
-            "samsung galaxy": {
-                "product": "Samsung Galaxy",
-                "trend": "Stable",
-                "popularity_score": 85,
-                "monthly_searches": 38000
-            },
-            "google pixel": {
-                "product": "Google Pixel",
-                "trend": "Rising",
-                "popularity_score": 78,
-                "monthly_searches": 25000
-            }
-        }
-        
-        return trends_db.get(product.lower(), {
-            "product": product,
-            "trend": "Stable",
-            "popularity_score": 70,
-            "monthly_searches": 12000
-        })
+    description: str = ("Fetch trend status and popularity metrics for one product name or a list of "
+                        "product names; several products come back keyed by name.")
+    dataset: str = "market_trends"
 
 
-class CompetitorAnalysisTool(BaseTool):
+class CompetitorAnalysisTool(ProductBatchTool):
     name: str = "Get Competitor Analysis"
-    description: str = "Get competitive analysis data for a specific product."
-    
-    def _run(self, product: str) -> str:
-        """Run the tool."""
-        data = self._get_competitor_analysis(product)
-        return json.dumps(data)
-    
-    def _get_competitor_analysis(self, product: str) -> Dict:
-        """Get competitor analysis from a simulated database."""
-        competitor_db = {
-            "iphone": {
-                "product": "iPhone",
-                "main_competitors": ["Samsung Galaxy", "Google Pixel", "Xiaomi"],
-                "market_share": "23%",
-                "competitive_advantage": "Brand loyalty and ecosystem integration"
-            },
-            "samsung galaxy": {
-                "product": "Samsung Galaxy",
-                "main_competitors": ["iPhone", "Google Pixel", "OnePlus"],
-                "market_share": "19%",
-                "competitive_advantage": "Hardware innovation and display technology"
-            },
-            "google pixel": {
-                "product": "Google Pixel",
-                "main_competitors": ["iPhone", "Samsung Galaxy", "OnePlus"],
-                "market_share": "8%",
-                "competitive_advantage": "Camera technology and software experience"
-            }
-        }
-        
-        return competitor_db.get(product.lower(), {
-            "product": product,
-            "main_competitors": ["Various brands"],
-            "market_share": "5%",
-            "competitive_advantage": "Price point"
-        })
+    description: str = ("Get competitive analysis data for one product name or a list of product names; "
+                        "several products come back keyed by name.")
+    dataset: str = "competitor_analysis"
 
 
-class CustomerFeedbackTool(BaseTool):
+class CustomerFeedbackTool(ProductBatchTool):
     name: str = "Get Customer Feedback"
-    description: str = "Get summarized customer feedback for a specific product."
-    
-    def _run(self, product: str) -> str:
-        """Run the tool."""
-        data = self._get_customer_feedback(product)
-        return json.dumps(data)
-    
-    def _get_customer_feedback(self, product: str) -> Dict:
-        """Get customer feedback from a simulated database."""
-        feedback_db = {
-            "iphone": {
-                "product": "iPhone",
-                "positive_points": ["Camera quality", "Performance", "Ecosystem"],
-                "negative_points": ["Battery life", "Price", "Charging speed"],
-                "common_issues": ["Screen durability", "Storage limitations"],
-                "satisfaction_score": 87
-            },
-            "samsung galaxy": {
-                "product": "Samsung Galaxy",
-                "positive_points": ["Display quality", "Customization", "Camera versatility"],
-                "negative_points": ["Software updates", "Bloatware"],
-                "common_issues": ["Battery degradation", "Overheating during gaming"],
-                "satisfaction_score": 83
-            },
-            "google pixel": {
-                "product": "Google Pixel",
-                "positive_points": ["Camera quality", "Clean software", "Updates"],
-                "negative_points": ["Battery life", "Limited availability"],
-                "common_issues": ["Screen brightness", "Overheating"],
-                "satisfaction_score": 81
-            }
-        }
-        
-        return feedback_db.get(product.lower(), {
-            "product": product,
-            "positive_points": ["Affordable", "Basic functionality"],
-            "negative_points": ["Performance", "Build quality"],
-            "common_issues": ["Short lifespan", "Limited support"],
-            "satisfaction_score": 65
-        })
+    description: str = ("Get summarized customer feedback for one product name or a list of product names; "
+                        "several products come back keyed by name.")
+    dataset: str = "customer_feedback"
 
 
 # Initialize tools
@@ -174,62 +66,147 @@ market_trends_tool = MarketTrendsTool()
 competitor_analysis_tool = CompetitorAnalysisTool()
 customer_feedback_tool = CustomerFeedbackTool()
 
-# Define agents
-market_analyst = Agent(
-    role="Market Research Analyst",
-    goal="Analyze market trends and provide strategic insights",
-    backstory="""You are an experienced market analyst with expertise in 
-    consumer electronics. You provide detailed analysis of product performance 
-    and market trends to help guide business decisions.""",
-    verbose=True,
-    tools=[market_trends_tool, competitor_analysis_tool]
-)
-
-product_specialist = Agent(
-    role="Product Specialist",
-    goal="Analyze product specifications and consumer demand",
-    backstory="""You are a product specialist with deep knowledge of consumer 
-    electronics. Your expertise helps companies understand product details
-    and market positioning.""",
-    verbose=True,
-    tools=[product_data_tool, customer_feedback_tool]
-)
-
-# Define tasks
-market_analysis_task = Task(
-    description="""Analyze the smartphone market trends with a focus on iPhone, Samsung Galaxy, and Google Pixel.
-    Be sure to include:
-    1. Current trend status for all three products
-    2. Popularity score interpretation
-    3. Monthly search volume comparison
-    4. Competitive landscape analysis
-    Your analysis should be comprehensive and backed by data.
-    """,
-    agent=market_analyst
-)
-
-product_analysis_task = Task(
-    description="""Analyze the iPhone, Samsung Galaxy, and Google Pixel product details and customer feedback.
-    Focus on:
-    1. Price point comparison
-    2. Availability status
-    3. Customer rating and satisfaction scores
-    4. Key positive and negative feedback points
-    Compare these products and identify their strengths and weaknesses.
-    """,
-    agent=product_specialist
-)
-
-# Create crew
-smartphone_analysis_crew = Crew(
-    agents=[market_analyst, product_specialist],
-    tasks=[market_analysis_task, product_analysis_task],
-    verbose=2,
-    process=Process.sequential
-)
+
+def create_analysis_crew(llm=None, verbose: bool = True) -> Crew:
+    """Create the market analyst and product specialist crew for iPhone, Samsung Galaxy and Google Pixel."""
+    # One chat model shared by the agents (LLM_PROVIDER=stub runs offline)
+    llm = llm or build_llm()
+
+    # Define agents
+    market_analyst = Agent(
+        role="Market Research Analyst",
+        goal="Analyze market trends and provide strategic insights",
+        backstory="""You are an experienced market analyst with expertise in 
+        consumer electronics. You provide detailed analysis of product performance 
+        and market trends to help guide business decisions.""",
+        verbose=verbose,
+        llm=llm,
+        tools=[market_trends_tool, competitor_analysis_tool]
+    )
+
+    product_specialist = Agent(
+        role="Product Specialist",
+        goal="Analyze product specifications and consumer demand",
+        backstory="""You are a product specialist with deep knowledge of consumer 
+        electronics. Your expertise helps companies understand product details
+        and market positioning.""",
+        verbose=verbose,
+        llm=llm,
+        tools=[product_data_tool, customer_feedback_tool]
+    )
+
+    # Define tasks
+    market_analysis_task = ManagedTask(
+        description="""Analyze the smartphone market trends with a focus on iPhone, Samsung Galaxy, and Google Pixel.
+        Be sure to include:
+        1. Current trend status for all three products
+        2. Popularity score interpretation
+        3. Monthly search volume comparison
+        4. Competitive landscape analysis
+        Each tool accepts a list of products, so look up all three products in one call per tool.
+        Your analysis should be comprehensive and backed by data.
+        """,
+        expected_output="""A market trend analysis comparing the trend status, popularity scores and monthly
+        search volumes of iPhone, Samsung Galaxy and Google Pixel, with their competitive landscape.""",
+        agent=market_analyst
+    )
+
+    product_analysis_task = ManagedTask(
+        description="""Analyze the iPhone, Samsung Galaxy, and Google Pixel product details and customer feedback.
+        Focus on:
+        1. Price point comparison
+        2. Availability status
+        3. Customer rating and satisfaction scores
+        4. Key positive and negative feedback points
+        Compare these products and identify their strengths and weaknesses.
+        Each tool accepts a list of products, so look up all three products in one call per tool.
+        """,
+        expected_output="""A product comparison of iPhone, Samsung Galaxy and Google Pixel covering price,
+        availability, ratings, satisfaction scores and key customer feedback, with each product's strengths
+        and weaknesses.""",
+        agent=product_specialist
+    )
+
+    # Create crew
+    return Crew(
+        agents=[market_analyst, product_specialist],
+        tasks=[market_analysis_task, product_analysis_task],
+        verbose=2 if verbose else 0,
+        process=Process.sequential
+    )
+
+
+smartphone_analysis_crew = create_analysis_crew()
+market_analyst, product_specialist = smartphone_analysis_crew.agents
+market_analysis_task, product_analysis_task = smartphone_analysis_crew.tasks
+
+class LLMCallCounter(BaseCallbackHandler):
+    """Counts model calls, i.e. the agent's ReAct iterations."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.calls += 1
+
+
+# How the tools described themselves when they took a single product
+SINGLE_PRODUCT_DESCRIPTIONS = {
+    MarketTrendsTool: "Fetch trend status and popularity metrics for the given product name.",
+    CompetitorAnalysisTool: "Get competitive analysis data for a specific product."
+}
+
+
+def measure_batching(runs: int = 1) -> Dict:
+    """LLM iterations and wall time of the market analysis task, single-product versus batched tools.
+
+    Both variants run the same task with a fresh agent; the single-product one gets the tools'
+    old descriptions, so the agent fetches one product per call as it did before batching.
+    """
+    # Measure the agent loop, not completions replayed from the cache
+    from langchain.globals import set_llm_cache
+    set_llm_cache(None)
+    report = {}
+    for label, batched in (("single_product", False), ("batched", True)):
+        calls, seconds = [], []
+        for _ in range(runs):
+            counter = LLMCallCounter()
+            run_llm = build_llm()
+            run_llm.callbacks = [counter]
+            tools = [tool_class() if batched else tool_class(description=description)
+                     for tool_class, description in SINGLE_PRODUCT_DESCRIPTIONS.items()]
+            agent = Agent(role=market_analyst.role, goal=market_analyst.goal, backstory=market_analyst.backstory,
+                          verbose=False, llm=run_llm, tools=tools)
+            description = market_analysis_task.description
+            if not batched:
+                description = "\n".join(line for line in description.splitlines() if "accepts a list" not in line)
+            task = Task(description=description, agent=agent)
+            start = time.perf_counter()
+            Crew(agents=[agent], tasks=[task], process=Process.sequential).kickoff()
+            seconds.append(time.perf_counter() - start)
+            calls.append(counter.calls)
+        report[label] = {
+            "llm_iterations": round(sum(calls) / runs, 1),
+            "wall_seconds": round(sum(seconds) / runs, 2)
+        }
+    report["iterations_saved"] = round(report["single_product"]["llm_iterations"] - report["batched"]["llm_iterations"], 1)
+    return report
+
 
 # Execute crew
 if __name__ == "__main__":
-    result = smartphone_analysis_crew.kickoff()
-    print("\n==== Custom Tools CrewAI POC Results ====\n")
-    print(result) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the custom tools crew.")
+    parser.add_argument("--measure-batching", action="store_true",
+                        help="Compare LLM iterations and wall time of single-product and batched tool calls")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.measure_batching:
+        print(json.dumps(measure_batching(args.runs), indent=2))
+    else:
+        result = smartphone_analysis_crew.kickoff()
+        print("\n==== Custom Tools CrewAI POC Results ====\n")
+        print(result)
+        if iteration_budgets:
+            print("\n==== Iteration Budgets ====\n")
+            print(json.dumps(iteration_budgets.snapshot(), indent=2)) 
\ No newline at end of file
@@ -0,0 +1,502 @@
+from typing import Dict, List, Optional, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, urlencode, parse_qs
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+import product_catalog
+from percentiles import percentile_ms
+
+# Datasets every data source must be able to serve, mapped to their catalog lookups
+DATASETS = {
+    "product_data": product_catalog.get_product_data,
+    "market_trends": product_catalog.get_market_trends,
+    "competitor_analysis": product_catalog.get_competitor_analysis,
+    "customer_feedback": product_catalog.get_customer_feedback
+}
+
+# HTTP statuses worth retrying; everything else is returned to the caller as an error
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class DataSourceError(Exception):
+    """Raised when an upstream data source cannot serve a request."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class LatencyStats:
+    """Thread-safe latency and error counters per upstream."""
+
+    def __init__(self, window: int = 2048):
+        self._window = window
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, upstream: str, seconds: float, ok: bool, attempts: int = 1):
+        """Record one logical request (including its retries) against an upstream."""
+        with self._lock:
+            samples = self._samples.setdefault(upstream, deque(maxlen=self._window))
+            samples.append(seconds)
+            counts = self._counts.setdefault(upstream, {"requests": 0, "errors": 0, "retries": 0})
+            counts["requests"] += 1
+            counts["retries"] += attempts - 1
+            if not ok:
+                counts["errors"] += 1
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Return request counts and latency percentiles (in ms) for every upstream."""
+        with self._lock:
+            result = {}
+            for upstream, samples in self._samples.items():
+                ordered = sorted(samples)
+                result[upstream] = {
+                    **self._counts[upstream],
+                    "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+                    "p50_ms": percentile_ms(ordered, 0.50),
+                    "p95_ms": percentile_ms(ordered, 0.95),
+                    "p99_ms": percentile_ms(ordered, 0.99)
+                }
+            return result
+
+    def reset(self):
+        """Forget every recorded sample."""
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+
+class DataSource:
+    """Base adapter that the product tools use to look up their datasets."""
+
+    name = "data_source"
+
+    def __init__(self, stats: Optional[LatencyStats] = None):
+        self.stats = stats or LatencyStats()
+
+    def fetch(self, dataset: str, product: str) -> Dict:
+        """Fetch one record synchronously."""
+        raise NotImplementedError
+
+    async def afetch(self, dataset: str, product: str) -> Dict:
+        """Fetch one record without blocking the event loop."""
+        return await asyncio.to_thread(self.fetch, dataset, product)
+
+    def fetch_many(self, dataset: str, products: List[str]) -> Dict[str, Dict]:
+        """Fetch the records of several products, keyed by the names asked for."""
+        return {product: self.fetch(dataset, product) for product in dict.fromkeys(products)}
+
+    async def afetch_many(self, dataset: str, products: List[str]) -> Dict[str, Dict]:
+        """Fetch several records concurrently without blocking the event loop."""
+        products = list(dict.fromkeys(products))
+        records = await asyncio.gather(*(self.afetch(dataset, product) for product in products))
+        return dict(zip(products, records))
+
+    def close(self):
+        """Release any pooled resources."""
+
+
+class CatalogDataSource(DataSource):
+    """Serves the datasets straight from the in-process product catalog."""
+
+    name = "catalog"
+
+    def fetch(self, dataset: str, product: str) -> Dict:
+        """Look the record up in the product catalog."""
+        if dataset not in DATASETS:
+            raise DataSourceError(f"Unknown dataset: {dataset}")
+        start = time.perf_counter()
+        record = DATASETS[dataset](product)
+        self.stats.record(self.name, time.perf_counter() - start, True)
+        return record
+
+    async def afetch(self, dataset: str, product: str) -> Dict:
+        """Catalog lookups never block, so run them inline."""
+        return self.fetch(dataset, product)
+
+    def fetch_many(self, dataset: str, products: List[str]) -> Dict[str, Dict]:
+        """Look every record up in one pass, recorded as a single lookup."""
+        if dataset not in DATASETS:
+            raise DataSourceError(f"Unknown dataset: {dataset}")
+        start = time.perf_counter()
+        lookup = DATASETS[dataset]
+        records = {product: lookup(product) for product in dict.fromkeys(products)}
+        self.stats.record(self.name, time.perf_counter() - start, True)
+        return records
+
+    async def afetch_many(self, dataset: str, products: List[str]) -> Dict[str, Dict]:
+        return self.fetch_many(dataset, products)
+
+
+class _ConnectionPool:
+    """LIFO pool of keep-alive HTTP connections to a single host."""
+
+    def __init__(self, host: str, port: int, size: int, timeout: float):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+
+    def acquire(self) -> http.client.HTTPConnection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def release(self, conn: http.client.HTTPConnection):
+        if self._idle.qsize() < self.size:
+            self._idle.put(conn)
+        else:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class _AsyncConnectionPool:
+    """Keep-alive HTTP/1.1 connections for one event loop."""
+
+    def __init__(self, host: str, port: int, size: int, timeout: float, max_concurrency: int):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self._idle = []
+
+    async def request(self, path: str) -> Tuple[int, Dict[str, str], bytes]:
+        if self._idle:
+            reader, writer = self._idle.pop()
+        else:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout
+            )
+        try:
+            status, headers, body = await asyncio.wait_for(
+                self._roundtrip(reader, writer, path), self.timeout
+            )
+        except BaseException:
+            writer.close()
+            raise
+        if headers.get("connection", "").lower() == "close" or len(self._idle) >= self.size:
+            writer.close()
+        else:
+            self._idle.append((reader, writer))
+        return status, headers, body
+
+    async def _roundtrip(self, reader, writer, path: str):
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+            f"Connection: keep-alive\r\nAccept: application/json\r\n\r\n".encode("latin-1")
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Upstream closed the connection")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        if "content-length" not in headers:
+            raise DataSourceError("Upstream response has no Content-Length", status)
+        body = await reader.readexactly(int(headers["content-length"]))
+        return status, headers, body
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+class HTTPDataSource(DataSource):
+    """Fetches datasets from an upstream HTTP service with pooling, retries and concurrency limits.
+
+    Records are requested as ``GET <base_url>/<dataset>?product=<name>`` and must come back as JSON.
+    """
+
+    def __init__(self, base_url: str, pool_size: int = 8, max_concurrency: int = 8, retries: int = 3,
+                 backoff_base: float = 0.05, backoff_max: float = 2.0, timeout: float = 5.0,
+                 stats: Optional[LatencyStats] = None):
+        super().__init__(stats)
+        parts = urlsplit(base_url)
+        self.name = parts.netloc
+        self.base_path = parts.path.rstrip("/")
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._host = parts.hostname
+        self._port = parts.port or 80
+        self._pool = _ConnectionPool(self._host, self._port, pool_size, timeout)
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._async_pools: Dict[asyncio.AbstractEventLoop, _AsyncConnectionPool] = {}
+        self._fan_out: Optional[ThreadPoolExecutor] = None
+        self._fan_out_lock = threading.Lock()
+
+    def _path(self, dataset: str, product: str) -> str:
+        return f"{self.base_path}/{dataset}?{urlencode({'product': product})}"
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After hint."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    def _give_up(self, start: float, attempt: int, status: Optional[int], error: DataSourceError):
+        """Record the failed request and raise if it should not be retried."""
+        if (status is not None and status not in RETRYABLE_STATUSES) or attempt >= self.retries:
+            self.stats.record(self.name, time.perf_counter() - start, False, attempt + 1)
+            raise error
+
+    def fetch(self, dataset: str, product: str) -> Dict:
+        """Fetch one record, retrying transient failures with jittered backoff."""
+        path = self._path(dataset, product)
+        attempt = 0
+        with self._semaphore:
+            start = time.perf_counter()
+            while True:
+                conn = self._pool.acquire()
+                try:
+                    conn.request("GET", path, headers={"Connection": "keep-alive", "Accept": "application/json"})
+                    response = conn.getresponse()
+                    body = response.read()
+                except (OSError, http.client.HTTPException) as e:
+                    conn.close()
+                    status, retry_after = None, None
+                    error = DataSourceError(f"Upstream {self.name} unavailable: {e}")
+                else:
+                    if response.will_close:
+                        conn.close()
+                    else:
+                        self._pool.release(conn)
+                    status, retry_after = response.status, response.getheader("Retry-After")
+                    if status == 200:
+                        self.stats.record(self.name, time.perf_counter() - start, True, attempt + 1)
+                        return json.loads(body)
+                    error = DataSourceError(f"Upstream {self.name} returned HTTP {status}", status)
+                self._give_up(start, attempt, status, error)
+                time.sleep(self._backoff(attempt, retry_after))
+                attempt += 1
+
+    def fetch_many(self, dataset: str, products: List[str]) -> Dict[str, Dict]:
+        """Fetch several records in parallel over the connection pool."""
+        products = list(dict.fromkeys(products))
+        if len(products) <= 1:
+            return super().fetch_many(dataset, products)
+        if self._fan_out is None:
+            with self._fan_out_lock:
+                if self._fan_out is None:
+                    self._fan_out = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                                       thread_name_prefix="data-source")
+        records = self._fan_out.map(lambda product: self.fetch(dataset, product), products)
+        return dict(zip(products, records))
+
+    def _async_pool(self) -> _AsyncConnectionPool:
+        loop = asyncio.get_running_loop()
+        pool = self._async_pools.get(loop)
+        if pool is None:
+            pool = _AsyncConnectionPool(self._host, self._port, self.pool_size, self.timeout, self.max_concurrency)
+            self._async_pools[loop] = pool
+        return pool
+
+    async def afetch(self, dataset: str, product: str) -> Dict:
+        """Async counterpart of ``fetch`` using a per-event-loop connection pool."""
+        pool = self._async_pool()
+        path = self._path(dataset, product)
+        attempt = 0
+        async with pool.semaphore:
+            start = time.perf_counter()
+            while True:
+                try:
+                    status, headers, body = await pool.request(path)
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, DataSourceError) as e:
+                    status, retry_after = None, None
+                    error = DataSourceError(f"Upstream {self.name} unavailable: {e}")
+                else:
+                    retry_after = headers.get("retry-after")
+                    if status == 200:
+                        self.stats.record(self.name, time.perf_counter() - start, True, attempt + 1)
+                        return json.loads(body)
+                    error = DataSourceError(f"Upstream {self.name} returned HTTP {status}", status)
+                self._give_up(start, attempt, status, error)
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+                attempt += 1
+
+    async def aclose(self):
+        """Close the keep-alive connections owned by the running event loop."""
+        pool = self._async_pools.pop(asyncio.get_running_loop(), None)
+        if pool is not None:
+            pool.close()
+
+    def close(self):
+        self._pool.close()
+        if self._fan_out is not None:
+            self._fan_out.shutdown(wait=False)
+            self._fan_out = None
+        for loop, pool in list(self._async_pools.items()):
+            if not loop.is_closed():
+                pool.close()
+        self._async_pools.clear()
+
+
+# Process-wide data source used by the tools; PRODUCT_DATA_URL switches it to an HTTP upstream
+_data_source: Optional[DataSource] = None
+_data_source_lock = threading.Lock()
+
+
+def get_data_source() -> DataSource:
+    """Return the configured data source, creating it on first use."""
+    global _data_source
+    if _data_source is None:
+        with _data_source_lock:
+            if _data_source is None:
+                url = os.getenv("PRODUCT_DATA_URL")
+                _data_source = HTTPDataSource(url) if url else CatalogDataSource()
+    return _data_source
+
+
+def set_data_source(source: DataSource) -> Optional[DataSource]:
+    """Install a different data source for the tools and return the previous one."""
+    global _data_source
+    with _data_source_lock:
+        previous, _data_source = _data_source, source
+    return previous
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Serves catalog records over HTTP with configurable latency and failures."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        parts = urlsplit(self.path)
+        dataset = parts.path.rsplit("/", 1)[-1]
+        product = parse_qs(parts.query).get("product", [""])[0]
+
+        if random.random() < server.failure_rate:
+            self._send(503, {"error": "injected failure"}, {"Retry-After": "0"})
+        elif dataset not in DATASETS:
+            self._send(404, {"error": f"unknown dataset {dataset}"})
+        else:
+            self._send(200, DATASETS[dataset](product))
+
+    def _send(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0,
+                      failure_rate: float = 0.0) -> ThreadingHTTPServer:
+    """Start a local HTTP stub of the upstream data service in a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _StubHandler)
+    server.daemon_threads = True
+    server.latency = latency_ms / 1000.0
+    server.failure_rate = failure_rate
+    threading.Thread(target=server.serve_forever, daemon=True, name="data-source-stub").start()
+    return server
+
+
+def _benchmark(args):
+    """Drive the stub with the sync and async adapters and print latency stats."""
+    server = start_stub_server(latency_ms=args.latency_ms, failure_rate=args.failure_rate)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    products = product_catalog.list_products() + ["Unknown Phone"]
+    datasets = list(DATASETS)
+    jobs = [(datasets[i % len(datasets)], products[(i // len(datasets)) % len(products)])
+            for i in range(args.requests)]
+    print(f"Stub upstream at {base_url} (latency {args.latency_ms}ms, failure rate {args.failure_rate})")
+
+    source = HTTPDataSource(base_url, pool_size=args.concurrency, max_concurrency=args.concurrency)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(lambda job: source.fetch(*job), jobs))
+    sync_elapsed = time.perf_counter() - start
+    sync_stats = source.stats.snapshot()[source.name]
+    source.stats.reset()
+
+    async def run_async():
+        try:
+            return await asyncio.gather(*(source.afetch(*job) for job in jobs))
+        finally:
+            await source.aclose()
+
+    start = time.perf_counter()
+    asyncio.run(run_async())
+    async_elapsed = time.perf_counter() - start
+    async_stats = source.stats.snapshot()[source.name]
+    source.close()
+    server.shutdown()
+
+    report = {
+        "sync": {"requests_per_second": round(len(jobs) / sync_elapsed, 1), **sync_stats},
+        "async": {"requests_per_second": round(len(jobs) / async_elapsed, 1), **async_stats}
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Data source adapters for the product tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Run the HTTP stub of the upstream data service")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--latency-ms", type=float, default=0.0)
+    serve_parser.add_argument("--failure-rate", type=float, default=0.0)
+
+    bench_parser = subparsers.add_parser("bench", help="Benchmark the HTTP adapter against the local stub")
+    bench_parser.add_argument("--requests", type=int, default=2000)
+    bench_parser.add_argument("--concurrency", type=int, default=16)
+    bench_parser.add_argument("--latency-ms", type=float, default=5.0)
+    bench_parser.add_argument("--failure-rate", type=float, default=0.02)
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        stub = start_stub_server(port=args.port, latency_ms=args.latency_ms, failure_rate=args.failure_rate)
+        print(f"Serving stub data source on http://127.0.0.1:{args.port} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            stub.shutdown()
+    else:
+        _benchmark(args)
@@ -0,0 +1,177 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import deque
+import math
+import os
+import threading
+import time
+
+from percentiles import percentile
+
+# What langchain's AgentExecutor returns when it stops a loop at max_iter or max_execution_time
+STOPPED_OUTPUT = "Agent stopped due to iteration limit or time limit."
+# Tool name crewai gives the parsing errors and forced answers it feeds back to the agent
+_ERROR_TOOL = "_Exception"
+
+
+class _Run:
+    """Iterations and tool observations of one agent execution, fed by the agent's step_callback."""
+
+    def __init__(self, chained: Optional[Callable]):
+        self.chained = chained
+        self.iterations = 0
+        self.observations: List[str] = []
+
+    def on_step(self, step_output: Any):
+        self.iterations += 1
+        # AgentFinish ends the loop; anything else is the executor's list of (AgentAction, observation) tuples
+        if isinstance(step_output, list):
+            for action, observation in step_output:
+                observation = str(observation or "").strip()
+                if observation and getattr(action, "tool", _ERROR_TOOL) != _ERROR_TOOL:
+                    self.observations.append(observation)
+        if self.chained:
+            self.chained(step_output)
+
+    def partial_answer(self) -> Optional[str]:
+        """The data the agent gathered before it was stopped, or None if it gathered nothing."""
+        gathered = list(dict.fromkeys(self.observations))
+        if not gathered:
+            return None
+        return (f"Stopped after {self.iterations} iterations before a final answer. "
+                f"Best partial answer from the data gathered:\n" + "\n".join(gathered))
+
+
+class IterationBudgets:
+    """Sets agents' ``max_iter`` and ``max_execution_time`` from their observed iteration counts and latency.
+
+    Each completed execution is recorded under its task label and its agent's role. Once a task
+    (or, failing that, its agent) has ``min_samples`` runs, its budget is the ``percentile`` of those runs times
+    ``headroom``, plus the two iterations crewai reserves for forcing a final answer; until then
+    the defaults apply. Budgets never exceed what the agent itself was configured with. A loop
+    stopped by its budget returns the observations it gathered instead of crewai's stop message.
+    """
+
+    def __init__(self, percentile: float = 0.95, headroom: float = 1.5, min_samples: int = 5,
+                 default_max_iter: int = 10, default_max_seconds: Optional[float] = None,
+                 min_max_iter: int = 3, history: int = 200):
+        self.percentile = percentile
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.default_max_iter = default_max_iter
+        self.default_max_seconds = default_max_seconds
+        self.min_max_iter = min_max_iter
+        self._history = history
+        self._lock = threading.Lock()
+        self.by_task: Dict[str, deque] = {}
+        self.by_agent: Dict[str, deque] = {}
+        self.stopped: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls) -> Optional["IterationBudgets"]:
+        """Controller configured by ``ITERATION_BUDGET_*`` variables, or None when ``ITERATION_BUDGET=off``."""
+        if os.getenv("ITERATION_BUDGET", "on").lower() in ("0", "off", "false", "no"):
+            return None
+        default_seconds = os.getenv("ITERATION_BUDGET_DEFAULT_MAX_SECONDS")
+        return cls(
+            percentile=float(os.getenv("ITERATION_BUDGET_PERCENTILE", "0.95")),
+            headroom=float(os.getenv("ITERATION_BUDGET_HEADROOM", "1.5")),
+            min_samples=int(os.getenv("ITERATION_BUDGET_MIN_SAMPLES", "5")),
+            default_max_iter=int(os.getenv("ITERATION_BUDGET_DEFAULT_MAX_ITER", "10")),
+            default_max_seconds=float(default_seconds) if default_seconds else None
+        )
+
+    def _samples(self, task_label: str, agent_role: str) -> List[Tuple[int, float]]:
+        with self._lock:
+            for history in (self.by_task.get(task_label), self.by_agent.get(agent_role)):
+                if history is not None and len(history) >= self.min_samples:
+                    return list(history)
+        return []
+
+    def budget(self, task_label: str, agent_role: str, configured_max_iter: Optional[int] = None
+               ) -> Tuple[int, Optional[int]]:
+        """Return ``(max_iter, max_execution_time)`` for the next run of a task by an agent."""
+        samples = self._samples(task_label, agent_role)
+        if samples:
+            iterations = percentile(sorted(count for count, _ in samples), self.percentile)
+            seconds = percentile(sorted(elapsed for _, elapsed in samples), self.percentile)
+            max_iter = max(self.min_max_iter, math.ceil(iterations * self.headroom) + 2)
+            max_seconds = seconds * self.headroom
+        else:
+            max_iter, max_seconds = self.default_max_iter, self.default_max_seconds
+        if configured_max_iter:
+            max_iter = min(max_iter, configured_max_iter)
+        # crewai takes whole seconds
+        return max_iter, math.ceil(max_seconds) if max_seconds is not None else None
+
+    def _record(self, task_label: str, agent_role: str, iterations: int, seconds: float, stopped: bool):
+        with self._lock:
+            if stopped:
+                # A stopped run only shows the budget it hit; keeping it would ratchet the budget up
+                self.stopped[task_label] = self.stopped.get(task_label, 0) + 1
+                return
+            for key, table in ((task_label, self.by_task), (agent_role, self.by_agent)):
+                table.setdefault(key, deque(maxlen=self._history)).append((iterations, seconds))
+
+    def execute(self, agent: Any, task_label: str, run: Callable[[], str]) -> str:
+        """Run ``run()`` (the agent executing the task) within the task's budget and record it."""
+        configured = (agent.max_iter, agent.max_execution_time, agent.step_callback)
+        max_iter, max_seconds = self.budget(task_label, agent.role, agent.max_iter)
+        tracker = _Run(agent.step_callback)
+        agent.max_iter = max_iter
+        if max_seconds is not None and (agent.max_execution_time is None or max_seconds < agent.max_execution_time):
+            agent.max_execution_time = max_seconds
+        agent.step_callback = tracker.on_step
+        start = time.perf_counter()
+        try:
+            result = run()
+        finally:
+            agent.max_iter, agent.max_execution_time, agent.step_callback = configured
+        stopped = isinstance(result, str) and result.strip() == STOPPED_OUTPUT
+        self._record(task_label, agent.role, tracker.iterations, time.perf_counter() - start, stopped)
+        if stopped:
+            return tracker.partial_answer() or result
+        return result
+
+    @staticmethod
+    def _summary(history: deque) -> Dict:
+        if not history:
+            return {"runs": 0}
+        iterations = sorted(count for count, _ in history)
+        seconds = sorted(elapsed for _, elapsed in history)
+        return {
+            "runs": len(history),
+            "iterations_p50": percentile(iterations, 0.5),
+            "iterations_p95": percentile(iterations, 0.95),
+            "iterations_max": iterations[-1],
+            "seconds_p50": round(percentile(seconds, 0.5), 3),
+            "seconds_p95": round(percentile(seconds, 0.95), 3)
+        }
+
+    def snapshot(self) -> Dict:
+        """Iteration and latency percentiles per task and agent, with each task's next budget."""
+        with self._lock:
+            by_task = {label: (deque(self.by_task.get(label, ())), self.stopped.get(label, 0))
+                       for label in list(self.by_task) + [label for label in self.stopped if label not in self.by_task]}
+            by_agent = {role: deque(history) for role, history in self.by_agent.items()}
+        tasks = {}
+        for label, (history, stopped) in by_task.items():
+            max_iter, max_seconds = self.budget(label, "")
+            tasks[label] = {**self._summary(history), "stopped": stopped,
+                            "budget": {"max_iter": max_iter, "max_execution_time": max_seconds}}
+        return {
+            "settings": {"percentile": self.percentile, "headroom": self.headroom, "min_samples": self.min_samples,
+                         "default_max_iter": self.default_max_iter,
+                         "default_max_seconds": self.default_max_seconds},
+            "tasks": tasks,
+            "agents": {role: self._summary(history) for role, history in by_agent.items()}
+        }
+
+    def reset(self):
+        with self._lock:
+            self.by_task.clear()
+            self.by_agent.clear()
+            self.stopped.clear()
+
+
+# Process-wide budgets for managed tasks; ITERATION_BUDGET=off leaves agents at their configured limits
+iteration_budgets = IterationBudgets.from_env()
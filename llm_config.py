@@ -0,0 +1,29 @@
+import os
+
+# Same default model crewai agents get when no llm is passed
+DEFAULT_MODEL = "gpt-4"
+
+
+def build_llm():
+    """Chat model for the agents, chosen by ``LLM_PROVIDER``.
+
+    ``openai`` (the default) builds the model crewai would use on its own; ``stub`` builds the
+    offline StubChatModel with ``STUB_LLM_LATENCY_MS`` / ``STUB_LLM_JITTER_MS`` latency plus
+    ``STUB_LLM_MS_PER_PROMPT_TOKEN`` / ``STUB_LLM_MS_PER_OUTPUT_TOKEN``, for load tests and local
+    runs without an API key. Unless ``LLM_POOL=off``, the model is a client of the process-wide
+    LLMClientPool, which rate limits, fairly queues and retries every crew's calls.
+    """
+    from llm_pool import llm_client_pool
+    if os.getenv("LLM_PROVIDER", "openai").lower() == "stub":
+        from stub_llm import StubChatModel
+        model = StubChatModel(
+            latency_ms=float(os.getenv("STUB_LLM_LATENCY_MS", "200")),
+            jitter_ms=float(os.getenv("STUB_LLM_JITTER_MS", "0")),
+            ms_per_prompt_token=float(os.getenv("STUB_LLM_MS_PER_PROMPT_TOKEN", "0")),
+            ms_per_output_token=float(os.getenv("STUB_LLM_MS_PER_OUTPUT_TOKEN", "0"))
+        )
+    else:
+        from langchain_openai import ChatOpenAI
+        model = ChatOpenAI(model=os.getenv("OPENAI_MODEL_NAME", DEFAULT_MODEL),
+                           **(llm_client_pool.openai_kwargs() if llm_client_pool else {}))
+    return llm_client_pool.wrap(model) if llm_client_pool else model
@@ -0,0 +1,349 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import deque
+import argparse
+import itertools
+import json
+import os
+import random
+import threading
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+
+from context_assembler import count_tokens
+from percentiles import percentile
+
+# Provider statuses worth retrying; everything else goes straight back to the agent
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+# Exceptions the openai client raises for connection problems, which carry no status
+_CONNECTION_ERRORS = ("APIConnectionError", "APITimeoutError")
+
+
+def _error_hint(error: Exception) -> Tuple[bool, Optional[int], Optional[float]]:
+    """``(retryable, status, retry_after_seconds)`` for an exception raised by a provider client."""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    headers = getattr(response, "headers", None) or {}
+    retry_after = None
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(header)
+        if value:
+            try:
+                retry_after = float(value) * scale
+                break
+            except ValueError:
+                pass
+    if status is None:
+        retryable = isinstance(error, (OSError, ConnectionError)) or type(error).__name__ in _CONNECTION_ERRORS
+    else:
+        retryable = status in RETRYABLE_STATUSES
+    return retryable, status, retry_after
+
+
+class TokenBucket:
+    """``capacity`` units per ``period`` seconds, refilled continuously; 0 means unlimited.
+
+    The bucket starts with ``burst`` units (a tenth of the capacity by default) and idles at no
+    more than that. A call waits until the bucket holds its whole amount (at most ``capacity``),
+    which it may accumulate past the burst while it waits, and is then charged in full; the level
+    goes negative when a call used more than it reserved. No window of ``period`` seconds sees
+    more than ``capacity`` plus the larger of ``burst`` and the biggest call, so with the limits
+    at 90% of a provider's and calls under a tenth of them, the provider's window is never exceeded.
+    """
+
+    def __init__(self, capacity: float, period: float = 60.0, burst: Optional[float] = None):
+        self.capacity = capacity
+        self.rate = capacity / period if capacity else 0.0
+        self.burst = min(capacity, max(1.0, capacity / 10)) if burst is None else burst
+        self.level = self.burst
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float, ceiling: float):
+        self.level = min(ceiling, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` units (at most ``capacity``) are available."""
+        if not self.capacity:
+            return 0.0
+        needed = min(amount, self.capacity)
+        self._refill(now, max(self.burst, needed))
+        return 0.0 if self.level >= needed else (needed - self.level) / self.rate
+
+    def take(self, amount: float):
+        """Spend units (or refund them, for a negative amount)."""
+        if self.capacity:
+            self.level -= amount
+
+
+class _Waiter:
+    __slots__ = ("tokens",)
+
+    def __init__(self, tokens: int):
+        self.tokens = tokens
+
+
+class LLMClientPool:
+    """Process-wide gate for every agent's LLM calls.
+
+    Calls wait for a request and their tokens in per-minute buckets (``rpm``/``tpm``, 0 for no
+    limit). Waiting calls are granted in round-robin order across clients, one client per crew,
+    so one busy crew cannot starve the others. Calls that fail with a retryable status are retried
+    with jittered exponential backoff. A 429 pauses the whole pool for at least the server's
+    Retry-After hint. OpenAI clients built through the pool share one keep-alive HTTP
+    connection pool.
+    """
+
+    def __init__(self, rpm: int = 0, tpm: int = 0, retries: int = 4, backoff_base: float = 0.5,
+                 backoff_max: float = 30.0, output_tokens: int = 256, max_connections: int = 20,
+                 period: float = 60.0, history: int = 1000):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.output_tokens = output_tokens
+        self.max_connections = max_connections
+        self._requests = TokenBucket(rpm, period)
+        self._tokens = TokenBucket(tpm, period)
+        self._cond = threading.Condition()
+        self._queues: Dict[str, deque] = {}
+        self._order: deque = deque()
+        self._paused_until = 0.0
+        self._client_ids = itertools.count(1)
+        self._http_client = None
+        self.counts = {"calls": 0, "attempts": 0, "retries": 0, "rate_limited": 0, "failures": 0}
+        self.tokens_reserved = 0
+        self.tokens_used = 0
+        self._waits: deque = deque(maxlen=history)
+
+    @classmethod
+    def from_env(cls) -> Optional["LLMClientPool"]:
+        """Pool configured by ``LLM_POOL_*`` variables, or None when ``LLM_POOL=off``.
+
+        Inside a crew worker the request and token limits are divided by ``CREW_WORKERS``.
+        """
+        if os.getenv("LLM_POOL", "on").lower() in ("0", "off", "false", "no"):
+            return None
+        rpm = int(os.getenv("LLM_POOL_RPM", "0"))
+        tpm = int(os.getenv("LLM_POOL_TPM", "0"))
+        # With CREW_WORKERS every crew runs in a worker process with a pool of its own, so each
+        # worker gets an equal share of the limits and together they stay within them
+        from crew_workers import in_crew_worker
+        workers = int(os.getenv("CREW_WORKERS", "0") or 0)
+        if workers > 1 and in_crew_worker():
+            rpm = max(1, rpm // workers) if rpm else 0
+            tpm = max(1, tpm // workers) if tpm else 0
+        return cls(
+            rpm=rpm,
+            tpm=tpm,
+            retries=int(os.getenv("LLM_POOL_RETRIES", "4")),
+            output_tokens=int(os.getenv("LLM_POOL_OUTPUT_TOKENS", "256")),
+            max_connections=int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "20"))
+        )
+
+    def openai_kwargs(self) -> Dict[str, Any]:
+        """ChatOpenAI arguments that share the pool's keep-alive connections and leave retries to it."""
+        if self._http_client is None:
+            import httpx
+            with self._cond:
+                if self._http_client is None:
+                    self._http_client = httpx.Client(limits=httpx.Limits(
+                        max_connections=self.max_connections, max_keepalive_connections=self.max_connections))
+        return {"http_client": self._http_client, "max_retries": 0}
+
+    def wrap(self, model: BaseChatModel) -> "PooledChatModel":
+        """A client for one crew: its calls go through the pool under their own fair-queuing slot."""
+        return PooledChatModel(inner=model, pool=self, client_id=f"client-{next(self._client_ids)}")
+
+    def _acquire(self, client_id: str, tokens: int) -> float:
+        """Block until it is this client's turn and the buckets allow the call; returns seconds waited."""
+        start = time.monotonic()
+        waiter = _Waiter(tokens)
+        with self._cond:
+            if client_id not in self._queues:
+                self._queues[client_id] = deque()
+                self._order.append(client_id)
+            self._queues[client_id].append(waiter)
+            while True:
+                if self._order[0] == client_id and self._queues[client_id][0] is waiter:
+                    now = time.monotonic()
+                    wait = max(self._paused_until - now, self._requests.wait_time(1, now),
+                               self._tokens.wait_time(tokens, now))
+                    if wait <= 0:
+                        self._requests.take(1)
+                        self._tokens.take(tokens)
+                        self._queues[client_id].popleft()
+                        self._order.popleft()
+                        # Round robin: a client with more waiting calls goes to the back of the line
+                        if self._queues[client_id]:
+                            self._order.append(client_id)
+                        else:
+                            del self._queues[client_id]
+                        self._cond.notify_all()
+                        return now - start
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After hint."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    def call(self, client_id: str, tokens: int, request: Callable[[], ChatResult]) -> ChatResult:
+        """Run ``request`` once the buckets allow it, retrying transient provider errors."""
+        with self._cond:
+            self.counts["calls"] += 1
+            self.tokens_reserved += tokens
+        attempt = 0
+        while True:
+            waited = self._acquire(client_id, tokens)
+            with self._cond:
+                self.counts["attempts"] += 1
+                self._waits.append(waited)
+            try:
+                return request()
+            except Exception as e:
+                retryable, status, retry_after = _error_hint(e)
+                if not retryable or attempt >= self.retries:
+                    with self._cond:
+                        self.counts["failures"] += 1
+                    raise
+                delay = self._backoff(attempt, retry_after)
+                with self._cond:
+                    self.counts["retries"] += 1
+                    if status == 429:
+                        # The provider's limit is shared by every crew, so every crew holds off
+                        self.counts["rate_limited"] += 1
+                        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                        self._cond.notify_all()
+                time.sleep(delay)
+                attempt += 1
+
+    def settle(self, reserved: int, used: Optional[int]):
+        """Charge (or refund) the difference between a call's reserved and reported tokens."""
+        with self._cond:
+            self.tokens_used += used if used is not None else reserved
+            if used is not None:
+                self._tokens.take(used - reserved)
+
+    def snapshot(self) -> Dict:
+        with self._cond:
+            waits = sorted(self._waits)
+            return {
+                "settings": {"rpm": self.rpm, "tpm": self.tpm, "retries": self.retries,
+                             "max_connections": self.max_connections},
+                **self.counts,
+                "tokens_reserved": self.tokens_reserved,
+                "tokens_used": self.tokens_used,
+                "queued": sum(len(waiters) for waiters in self._queues.values()),
+                "paused_seconds_left": round(max(0.0, self._paused_until - time.monotonic()), 2),
+                "wait_seconds_p50": round(percentile(waits, 0.5), 3) if waits else None,
+                "wait_seconds_p95": round(percentile(waits, 0.95), 3) if waits else None
+            }
+
+
+class PooledChatModel(BaseChatModel):
+    """Chat model whose calls to ``inner`` are scheduled, rate limited and retried by the pool.
+
+    It reports the inner model's type and parameters, so completion cache keys are unchanged.
+    """
+
+    inner: BaseChatModel
+    pool: Any
+    client_id: str
+
+    @property
+    def _llm_type(self) -> str:
+        return self.inner._llm_type
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return self.inner._identifying_params
+
+    @property
+    def model_name(self) -> str:
+        # crewai counts tokens for models that have a name; stay invisible for those that do not
+        return self.inner.model_name
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        reserved = count_tokens("\n".join(str(message.content) for message in messages)) + self.pool.output_tokens
+        result = self.pool.call(self.client_id, reserved,
+                                lambda: self.inner._generate(messages, stop=stop, **kwargs))
+        usage = (result.llm_output or {}).get("token_usage") or {}
+        self.pool.settle(reserved, usage.get("total_tokens"))
+        return result
+
+
+# Shared by every crew's model in this process; LLM_POOL=off lets each model call the provider directly
+llm_client_pool = LLMClientPool.from_env()
+
+
+def _drive(clients: List[Any], calls: int) -> Dict:
+    """Make ``calls`` calls from each client concurrently; per-client completion times and errors."""
+    from langchain_core.messages import HumanMessage
+
+    finished: Dict[str, List[float]] = {}
+    errors = []
+    start = time.perf_counter()
+
+    def run(index: int, client: Any):
+        times = finished.setdefault(f"crew-{index}", [])
+        for call in range(calls):
+            try:
+                client.invoke([HumanMessage(content=f"Crew {index} question {call}: summarize the iPhone market.")])
+                times.append(time.perf_counter() - start)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+    threads = [threading.Thread(target=run, args=(index, client)) for index, client in enumerate(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        "wall_seconds": round(time.perf_counter() - start, 2),
+        "completed": sum(len(times) for times in finished.values()),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "crew_finish_seconds": {crew: round(times[-1], 2) if times else None for crew, times in finished.items()}
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Drive a rate-limited local OpenAI-compatible stub with and without the client pool.")
+    parser.add_argument("--crews", type=int, default=4)
+    parser.add_argument("--calls", type=int, default=10, help="Calls per crew")
+    parser.add_argument("--server-rpm", type=int, default=20, help="Requests per window the stub accepts")
+    parser.add_argument("--server-tpm", type=int, default=0, help="Tokens per window the stub accepts (0: no limit)")
+    parser.add_argument("--window", type=float, default=5.0, help="Rate-limit window in seconds (60 in production)")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    from langchain_openai import ChatOpenAI
+    from stub_llm import start_stub_llm_server
+
+    server = start_stub_llm_server(latency_ms=args.latency_ms, rpm=args.server_rpm, tpm=args.server_tpm,
+                                   window=args.window)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    print(f"Stub LLM at {base_url}: {args.server_rpm} requests per {args.window}s window")
+
+    def model(**kwargs) -> ChatOpenAI:
+        return ChatOpenAI(model="stub", api_key="stub", base_url=base_url, **kwargs)
+
+    # Each crew with its own client and the openai client's own retries
+    direct = _drive([model() for _ in range(args.crews)], args.calls)
+    direct["server_429s"] = server.rejected
+    server.reset()
+    # One pool sized just under the stub's limits
+    pool = LLMClientPool(rpm=int(args.server_rpm * 0.9), tpm=int(args.server_tpm * 0.9), period=args.window,
+                         backoff_base=0.1)
+    pooled = _drive([pool.wrap(model(**pool.openai_kwargs())) for _ in range(args.crews)], args.calls)
+    pooled["server_429s"] = server.rejected
+    server.shutdown()
+    print(json.dumps({"direct": direct, "pooled": {**pooled, "pool": pool.snapshot()}}, indent=2))
@@ -0,0 +1,255 @@
+from typing import Dict, List, NamedTuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import argparse
+import contextlib
+import http.client
+import json
+import os
+import random
+import threading
+import time
+
+from percentiles import percentile_ms
+
+# Phrasings per query type; each routes to that type in chatbot_app.detect_query_type
+QUERY_TEMPLATES = {
+    "price": ["What is the price of the {product}?", "How much does the {product} cost?"],
+    "availability": ["Is the {product} in stock?", "What is the availability of the {product}?"],
+    "rating": ["What rating does the {product} have?", "How are the {product} reviews?"],
+    "market": ["What are the market trends for the {product}?", "How is the {product} popularity?"],
+    "comprehensive": ["Tell me about the {product}.", "Give me an overview of the {product}."]
+}
+DEFAULT_MIX = "price=1,availability=1,rating=1,market=1,comprehensive=1"
+DEFAULT_PRODUCTS = ["iPhone", "Samsung Galaxy", "Google Pixel"]
+
+
+class Result(NamedTuple):
+    query_type: str
+    seconds: float
+    status: int
+    error: Optional[str]
+    qa_passed: Optional[bool] = None
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse 'price=3,market=1' into query-type weights."""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in QUERY_TEMPLATES:
+            raise ValueError(f"Unknown query type {name!r}; expected one of {', '.join(QUERY_TEMPLATES)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class ChatClient:
+    """Posts chat messages over one keep-alive connection per thread."""
+
+    def __init__(self, base_url: str, timeout: float):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = parts.path.rstrip("/") + "/api/chat"
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def send(self, query_type: str, message: str, scheduled: float) -> Result:
+        """Send one message; latency counts from ``scheduled`` so queueing delay is included."""
+        # Bytes let http.client send headers and body in one segment (no Nagle/delayed-ACK stall)
+        body = json.dumps({"message": message}).encode("utf-8")
+        try:
+            conn = self._connection()
+            conn.request("POST", self.path, body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            payload = response.read()
+            elapsed = time.perf_counter() - scheduled
+            if response.status != 200:
+                return Result(query_type, elapsed, response.status, f"HTTP {response.status}")
+            data = json.loads(payload)
+            error = None
+            # The chatbot answers crew failures with fallback data; count those as errors too
+            if any(step.get("step", "").endswith("Error Information") for step in data.get("thinking_steps") or []):
+                error = "crew error (fallback response)"
+            return Result(query_type, elapsed, response.status, error, (data.get("qa_result") or {}).get("passed"))
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            self._local.conn = None
+            return Result(query_type, time.perf_counter() - scheduled, 0, type(e).__name__)
+
+
+class Workload:
+    """Draws (query type, message) pairs according to the mix."""
+
+    def __init__(self, mix: Dict[str, float], products: List[str], seed: Optional[int] = None):
+        self.types = list(mix)
+        self.weights = [mix[name] for name in self.types]
+        self.products = products
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            query_type = self._rng.choices(self.types, self.weights)[0]
+            template = self._rng.choice(QUERY_TEMPLATES[query_type])
+            return query_type, template.format(product=self._rng.choice(self.products))
+
+
+def run_closed(client: ChatClient, workload: Workload, concurrency: int, duration: float) -> List[Result]:
+    """Each of ``concurrency`` users sends its next request as soon as the previous one returns."""
+    results: List[Result] = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def user():
+        while time.perf_counter() < deadline:
+            query_type, message = workload.next()
+            result = client.send(query_type, message, time.perf_counter())
+            with lock:
+                results.append(result)
+
+    threads = [threading.Thread(target=user, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def run_open(client: ChatClient, workload: Workload, rate: float, duration: float, max_inflight: int) -> List[Result]:
+    """Send requests at Poisson arrivals of ``rate`` per second, whether or not earlier ones finished."""
+    futures = []
+    start = time.perf_counter()
+    next_arrival = start
+    rng = random.Random()
+    with ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="load") as pool:
+        while next_arrival < start + duration:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            query_type, message = workload.next()
+            futures.append(pool.submit(client.send, query_type, message, next_arrival))
+            next_arrival += rng.expovariate(rate)
+    return [future.result() for future in futures]
+
+
+def latency_summary(results: List[Result]) -> Dict:
+    """Mean, p50/p95/p99 and max latency in milliseconds."""
+    ordered = sorted(result.seconds for result in results)
+    return {
+        "mean": round(sum(ordered) / len(ordered) * 1000, 1) if ordered else 0.0,
+        "p50": percentile_ms(ordered, 0.50, 1),
+        "p95": percentile_ms(ordered, 0.95, 1),
+        "p99": percentile_ms(ordered, 0.99, 1),
+        "max": percentile_ms(ordered, 1.0, 1)
+    }
+
+
+def summarize(results: List[Result], elapsed: float, **level) -> Dict:
+    """Throughput, latency percentiles and error rate for one load level, overall and per query type."""
+    errors = [result for result in results if result.error]
+    by_type = {}
+    for query_type in sorted({result.query_type for result in results}):
+        subset = [result for result in results if result.query_type == query_type]
+        by_type[query_type] = {
+            "requests": len(subset),
+            "errors": sum(1 for result in subset if result.error),
+            "latency_ms": latency_summary(subset)
+        }
+    error_kinds: Dict[str, int] = {}
+    for result in errors:
+        error_kinds[result.error] = error_kinds.get(result.error, 0) + 1
+    return {
+        **level,
+        "elapsed_s": round(elapsed, 2),
+        "requests": len(results),
+        "errors": len(errors),
+        "error_rate": round(len(errors) / len(results), 4) if results else 0.0,
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": latency_summary(results),
+        "error_kinds": error_kinds,
+        "by_query_type": by_type
+    }
+
+
+def format_table(reports: List[Dict]) -> str:
+    """Render one row per load level."""
+    lines = [f"{'Level':<16}{'Requests':>9}{'Errors':>8}{'RPS':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+    for report in reports:
+        level = f"{report['mode']} {report.get('concurrency', report.get('rate'))}"
+        latency = report["latency_ms"]
+        lines.append(f"{level:<16}{report['requests']:>9}{report['error_rate']:>8.1%}{report['throughput_rps']:>8.2f}"
+                     f"{latency['p50']:>10.1f}{latency['p95']:>10.1f}{latency['p99']:>10.1f}")
+    return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def local_chatbot(port: int = 0):
+    """Serve chatbot_app on a background thread, with the stub LLM unless LLM_PROVIDER is set."""
+    os.environ.setdefault("LLM_PROVIDER", "stub")
+    # Measure the crew itself, not the completion cache, unless asked otherwise
+    os.environ.setdefault("LLM_CACHE", "off")
+    from werkzeug.serving import make_server
+    import chatbot_app
+
+    server = make_server("127.0.0.1", port, chatbot_app.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.port}"
+    finally:
+        server.shutdown()
+
+
+def run_levels(url: str, args) -> List[Dict]:
+    client = ChatClient(url, timeout=args.timeout)
+    workload = Workload(parse_mix(args.mix), args.products, seed=args.seed)
+    reports = []
+    levels = args.concurrency if args.mode == "closed" else args.rate
+    for level in levels:
+        start = time.perf_counter()
+        if args.mode == "closed":
+            results = run_closed(client, workload, int(level), args.duration)
+            reports.append(summarize(results, time.perf_counter() - start, mode="closed", concurrency=int(level)))
+        else:
+            results = run_open(client, workload, float(level), args.duration, args.max_inflight)
+            reports.append(summarize(results, time.perf_counter() - start, mode="open", rate=float(level)))
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test /api/chat and report throughput and latency.")
+    parser.add_argument("--url", help="Chatbot base URL; omit to start a local instance with the stub LLM")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed",
+                        help="closed: fixed number of concurrent users; open: fixed arrival rate")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--rate", type=float, nargs="+", default=[1.0, 5.0], help="Requests per second (open mode)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per load level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Query type weights, e.g. price=3,market=1")
+    parser.add_argument("--products", nargs="+", default=DEFAULT_PRODUCTS)
+    parser.add_argument("--max-inflight", type=int, default=256, help="Open mode: cap on outstanding requests")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    if args.url:
+        reports = run_levels(args.url, args)
+    else:
+        # Keep the crews' verbose logging out of the report
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            with local_chatbot() as url:
+                reports = run_levels(url, args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+    else:
+        print(json.dumps(reports, indent=2))
+    print(format_table(reports))
@@ -0,0 +1,219 @@
+from typing import Dict, List, Optional
+import argparse
+import contextlib
+import gc
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+# Per-request objects whose live counts should stay flat in a long-running worker, by the
+# class that defines them (matching by bare name would also count e.g. asyncio's Task)
+TRACKED_TYPES = {
+    "Crew": "crewai.crew.Crew",
+    "Agent": "crewai.agent.Agent",
+    "Task": "crewai.task.Task",
+    "TaskOutput": "crewai.tasks.task_output.TaskOutput",
+    "AgentExecutor": "langchain.agents.agent.AgentExecutor"
+}
+
+
+def rss_mb() -> float:
+    """Current resident set size in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _tracked_classes(types: Dict[str, str]) -> Dict[type, str]:
+    """The tracked classes whose modules are loaded; a module that was never imported has no instances."""
+    classes = {}
+    for name, path in types.items():
+        module, _, attribute = path.rpartition(".")
+        cls = getattr(sys.modules.get(module), attribute, None)
+        if isinstance(cls, type):
+            classes[cls] = name
+    return classes
+
+
+def live_object_counts(types: Dict[str, str] = TRACKED_TYPES) -> Dict[str, int]:
+    """Count live instances (subclasses included) of the tracked crew types by walking the GC heap."""
+    wanted = _tracked_classes(types)
+    counts = {name: 0 for name in types}
+    # Resolve each type once; the heap holds far more objects than distinct types
+    tracked_as: Dict[type, Optional[str]] = {}
+    for obj in gc.get_objects():
+        cls = type(obj)
+        if cls not in tracked_as:
+            tracked_as[cls] = next((wanted[base] for base in cls.__mro__ if base in wanted), None)
+        name = tracked_as[cls]
+        if name is not None:
+            counts[name] += 1
+    return counts
+
+
+def _top_stats(stats, top: int) -> List[Dict]:
+    return [
+        {
+            "location": str(stat.traceback[0]) if stat.traceback else "?",
+            "size_kb": round(stat.size / 1024, 1),
+            "size_diff_kb": round(getattr(stat, "size_diff", stat.size) / 1024, 1),
+            "count": stat.count,
+            "count_diff": getattr(stat, "count_diff", stat.count)
+        }
+        for stat in stats[:top]
+    ]
+
+
+class MemoryProfiler:
+    """tracemalloc snapshots per query type, taken after requests of that type.
+
+    The first request of a type sets its baseline and every ``snapshot_every``-th request
+    replaces its latest snapshot, so ``diff`` shows what requests of that type retained.
+    """
+
+    def __init__(self, snapshot_every: int = 50, frames: int = 5):
+        self.snapshot_every = snapshot_every
+        self._lock = threading.Lock()
+        self.requests: Dict[str, int] = {}
+        self.baselines: Dict[str, tracemalloc.Snapshot] = {}
+        self.latest: Dict[str, tracemalloc.Snapshot] = {}
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    @classmethod
+    def from_env(cls) -> Optional["MemoryProfiler"]:
+        """Profiler configured by ``MEMORY_PROFILING_*`` variables, or None unless profiling is enabled."""
+        if os.getenv("MEMORY_PROFILING", "off").lower() not in ("1", "on", "true", "yes"):
+            return None
+        return cls(
+            snapshot_every=int(os.getenv("MEMORY_PROFILING_SNAPSHOT_EVERY", "50")),
+            frames=int(os.getenv("MEMORY_PROFILING_FRAMES", "5"))
+        )
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>")
+        ])
+
+    def after_request(self, query_type: str):
+        with self._lock:
+            count = self.requests[query_type] = self.requests.get(query_type, 0) + 1
+        if count == 1 or count % self.snapshot_every == 0:
+            snapshot = self._snapshot()
+            with self._lock:
+                self.baselines.setdefault(query_type, snapshot)
+                self.latest[query_type] = snapshot
+
+    def diff(self, query_type: str, top: int = 20, key_type: str = "lineno") -> Dict:
+        """Allocation growth between the baseline and latest snapshot of a query type."""
+        with self._lock:
+            baseline, latest = self.baselines.get(query_type), self.latest.get(query_type)
+        if baseline is None:
+            return {"query_type": query_type, "error": "No snapshot for this query type yet"}
+        stats = latest.compare_to(baseline, key_type)
+        return {
+            "query_type": query_type,
+            "requests": self.requests.get(query_type, 0),
+            "growth_kb": round(sum(stat.size_diff for stat in stats) / 1024, 1),
+            "top": _top_stats(stats, top)
+        }
+
+    def snapshot(self) -> Dict:
+        """Current memory use, live crew objects and snapshot coverage per query type."""
+        current, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            requests = dict(self.requests)
+        return {
+            "rss_mb": round(rss_mb(), 1),
+            "traced_mb": round(current / (1024 * 1024), 1),
+            "traced_peak_mb": round(peak / (1024 * 1024), 1),
+            "live_objects": live_object_counts(),
+            "requests_by_query_type": requests
+        }
+
+
+def soak(requests: int, warmup: int, checkpoints: int, max_rss_growth_mb: float, max_object_growth: int,
+         mix: str, seed: Optional[int] = None) -> Dict:
+    """Drive the chatbot in-process and check that RSS and live crew objects stay flat.
+
+    After ``warmup`` requests the RSS and object counts become the baseline; the soak passes if
+    neither has grown past its threshold by the last checkpoint.
+    """
+    os.environ.setdefault("LLM_PROVIDER", "stub")
+    os.environ.setdefault("STUB_LLM_LATENCY_MS", "0")
+    os.environ.setdefault("LLM_CACHE", "off")
+    import chatbot_app
+    from load_test import DEFAULT_PRODUCTS, Workload, parse_mix
+
+    client = chatbot_app.app.test_client()
+    workload = Workload(parse_mix(mix), DEFAULT_PRODUCTS, seed=seed)
+
+    def send(count: int):
+        for _ in range(count):
+            _, message = workload.next()
+            client.post("/api/chat", json={"message": message})
+
+    def measure(sent: int) -> Dict:
+        gc.collect()
+        return {"requests": sent, "rss_mb": round(rss_mb(), 1), "live_objects": live_object_counts()}
+
+    send(warmup)
+    baseline = measure(0)
+    history = [baseline]
+    step = max(1, requests // checkpoints)
+    sent = 0
+    start = time.perf_counter()
+    while sent < requests:
+        batch = min(step, requests - sent)
+        send(batch)
+        sent += batch
+        history.append(measure(sent))
+
+    final = history[-1]
+    rss_growth = round(final["rss_mb"] - baseline["rss_mb"], 1)
+    object_growth = {name: final["live_objects"][name] - baseline["live_objects"][name] for name in TRACKED_TYPES}
+    failures = []
+    if rss_growth > max_rss_growth_mb:
+        failures.append(f"RSS grew {rss_growth} MB (limit {max_rss_growth_mb} MB)")
+    for name, growth in object_growth.items():
+        if growth > max_object_growth:
+            failures.append(f"{growth} more live {name} objects (limit {max_object_growth})")
+    return {
+        "passed": not failures,
+        "failures": failures,
+        "requests": requests,
+        "seconds": round(time.perf_counter() - start, 1),
+        "rss_growth_mb": rss_growth,
+        "object_growth": object_growth,
+        "checkpoints": history
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Soak test the chatbot for memory growth.")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--checkpoints", type=int, default=10)
+    parser.add_argument("--max-rss-growth-mb", type=float, default=50.0)
+    parser.add_argument("--max-object-growth", type=int, default=10)
+    parser.add_argument("--mix", default="price=1,availability=1,rating=1,market=1,comprehensive=1",
+                        help="Query type weights, as in load_test.py")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    # Keep the crews' verbose logging out of the report
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        report = soak(args.requests, args.warmup, args.checkpoints, args.max_rss_growth_mb,
+                      args.max_object_growth, args.mix, args.seed)
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["passed"] else 1)
@@ -0,0 +1,13 @@
+from typing import Sequence
+
+
+def percentile(ordered: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted, non-empty samples."""
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def percentile_ms(ordered: Sequence[float], fraction: float, digits: int = 3) -> float:
+    """Nearest-rank percentile of sorted samples in seconds, as milliseconds; 0.0 when there are none."""
+    if not ordered:
+        return 0.0
+    return round(percentile(ordered, fraction) * 1000, digits)
@@ -0,0 +1,289 @@
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Tuple
+import copy
+import json
+import re
+import threading
+
+from product_index import ProductIndex
+
+# Simulated product database shared by the tools and the chatbot
+PRODUCT_DB: Dict[str, Dict] = {
+    "iphone": {
+        "product": "iPhone",
+        "price": "$999",
+        "availability": "In Stock",
+        "rating": 4.8
+    },
+    "samsung galaxy": {
+        "product": "Samsung Galaxy",
+        "price": "$899",
+        "availability": "In Stock",
+        "rating": 4.6
+    },
+    "google pixel": {
+        "product": "Google Pixel",
+        "price": "$799",
+        "availability": "Limited Stock",
+        "rating": 4.5
+    }
+}
+
+TRENDS_DB: Dict[str, Dict] = {
+    "iphone": {
+        "product": "iPhone",
+        "trend": "Rising",
+        "popularity_score": 92,
+        "monthly_searches": 45000
+    },
+    "samsung galaxy": {
+        "product": "Samsung Galaxy",
+        "trend": "Stable",
+        "popularity_score": 85,
+        "monthly_searches": 38000
+    },
+    "google pixel": {
+        "product": "Google Pixel",
+        "trend": "Rising",
+        "popularity_score": 78,
+        "monthly_searches": 25000
+    }
+}
+
+COMPETITOR_DB: Dict[str, Dict] = {
+    "iphone": {
+        "product": "iPhone",
+        "main_competitors": ["Samsung Galaxy", "Google Pixel", "Xiaomi"],
+        "market_share": "23%",
+        "competitive_advantage": "Brand loyalty and ecosystem integration"
+    },
+    "samsung galaxy": {
+        "product": "Samsung Galaxy",
+        "main_competitors": ["iPhone", "Google Pixel", "OnePlus"],
+        "market_share": "19%",
+        "competitive_advantage": "Hardware innovation and display technology"
+    },
+    "google pixel": {
+        "product": "Google Pixel",
+        "main_competitors": ["iPhone", "Samsung Galaxy", "OnePlus"],
+        "market_share": "8%",
+        "competitive_advantage": "Camera technology and software experience"
+    }
+}
+
+FEEDBACK_DB: Dict[str, Dict] = {
+    "iphone": {
+        "product": "iPhone",
+        "positive_points": ["Camera quality", "Performance", "Ecosystem"],
+        "negative_points": ["Battery life", "Price", "Charging speed"],
+        "common_issues": ["Screen durability", "Storage limitations"],
+        "satisfaction_score": 87
+    },
+    "samsung galaxy": {
+        "product": "Samsung Galaxy",
+        "positive_points": ["Display quality", "Customization", "Camera versatility"],
+        "negative_points": ["Software updates", "Bloatware"],
+        "common_issues": ["Battery degradation", "Overheating during gaming"],
+        "satisfaction_score": 83
+    },
+    "google pixel": {
+        "product": "Google Pixel",
+        "positive_points": ["Camera quality", "Clean software", "Updates"],
+        "negative_points": ["Battery life", "Limited availability"],
+        "common_issues": ["Screen brightness", "Overheating"],
+        "satisfaction_score": 81
+    }
+}
+
+# Alternative spellings users type for catalog products, keyed by catalog key
+PRODUCT_ALIASES: Dict[str, str] = {
+    "iphone": "iphone",
+    "samsung galaxy": "samsung galaxy",
+    "galaxy": "samsung galaxy",
+    "samsung": "samsung galaxy",
+    "galaxy s": "samsung galaxy",
+    "google pixel": "google pixel",
+    "pixel": "google pixel"
+}
+
+
+# Typo-tolerant lookup of every alias; new products are added to it as they are imported
+_INDEX = ProductIndex(PRODUCT_ALIASES)
+
+# Datasets by the names the tools and data sources use for them
+DATASETS: Dict[str, Dict[str, Dict]] = {
+    "product_data": PRODUCT_DB,
+    "market_trends": TRENDS_DB,
+    "competitor_analysis": COMPETITOR_DB,
+    "customer_feedback": FEEDBACK_DB
+}
+
+_update_lock = threading.Lock()
+_listeners: List[Callable[[str, str], None]] = []
+
+
+def get_product_data(product: str) -> Dict:
+    """Fetch product data from the simulated database."""
+    record = PRODUCT_DB.get(canonical_key(product))
+    if record is None:
+        return {
+            "product": product,
+            "price": "$199",
+            "availability": "Out of Stock",
+            "rating": 3.5
+        }
+    return copy.deepcopy(record)
+
+
+def get_market_trends(product: str) -> Dict:
+    """Fetch market trends from the simulated database."""
+    record = TRENDS_DB.get(canonical_key(product))
+    if record is None:
+        return {
+            "product": product,
+            "trend": "Stable",
+            "popularity_score": 70,
+            "monthly_searches": 12000
+        }
+    return copy.deepcopy(record)
+
+
+def get_competitor_analysis(product: str) -> Dict:
+    """Get competitor analysis from the simulated database."""
+    record = COMPETITOR_DB.get(canonical_key(product))
+    if record is None:
+        return {
+            "product": product,
+            "main_competitors": ["Various brands"],
+            "market_share": "5%",
+            "competitive_advantage": "Price point"
+        }
+    return copy.deepcopy(record)
+
+
+def get_customer_feedback(product: str) -> Dict:
+    """Get customer feedback from the simulated database."""
+    record = FEEDBACK_DB.get(canonical_key(product))
+    if record is None:
+        return {
+            "product": product,
+            "positive_points": ["Affordable", "Basic functionality"],
+            "negative_points": ["Performance", "Build quality"],
+            "common_issues": ["Short lifespan", "Limited support"],
+            "satisfaction_score": 65
+        }
+    return copy.deepcopy(record)
+
+
+def list_products() -> List[str]:
+    """Return the display names of every product in the catalog."""
+    return [record["product"] for record in PRODUCT_DB.values()]
+
+
+def canonical_key(product: str) -> str:
+    """Return the catalog key for a product name or alias."""
+    name = product.strip().lower()
+    return PRODUCT_ALIASES.get(name, name)
+
+
+def display_name(key: str) -> str:
+    """Return the display name of a catalog key from whichever dataset holds it."""
+    for db in DATASETS.values():
+        if key in db:
+            return db[key]["product"]
+    return key
+
+
+def resolve_product(name: str, limit: int = 5) -> List[Tuple[str, float]]:
+    """Rank the catalog keys a possibly misspelled product name may refer to, as ``(key, score)``."""
+    return _INDEX.resolve(name, limit)
+
+
+def resolve_names(name: str) -> List[str]:
+    """Return the display names of the products ``name`` refers to, or ``[name]`` if it matches none.
+
+    A name that is not itself a product but mentions others ("Apple iPhone 15", "iPhone or Pixel")
+    resolves to every product it mentions.
+    """
+    ranked = _INDEX.resolve(name, 1)
+    if ranked:
+        return [display_name(ranked[0][0])]
+    mentioned = _INDEX.find_in_text(name)
+    return [display_name(key) for key in mentioned] if mentioned else [name]
+
+
+def find_products_in_text(text: str) -> List[str]:
+    """Return the catalog products mentioned in free text, in order of first mention, tolerating typos."""
+    return [display_name(key) for key in _INDEX.find_in_text(text)]
+
+
+# Separators between product names in a tool input: "iPhone, Pixel", "iPhone and Galaxy", "iPhone vs. Pixel"
+_SEPARATORS = re.compile(r"\s*(?:[,;&]|\b(?:and|vs|versus)\b\.?)\s*", re.IGNORECASE)
+
+
+def parse_products(value: Any) -> List[str]:
+    """Extract product names from a tool input: one name, a list, a string separated by commas,
+    semicolons, "&", "and" or "vs", JSON, or a dict with a ``products``, ``product`` or
+    ``description`` key. Names are resolved to catalog products where they match one, and
+    duplicates are dropped."""
+    if isinstance(value, dict):
+        for key in ("products", "product", "description"):
+            if key in value:
+                return parse_products(value[key])
+        return []
+    if isinstance(value, (list, tuple)):
+        names = [name for item in value for name in parse_products(item)]
+        return list(dict.fromkeys(names))
+    text = str(value).strip()
+    if text[:1] in ("[", "{", '"'):
+        try:
+            return parse_products(json.loads(text))
+        except ValueError:
+            pass
+    names = [resolved for name in _SEPARATORS.split(text) if name.strip() for resolved in resolve_names(name.strip())]
+    return list(dict.fromkeys(names))
+
+
+def keyed_records(records: List[Mapping]) -> Any:
+    """Return a single record as is, or several keyed by product name without the repeated name."""
+    if len(records) == 1:
+        return records[0]
+    return {record["product"]: {field: value for field, value in record.items() if field != "product"}
+            for record in records}
+
+
+def subscribe(listener: Callable[[str, str], None]):
+    """Call ``listener(dataset, key)`` after every change to a catalog record."""
+    _listeners.append(listener)
+
+
+def update_record(dataset: str, product: str, fields: Dict) -> Dict:
+    """Insert or update one product's record in a dataset and notify subscribers.
+
+    New products become findable by their lowercase name.
+    """
+    update_records(dataset, [(product, fields)])
+    return copy.deepcopy(DATASETS[dataset][canonical_key(product)])
+
+
+def update_records(dataset: str, updates: Iterable[Tuple[str, Dict]]) -> List[str]:
+    """Upsert many ``(product, fields)`` pairs into a dataset and return the changed keys.
+
+    New products are added to the product index under their key and display name, and
+    subscribers are notified once per changed key after every record is in place.
+    """
+    db = DATASETS[dataset]
+    changed = []
+    with _update_lock:
+        for product, fields in updates:
+            key = canonical_key(product)
+            db.setdefault(key, {"product": product}).update(fields)
+            if key not in PRODUCT_ALIASES:
+                PRODUCT_ALIASES[key] = key
+                _INDEX.add(key, key)
+                _INDEX.add(product, key)
+            changed.append(key)
+    changed = list(dict.fromkeys(changed))
+    for key in changed:
+        for listener in list(_listeners):
+            listener(dataset, key)
+    return changed
@@ -0,0 +1,282 @@
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from collections import Counter
+import argparse
+import itertools
+import json
+import random
+import re
+import time
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Words the chatbot's questions use that must never be "corrected" into a product word
+COMMON_WORDS = frozenset("""
+about and available availability between better buy compare cost does have how market more phone phones
+popularity price prices rating ratings review reviews should stock than that the this trend trends versus
+what which with
+""".split())
+
+
+def normalize(text: str) -> str:
+    """Lowercase words and digits separated by single spaces: "Galaxy-S 23!" -> "galaxy s 23"."""
+    return " ".join(_WORD.findall(text.lower()))
+
+
+def trigrams(text: str) -> Set[str]:
+    """Padded character trigrams, so the start of a name weighs more than its middle."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a: str, b: str, cutoff: float = 0.0) -> float:
+    """1 - (optimal string alignment distance / longer length): one typo or transposition in
+    "iphone" scores 0.83. Scores below ``cutoff`` come back as 0.0, computed only within the band
+    of edits the cutoff allows."""
+    if a == b:
+        return 1.0
+    longest = max(len(a), len(b))
+    limit = int((1.0 - cutoff) * longest + 1e-9)
+    if not a or not b or abs(len(a) - len(b)) > limit:
+        return 0.0
+    # Names that differ by a typo share most of their text; only the differing middle needs the table
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if not a or not b:
+        distance = len(a) + len(b)
+        return 0.0 if distance > limit else 1.0 - distance / longest
+    # Each edit changes at most two character counts, so counts far apart rule the pair out cheaply
+    if len(a) + len(b) > 2 * limit:
+        counts = Counter(a)
+        counts.subtract(b)
+        if sum(map(abs, counts.values())) > 2 * limit:
+            return 0.0
+    over = limit + 1
+    previous2: List[int] = []
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        current = [i if i <= limit else over] + [over] * len(b)
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            cb = b[j - 1]
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return 0.0
+        previous2, previous = previous, current
+    return 0.0 if previous[-1] > limit else 1.0 - previous[-1] / longest
+
+
+class ProductIndex:
+    """Typo-tolerant resolution of product names and aliases to catalog keys.
+
+    Exact aliases are a dict lookup. Otherwise each word of the query that is not in the
+    aliases' vocabulary is corrected to the closest vocabulary word, found through a trigram
+    index over the vocabulary (same first letter, at least ``min_fuzzy_length`` characters).
+    Aliases sharing the query's rarest corrected words are the candidates; the best few by
+    shared words are scored by edit similarity against the query, and those scoring at least
+    ``threshold`` are returned ranked. The vocabulary stays small even for a large catalog, so a
+    lookup touches a few short posting lists rather than every alias. Free text is scanned the
+    same way: words are corrected, then the longest run of words that forms an alias wins.
+    """
+
+    def __init__(self, aliases: Optional[Dict[str, str]] = None, threshold: float = 0.75,
+                 min_fuzzy_length: int = 4, candidates: int = 8, max_postings: int = 2000, max_scan: int = 256):
+        self.threshold = threshold
+        self.min_fuzzy_length = min_fuzzy_length
+        self.candidates = candidates
+        self.max_postings = max_postings
+        self.max_scan = max_scan
+        self._keys: Dict[str, str] = {}                 # normalized alias -> catalog key
+        self._names: List[str] = []                     # alias id -> normalized alias
+        self._alias_words: List[frozenset] = []         # alias id -> its words
+        self._words: Dict[str, int] = {}                # vocabulary word -> word id
+        self._word_list: List[str] = []
+        self._word_aliases: List[List[int]] = []        # word id -> ids of the aliases containing it
+        self._word_postings: Dict[str, List[int]] = {}  # trigram -> word ids
+        self.max_words = 1
+        if aliases:
+            self.add_many(aliases.items())
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, alias: str, key: str):
+        """Make ``alias`` (any spelling) resolve to ``key``; re-adding an alias repoints it."""
+        name = normalize(alias)
+        if not name:
+            return
+        if name in self._keys:
+            self._keys[name] = key
+            return
+        alias_id = len(self._names)
+        self._names.append(name)
+        words = name.split()
+        self._alias_words.append(frozenset(words))
+        self.max_words = max(self.max_words, len(words))
+        for word in dict.fromkeys(words):
+            if word not in self._words:
+                self._word_list.append(word)
+                self._word_aliases.append([])
+                for gram in trigrams(word):
+                    self._word_postings.setdefault(gram, []).append(len(self._word_list) - 1)
+                self._words[word] = len(self._word_list) - 1
+            self._word_aliases[self._words[word]].append(alias_id)
+        # Published last, so a concurrent reader never finds a key without its postings
+        self._keys[name] = key
+
+    def add_many(self, aliases: Iterable[Tuple[str, str]]):
+        for alias, key in aliases:
+            self.add(alias, key)
+
+    def _similar_words(self, word: str) -> List[int]:
+        """Ids of the vocabulary words sharing the most of ``word``'s selective trigrams."""
+        lists = sorted((self._word_postings[gram] for gram in trigrams(word) if gram in self._word_postings), key=len)
+        # Trigrams shared by too many words say little and cost the most; the rarest are always kept
+        counts = Counter()
+        for ids in [ids for ids in lists if len(ids) <= self.max_postings] or lists[:1]:
+            counts.update(ids)
+        ranked = counts.most_common(self.candidates)
+        if not ranked:
+            return []
+        # Only words close to the best trigram overlap are worth an edit-distance check
+        return [word_id for word_id, count in ranked if count >= ranked[0][1] - 1]
+
+    def resolve(self, name: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """Catalog keys ``name`` may refer to, best first, as ``(key, score)`` with score in 0-1."""
+        query = normalize(name)
+        if not query:
+            return []
+        if query in self._keys:
+            return [(self._keys[query], 1.0)]
+        if query.endswith("s") and query[:-1] in self._keys:
+            return [(self._keys[query[:-1]], 1.0)]
+        # A name on its own is not a sentence, so its words may be corrected from any first letter
+        corrected = [self.correct_word(word, strict=False) for word in query.split()]
+        if " ".join(corrected) in self._keys:
+            return [(self._keys[" ".join(corrected)], round(similarity(query, " ".join(corrected)), 3))]
+        words = set(corrected)
+        lists = sorted((self._word_aliases[self._words[word]] for word in words if word in self._words), key=len)
+        if not lists:
+            return []
+        # Candidates contain the two rarest corrected words, or failing that the rarest one; either
+        # way at most max_scan aliases are scored by shared words and only the best few by edit distance
+        pool = set(lists[0]).intersection(lists[1]) if len(lists) > 1 and len(lists[1]) <= self.max_postings else None
+        shared = [(len(words & self._alias_words[alias_id]), alias_id)
+                  for alias_id in itertools.islice(pool or lists[0], self.max_scan)]
+        most = max(count for count, _ in shared)
+        best: Dict[str, float] = {}
+        for _, alias_id in sorted(item for item in shared if item[0] >= most - 1)[-self.candidates:]:
+            alias = self._names[alias_id]
+            score = similarity(query, alias, self.threshold)
+            key = self._keys[alias]
+            if score >= self.threshold and score > best.get(key, 0.0):
+                best[key] = round(score, 3)
+        return sorted(best.items(), key=lambda item: -item[1])[:limit]
+
+    def correct_word(self, word: str, strict: bool = True) -> str:
+        """The vocabulary word closest to ``word``, or ``word`` itself when none is close enough.
+
+        ``strict`` keeps the first letter, so ordinary words in a sentence ("phone") are not
+        turned into product words ("iphone").
+        """
+        if word in self._words or len(word) < self.min_fuzzy_length or word in COMMON_WORDS or word.isdigit():
+            return word
+        if word.endswith("s") and word[:-1] in self._words:
+            return word[:-1]
+        best, best_score = word, self.threshold
+        for word_id in self._similar_words(word):
+            candidate = self._word_list[word_id]
+            if (strict and candidate[0] != word[0]) or abs(len(candidate) - len(word)) > 2:
+                continue
+            score = similarity(word, candidate, best_score)
+            if score >= best_score:
+                best, best_score = candidate, score
+        return best
+
+    def find_in_text(self, text: str) -> List[str]:
+        """Catalog keys mentioned in free text, in order of first mention."""
+        words = [self.correct_word(word) for word in normalize(text).split()]
+        found: List[str] = []
+        i = 0
+        while i < len(words):
+            for size in range(min(self.max_words, len(words) - i), 0, -1):
+                span = " ".join(words[i:i + size])
+                key = self._keys.get(span)
+                if key is None and span.endswith("s"):
+                    key = self._keys.get(span[:-1])
+                if key is not None:
+                    if key not in found:
+                        found.append(key)
+                    i += size
+                    break
+            else:
+                i += 1
+        return found
+
+    def snapshot(self) -> Dict:
+        return {"aliases": len(self._names), "keys": len(set(self._keys.values())),
+                "vocabulary": len(self._word_list), "trigrams": len(self._word_postings)}
+
+
+def _synthetic_catalog(size: int, seed: int = 7) -> Dict[str, str]:
+    """Aliases for ``size`` generated SKUs such as "Norvia Pulse 41 Max"."""
+    rng = random.Random(seed)
+    syllables = ["ka", "lo", "mi", "ra", "ze", "tor", "vin", "nex", "sol", "qua", "bri", "den", "pha", "gro"]
+    brands = ["".join(rng.choice(syllables) for _ in range(3)).capitalize() for _ in range(300)]
+    series = ["".join(rng.choice(syllables) for _ in range(2)).capitalize() for _ in range(500)]
+    variants = ["", "Pro", "Max", "Lite", "Plus", "Mini", "Ultra", "Neo"]
+    aliases: Dict[str, str] = {}
+    while len(aliases) < size:
+        name = " ".join(filter(None, [rng.choice(brands), rng.choice(series), str(rng.randint(1, 99)),
+                                      rng.choice(variants)]))
+        aliases[name.lower()] = name.lower()
+    return aliases
+
+
+def _typo(name: str, rng: random.Random) -> str:
+    i = rng.randrange(1, len(name) - 1)
+    edit = rng.choice(["drop", "swap", "replace"])
+    if edit == "drop":
+        return name[:i] + name[i + 1:]
+    if edit == "swap":
+        return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+    return name[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + name[i + 1:]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark typo-tolerant product resolution on a synthetic catalog.")
+    parser.add_argument("--skus", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    catalog = _synthetic_catalog(args.skus)
+    start = time.perf_counter()
+    index = ProductIndex(catalog)
+    build_seconds = time.perf_counter() - start
+    names = rng.sample(list(catalog), min(args.queries, len(catalog)))
+
+    def timed(queries: List[Tuple[str, str]]) -> Dict:
+        latencies, hits = [], 0
+        for query, expected in queries:
+            start = time.perf_counter()
+            ranked = index.resolve(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += bool(ranked) and ranked[0][0] == expected
+        latencies.sort()
+        return {"queries": len(queries), "top1_accuracy": round(hits / len(queries), 3),
+                "p50_ms": round(latencies[len(latencies) // 2], 3),
+                "p99_ms": round(latencies[int(len(latencies) * 0.99)], 3)}
+
+    print(json.dumps({
+        "index": index.snapshot(),
+        "build_seconds": round(build_seconds, 2),
+        "exact": timed([(name, name) for name in names]),
+        "one_typo": timed([(_typo(name, rng), name) for name in names])
+    }, indent=2))
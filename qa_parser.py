@@ -0,0 +1,195 @@
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+from multiprocessing import Pool
+import argparse
+import json
+import os
+import re
+import time
+
+# Table labels the QA agents use for each data point, keyed by their letters only
+FIELD_ALIASES = {
+    "price": "price",
+    "pricepoint": "price",
+    "availability": "availability",
+    "availabilitystatus": "availability",
+    "stockstatus": "availability",
+    "rating": "rating",
+    "customerrating": "rating",
+    "trend": "trend",
+    "trendstatus": "trend",
+    "popularity": "popularity_score",
+    "popularityscore": "popularity_score",
+    "monthlysearches": "monthly_searches",
+    "monthlysearchvolume": "monthly_searches",
+    "searchvolume": "monthly_searches"
+}
+
+TREND_SYNONYMS = {
+    "rising": "rising", "growing": "rising", "increasing": "rising", "upward": "rising", "up": "rising",
+    "stable": "stable", "steady": "stable", "flat": "stable",
+    "declining": "declining", "falling": "declining", "decreasing": "declining", "downward": "declining"
+}
+
+_HEADING = re.compile(r"^(#{2,4})\s*(.*?)\s*#*$")
+_SEPARATOR = re.compile(r"^\|?\s*:?-{2,}")
+_VERDICT = re.compile(r"\bQA\s*[:\-]?\s*(PASS(?:ED)?|FAIL(?:ED)?)\b", re.IGNORECASE)
+_NUMBER = re.compile(r"(\d+(?:,\d{3})*(?:\.\d+)?)\s*([kKmM])?")
+_NON_LETTERS = re.compile(r"[^a-z]")
+
+
+class QARow(NamedTuple):
+    section: str
+    data_point: str
+    field: Optional[str]
+    analysis_value: str
+    fetched_value: str
+    matches: bool
+
+
+class QAReport(NamedTuple):
+    rows: List[QARow]
+    stated_verdict: Optional[str]
+    verification_text: str
+    passed: bool
+
+    @property
+    def discrepancies(self) -> List[QARow]:
+        return [row for row in self.rows if not row.matches]
+
+
+def _number(value: str) -> Optional[float]:
+    """Parse the first number in a value, honouring thousands separators and k/m suffixes."""
+    match = _NUMBER.search(value)
+    if not match:
+        return None
+    number = float(match.group(1).replace(",", ""))
+    suffix = (match.group(2) or "").lower()
+    return number * (1000 if suffix == "k" else 1_000_000 if suffix == "m" else 1)
+
+
+def _availability(value: str) -> str:
+    """Collapse availability wording into out / limited / in stock."""
+    value = value.lower()
+    if "out of stock" in value or "unavailable" in value or "not available" in value or "sold out" in value:
+        return "out"
+    if "limited" in value or "low stock" in value:
+        return "limited"
+    if "stock" in value or "available" in value:
+        return "in"
+    return value.strip()
+
+
+def values_match(field: Optional[str], reported: str, actual: str) -> bool:
+    """Compare a reported value with the source value after field-aware normalization."""
+    reported, actual = str(reported).strip(), str(actual).strip()
+    if reported.casefold() == actual.casefold():
+        return True
+    if field == "availability":
+        return _availability(reported) == _availability(actual)
+    if field == "trend":
+        words = lambda value: {TREND_SYNONYMS[w] for w in re.findall(r"[a-z]+", value.lower()) if w in TREND_SYNONYMS}
+        return bool(words(reported)) and words(reported) == words(actual)
+    reported_number, actual_number = _number(reported), _number(actual)
+    if reported_number is not None and actual_number is not None:
+        return abs(reported_number - actual_number) < 0.005
+    return " ".join(reported.casefold().split()) == " ".join(actual.casefold().split())
+
+
+def field_for_label(label: str) -> Optional[str]:
+    """Map a table label such as 'Trend Status' to its dataset field."""
+    return FIELD_ALIASES.get(_NON_LETTERS.sub("", label.lower()))
+
+
+def parse_qa_report(text: str) -> QAReport:
+    """Parse the DATA COMPARISON tables and VERIFICATION RESULT section of a QA answer."""
+    rows = []
+    verification = []
+    section = ""
+    subsection = ""
+    for raw_line in text.splitlines():
+        line = raw_line.strip().replace("**", "")
+        if not line:
+            continue
+        if line[0] == "#":
+            heading = _HEADING.match(line)
+            if heading:
+                if len(heading.group(1)) == 2:
+                    section, subsection = heading.group(2).upper(), ""
+                else:
+                    subsection = heading.group(2)
+                continue
+        if line[0] == "|":
+            if _SEPARATOR.match(line):
+                continue
+            cells = [cell.strip() for cell in line.strip("|").split("|")]
+            if len(cells) < 3 or cells[0].lower() in ("data point", "field", "metric"):
+                continue
+            field = field_for_label(cells[0])
+            rows.append(QARow(subsection, cells[0], field, cells[1], cells[2],
+                              values_match(field, cells[1], cells[2])))
+            continue
+        if section.startswith("VERIFICATION"):
+            verification.append(line)
+
+    verification_text = "\n".join(verification)
+    verdict = _VERDICT.search(verification_text) or _VERDICT.search(text)
+    stated = None
+    if verdict:
+        stated = "PASSED" if verdict.group(1).upper().startswith("PASS") else "FAILED"
+    # With tables present the verdict is recomputed; without them only the stated verdict is left
+    passed = all(row.matches for row in rows) if rows else stated == "PASSED"
+    return QAReport(rows, stated, verification_text, passed)
+
+
+def parse_many(texts: Iterable[str], workers: int = 1, chunksize: int = 256) -> Iterator[QAReport]:
+    """Parse a stream of QA answers, optionally across worker processes."""
+    if workers <= 1:
+        for text in texts:
+            yield parse_qa_report(text)
+        return
+    with Pool(workers) as pool:
+        yield from pool.imap(parse_qa_report, texts, chunksize=chunksize)
+
+
+def format_qa_report(report: QAReport) -> str:
+    """Render a parsed report as a compact table with the recomputed matches."""
+    lines = [f"{'Section':<24}{'Data Point':<20}{'Analysis':<18}{'Source':<18}Match"]
+    for row in report.rows:
+        lines.append(f"{row.section[:22]:<24}{row.data_point[:18]:<20}{row.analysis_value[:16]:<18}"
+                     f"{row.fetched_value[:16]:<18}{'yes' if row.matches else 'NO'}")
+    return "\n".join(lines)
+
+
+def _read_stored_outputs(path: str) -> Iterator[str]:
+    """Yield QA texts from a task store directory or a JSONL file of outputs."""
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for name in files:
+                if name.endswith(".json"):
+                    with open(os.path.join(root, name), encoding="utf-8") as f:
+                        yield json.load(f).get("raw_output", "")
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield record if isinstance(record, str) else record.get("raw_output") or record.get("result", "")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse stored QA outputs and recompute their verdicts.")
+    parser.add_argument("path", help="Task store directory or JSONL file of QA outputs")
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    counts = {"parsed": 0, "with_tables": 0, "passed": 0, "verdict_overturned": 0}
+    start = time.perf_counter()
+    for report in parse_many(_read_stored_outputs(args.path), workers=args.workers):
+        counts["parsed"] += 1
+        counts["with_tables"] += bool(report.rows)
+        counts["passed"] += report.passed
+        if report.rows and report.stated_verdict and (report.stated_verdict == "PASSED") != report.passed:
+            counts["verdict_overturned"] += 1
+    elapsed = time.perf_counter() - start
+    counts["reports_per_second"] = round(counts["parsed"] / elapsed, 1) if elapsed else 0.0
+    print(json.dumps(counts, indent=2))
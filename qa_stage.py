@@ -0,0 +1,187 @@
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+import re
+import threading
+
+from pydantic import Field
+
+from crew_tasks import ManagedTask
+from qa_parser import values_match
+
+# Fields each dataset reports, in the order the QA tables list them
+PRODUCT_FIELDS = ["price", "availability", "rating"]
+MARKET_FIELDS = ["trend", "popularity_score", "monthly_searches"]
+
+FIELD_LABELS = {
+    "price": "Price",
+    "availability": "Availability",
+    "rating": "Rating",
+    "trend": "Trend Status",
+    "popularity_score": "Popularity Score",
+    "monthly_searches": "Monthly Searches"
+}
+
+# How each data point shows up in an analyst's free-text answer
+FIELD_PATTERNS = {
+    "price": [re.compile(r"\$\s?(\d[\d,]*(?:\.\d{2})?)")],
+    "availability": [re.compile(r"\b(in stock|out of stock|limited stock|available|unavailable|sold out)\b", re.I)],
+    "rating": [
+        re.compile(r"\b([0-5](?:\.\d+)?)\s*(?:/\s*5|out of 5|stars?)\b", re.I),
+        re.compile(r"\brating\b[^\d\n]{0,25}([0-5]\.\d+)", re.I)
+    ],
+    "trend": [re.compile(r"\b(rising|stable|declining|falling|growing)\b", re.I)],
+    "popularity_score": [re.compile(r"\bpopularity score\b[^\d\n]{0,25}(\d{1,3})\b", re.I)],
+    "monthly_searches": [
+        re.compile(r"\b(\d{1,3}(?:,\d{3})+|\d{4,})\s*(?:monthly searches|searches per month|searches a month)", re.I),
+        re.compile(r"\bmonthly search(?:es| volume)?\b[^\d\n]{0,25}(\d{1,3}(?:,\d{3})+|\d{4,})", re.I)
+    ]
+}
+
+# Below this extraction confidence the LLM QA agent is asked instead
+DEFAULT_CONFIDENCE_THRESHOLD = 0.75
+
+
+def _normalize_extracted(field: str, value: str) -> str:
+    """Put an extracted value into the form the source data uses."""
+    value = value.strip()
+    if field == "price":
+        return "$" + value.replace(",", "")
+    if field in ("popularity_score", "monthly_searches"):
+        return value.replace(",", "")
+    if field in ("availability", "trend"):
+        return value.title()
+    return value
+
+
+def extract_data_points(text: str, fields: List[str]) -> Dict[str, Tuple[Optional[str], float]]:
+    """Pull each field's value out of free text with a per-field confidence.
+
+    A single distinct value scores 1.0, several competing values 0.5 (the first mention wins)
+    and no value at all 0.0.
+    """
+    extracted = {}
+    for field in fields:
+        values = []
+        for pattern in FIELD_PATTERNS[field]:
+            for match in pattern.finditer(text):
+                value = _normalize_extracted(field, match.group(1))
+                if value not in values:
+                    values.append(value)
+        if not values:
+            extracted[field] = (None, 0.0)
+        else:
+            extracted[field] = (values[0], 1.0 if len(values) == 1 else 0.5)
+    return extracted
+
+
+class QAStageResult(NamedTuple):
+    passed: bool
+    confidence: float
+    comparisons: List[Dict]
+    report: str
+
+
+def run_qa_stage(upstream_text: str, product: str, sources: Dict[str, Tuple[Callable[[str], Dict], List[str]]],
+                 compare: Optional[Callable[[Any, Any], bool]] = None) -> QAStageResult:
+    """Verify the data points reported upstream against the source tools, in-process.
+
+    ``sources`` maps a report section title to the source lookup and the fields it covers.
+    Values are compared with the field-aware ``values_match`` unless ``compare`` is given. Fields
+    the text never reports have ``matches`` None and are not discrepancies; the result's
+    confidence is that of the least certain field.
+    """
+    sections = []
+    comparisons = []
+    confidences = []
+    for title, (fetch, fields) in sources.items():
+        actual = fetch(product)
+        rows = []
+        for field, (reported, confidence) in extract_data_points(upstream_text, fields).items():
+            confidences.append(confidence)
+            if reported is None:
+                # An extraction gap, not a discrepancy: it leaves confidence at 0 so the LLM agent decides
+                matches = None
+            elif compare is not None:
+                matches = compare(reported, actual[field])
+            else:
+                matches = values_match(field, reported, actual[field])
+            comparisons.append({
+                "section": title,
+                "field": field,
+                "reported": reported,
+                "actual": actual[field],
+                "matches": matches
+            })
+            rows.append(f"| {FIELD_LABELS[field]} | {reported if reported is not None else 'Not reported'} | {actual[field]} |")
+        sections.append("\n".join([
+            f"### {title}",
+            "| Data Point | Value in Analysis | Value from Direct Fetch |",
+            "|------------|-------------------|-------------------------|"
+        ] + rows))
+
+    discrepancies = [c for c in comparisons if c["matches"] is False]
+    passed = not discrepancies
+    verdict = "QA PASSED" if passed else "QA FAILED"
+    details = [
+        f"- {FIELD_LABELS[c['field']]}: analysis reported {c['reported'] or 'nothing'}, source has {c['actual']}"
+        for c in discrepancies
+    ]
+    report = "\n\n".join(
+        ["## DATA COMPARISON"] + sections +
+        ["## VERIFICATION RESULT", "\n".join([verdict] + details),
+         f"Verified by Data Quality Checker (deterministic QA stage) for {product}."]
+    )
+    # The least certain field decides: one unextracted value is enough to ask the LLM agent
+    confidence = min(confidences) if confidences else 0.0
+    return QAStageResult(passed, confidence, comparisons, report)
+
+
+class QAStageStats:
+    """Counts how often the deterministic QA stage had to fall back to the LLM agent."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.fallbacks = 0
+
+    def record(self, fallback: bool):
+        with self._lock:
+            self.runs += 1
+            if fallback:
+                self.fallbacks += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "deterministic": self.runs - self.fallbacks,
+                "llm_fallbacks": self.fallbacks,
+                "fallback_rate": round(self.fallbacks / self.runs, 3) if self.runs else 0.0
+            }
+
+
+qa_stage_stats = QAStageStats()
+
+
+class DeterministicQATask(ManagedTask):
+    """QA task that verifies upstream data points in Python and only calls its agent when unsure."""
+
+    qa_product: str = Field(description="Product whose source data the analyses are checked against.")
+    qa_sources: Dict[str, Any] = Field(
+        description="Report section title -> (source lookup, fields) used for verification."
+    )
+    qa_compare: Any = Field(
+        default=None,
+        description="Optional callable deciding whether a reported value matches the source value."
+    )
+    confidence_threshold: float = Field(default=DEFAULT_CONFIDENCE_THRESHOLD)
+
+    def execute(self, agent: Any = None, context: Optional[str] = None, tools: Optional[List[Any]] = None) -> str:
+        """Run the in-process QA stage, falling back to the LLM QA agent on low extraction confidence."""
+        upstream = [task.output.raw_output for task in (self.context or []) if task.output is not None]
+        if upstream:
+            result = run_qa_stage("\n\n".join(upstream), self.qa_product, self.qa_sources, self.qa_compare)
+            if result.confidence >= self.confidence_threshold:
+                qa_stage_stats.record(fallback=False)
+                return self.complete_without_llm(result.report)
+        qa_stage_stats.record(fallback=True)
+        return super().execute(agent=agent, context=context, tools=tools)
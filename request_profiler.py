@@ -0,0 +1,287 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+DEFAULT_PROFILE_DIR = "profiles"
+FORMATS = ("speedscope", "collapsed")
+
+Frame = Tuple[str, str, int]  # function, file, first line
+
+# Sampler of the profiled request whose context this is; copied into the work it fans out
+_active_sampler: ContextVar[Optional["_Sampler"]] = ContextVar("request_profiler_sampler", default=None)
+
+
+def _stack(frame) -> Tuple[Frame, ...]:
+    """The stack above ``frame``, root first."""
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append((code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    return tuple(reversed(frames))
+
+
+class _Sampler:
+    """Samples the request thread's stack, plus the threads working for it, every ``interval`` seconds."""
+
+    def __init__(self, thread_id: int, interval: float, max_samples: int):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_samples = max_samples
+        # Pool threads currently running work for this request, by ident
+        self.threads: Dict[int, str] = {}
+        # (thread name, stack, seconds since the previous sample)
+        self.samples: List[Tuple[str, Tuple[Frame, ...], float]] = []
+        self.truncated = False
+        self.seconds = 0.0
+        self._done: Optional[Callable[["_Sampler"], None]] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            if self.truncated:
+                continue
+            frames = sys._current_frames()
+            threads = [("request", self.thread_id)] + [(name, ident) for ident, name in list(self.threads.items())]
+            for name, thread_id in threads:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                if len(self.samples) >= self.max_samples:
+                    self.truncated = True
+                    break
+                self.samples.append((name, _stack(frame), elapsed))
+        # Written here rather than on the request thread
+        if self._done is not None:
+            self._done(self)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, seconds: float, done: Callable[["_Sampler"], None]):
+        """Stop sampling and hand the samples to ``done`` on the sampler thread."""
+        self.seconds = seconds
+        self._done = done
+        self._stop.set()
+
+    def join(self):
+        self._thread.join()
+
+
+def follow(fn: Callable, *args, **kwargs) -> Any:
+    """Run ``fn``, sampling the calling thread as part of the profiled request whose context it runs in.
+
+    Work fanned out to a shared pool is submitted as ``copy_context().run(follow, fn, ...)``, so
+    only the pool threads busy with a profiled request show up in its profile.
+    """
+    sampler = _active_sampler.get()
+    if sampler is None:
+        return fn(*args, **kwargs)
+    thread = threading.current_thread()
+    sampler.threads[thread.ident] = thread.name
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        sampler.threads.pop(thread.ident, None)
+
+
+def to_collapsed(samples: List[Tuple[str, Tuple[Frame, ...], float]]) -> str:
+    """Brendan Gregg's collapsed stacks, ``thread;root;...;leaf <sample count>`` per line."""
+    counts = Counter(
+        ";".join([thread] + [f"{name} ({os.path.basename(filename)}:{line})" for name, filename, line in stack])
+        for thread, stack, _ in samples
+    )
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
+
+
+def to_speedscope(samples: List[Tuple[str, Tuple[Frame, ...], float]], name: str) -> Dict:
+    """A speedscope file with one sampled profile per thread, weighted by the time between samples."""
+    frame_ids: Dict[Frame, int] = {}
+    profiles: Dict[str, Dict] = {}
+    for thread, stack, seconds in samples:
+        profile = profiles.setdefault(thread, {"type": "sampled", "name": thread, "unit": "seconds",
+                                               "startValue": 0.0, "endValue": 0.0, "samples": [], "weights": []})
+        profile["samples"].append([frame_ids.setdefault(frame, len(frame_ids)) for frame in stack])
+        profile["weights"].append(round(seconds, 6))
+        profile["endValue"] = round(profile["endValue"] + seconds, 6)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "request_profiler",
+        "activeProfileIndex": 0,
+        "shared": {"frames": [{"name": function, "file": filename, "line": line}
+                              for function, filename, line in frame_ids]},
+        "profiles": list(profiles.values())
+    }
+
+
+def _top_functions(samples: List[Tuple[str, Tuple[Frame, ...], float]], top: int = 10) -> List[Dict]:
+    """Functions of the request thread by self and total sampled time."""
+    self_time: Counter = Counter()
+    total_time: Counter = Counter()
+    for thread, stack, seconds in samples:
+        if thread != "request" or not stack:
+            continue
+        self_time[stack[-1]] += seconds
+        for frame in set(stack):
+            total_time[frame] += seconds
+    return [{"function": f"{name} ({os.path.basename(filename)}:{line})",
+             "self_seconds": round(seconds, 3), "total_seconds": round(total_time[(name, filename, line)], 3)}
+            for (name, filename, line), seconds in self_time.most_common(top)]
+
+
+class RequestProfiler:
+    """Opt-in sampling profiler for individual chat requests.
+
+    A request is profiled when it carries ``header`` or wins the ``sample_rate`` draw. A sampler
+    thread then records the request thread's stack every ``interval`` seconds, plus the stacks
+    of pool threads while they run the request's work through ``follow``. Once the request is
+    done, the sampler thread writes the samples to ``directory`` as a speedscope or
+    collapsed-stack file, and the newest ``max_profiles`` files are kept. Requests that are not
+    profiled pay for one header lookup and one random draw.
+    """
+
+    def __init__(self, directory: str = DEFAULT_PROFILE_DIR, sample_rate: float = 0.0, interval: float = 0.005,
+                 fmt: str = "speedscope", header: str = "X-Profile", max_profiles: int = 50,
+                 max_samples: int = 100_000):
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.fmt = fmt
+        self.header = header
+        self.max_profiles = max_profiles
+        self.max_samples = max_samples
+        self.recent: deque = deque(maxlen=max_profiles)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._writing: Set[_Sampler] = set()
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["RequestProfiler"]:
+        """Profiler configured by ``REQUEST_PROFILING_*`` variables, or None unless profiling is enabled."""
+        if os.getenv("REQUEST_PROFILING", "off").lower() not in ("1", "on", "true", "yes"):
+            return None
+        return cls(
+            directory=os.getenv("REQUEST_PROFILING_DIR", DEFAULT_PROFILE_DIR),
+            sample_rate=float(os.getenv("REQUEST_PROFILING_SAMPLE_RATE", "0")),
+            interval=float(os.getenv("REQUEST_PROFILING_INTERVAL_MS", "5")) / 1000,
+            fmt=os.getenv("REQUEST_PROFILING_FORMAT", "speedscope"),
+            header=os.getenv("REQUEST_PROFILING_HEADER", "X-Profile"),
+            max_profiles=int(os.getenv("REQUEST_PROFILING_MAX", "50"))
+        )
+
+    def wanted(self, header_value: Optional[str]) -> bool:
+        """Whether to profile a request, given the value of its profiling header (if any)."""
+        if header_value:
+            return header_value.lower() not in ("0", "off", "false", "no")
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def profile(self, label: str = "request", **details) -> Iterator[Dict]:
+        """Sample the calling thread for the duration of the block.
+
+        Yields the profile's entry, whose ``file`` is known before the block runs; the rest of
+        the entry is filled in when the profile is written.
+        """
+        number = next(self._ids)
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{number:04d}-{label}" + \
+                   (".speedscope.json" if self.fmt == "speedscope" else ".collapsed.txt")
+        entry = {"file": filename, "label": label, **details}
+        sampler = _Sampler(threading.get_ident(), self.interval, self.max_samples)
+        token = _active_sampler.set(sampler)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            yield entry
+        finally:
+            _active_sampler.reset(token)
+            with self._lock:
+                self._writing.add(sampler)
+            sampler.stop(time.perf_counter() - start, lambda done: self._write(entry, done))
+
+    def _write(self, entry: Dict, sampler: _Sampler):
+        try:
+            path = os.path.join(self.directory, entry["file"])
+            with open(path, "w") as f:
+                if self.fmt == "speedscope":
+                    json.dump(to_speedscope(sampler.samples, entry["file"]), f)
+                else:
+                    f.write(to_collapsed(sampler.samples))
+            entry.update({
+                "created": time.time(),
+                "seconds": round(sampler.seconds, 3),
+                "samples": len(sampler.samples),
+                "threads": sorted({thread for thread, _, _ in sampler.samples}),
+                "truncated": sampler.truncated,
+                "top_functions": _top_functions(sampler.samples)
+            })
+            with self._lock:
+                if len(self.recent) == self.recent.maxlen:
+                    expired = self.recent[0]["file"]
+                    try:
+                        os.remove(os.path.join(self.directory, expired))
+                    except OSError:
+                        pass
+                self.recent.append(entry)
+        finally:
+            with self._lock:
+                self._writing.discard(sampler)
+
+    def flush(self):
+        """Wait until the profiles of finished requests are written."""
+        with self._lock:
+            writing = list(self._writing)
+        for sampler in writing:
+            sampler.join()
+
+    def path(self, filename: str) -> Optional[str]:
+        """Path of a recent profile by file name, or None if it is not one of them."""
+        with self._lock:
+            known = {entry["file"] for entry in self.recent}
+        return os.path.join(self.directory, filename) if filename in known else None
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            profiles = list(reversed(self.recent))
+        return {
+            "settings": {"directory": self.directory, "sample_rate": self.sample_rate,
+                         "interval_ms": self.interval * 1000, "format": self.fmt, "header": self.header},
+            "profiles": profiles
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile chatbot responses to a few messages and list the profiles.")
+    parser.add_argument("messages", nargs="*", default=["What is the price of the iPhone?"])
+    parser.add_argument("--format", choices=FORMATS, default="speedscope")
+    parser.add_argument("--interval-ms", type=float, default=5.0)
+    parser.add_argument("--directory", default=DEFAULT_PROFILE_DIR)
+    args = parser.parse_args()
+
+    # Offline by default: the crews run on the stub LLM
+    os.environ.setdefault("LLM_PROVIDER", "stub")
+    import chatbot_app
+
+    profiler = RequestProfiler(args.directory, interval=args.interval_ms / 1000, fmt=args.format)
+    for message in args.messages:
+        query_type = chatbot_app.detect_query_type(message)
+        with profiler.profile(query_type, query_type=query_type):
+            chatbot_app.generate_response(message)
+    profiler.flush()
+    print(json.dumps(profiler.snapshot(), indent=2))
@@ -0,0 +1,268 @@
+from typing import Any, Dict, Iterator, List, Tuple
+import argparse
+import json
+import time
+import tracemalloc
+from json.encoder import encode_basestring_ascii
+
+try:
+    import orjson
+except ImportError:  # optional: dumps() falls back to to_json()
+    orjson = None
+
+# Compact separators, as Flask's jsonify uses outside debug mode
+_encode_fallback = json.JSONEncoder(separators=(",", ":")).encode
+
+
+class _Unset:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "<unset>"
+
+
+# Marks an optional field that was never set; unset fields are left out of the JSON
+UNSET = _Unset()
+
+
+class Record:
+    """Slotted record with a fixed field list, read/write mapping access and a direct JSON form.
+
+    Mapping access (``record["price"]``, ``"data" in record``, ``record.get``, ``**record``) keeps
+    code written against the old response dicts working; fields that are unset behave like
+    missing keys.
+    """
+
+    __slots__ = ()
+    _fields: Tuple[str, ...] = ()
+    _field_set: frozenset = frozenset()
+    _prefixes: Tuple[Tuple[str, str], ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._fields = tuple(cls.__slots__)
+        cls._field_set = frozenset(cls._fields)
+        cls._prefixes = tuple((name, encode_basestring_ascii(name) + ":") for name in cls._fields)
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        if len(args) > len(self._fields):
+            raise TypeError(f"{type(self).__name__} takes at most {len(self._fields)} positional arguments")
+        for name, value in zip(self._fields, args):
+            setattr(self, name, value)
+        for name in self._fields[len(args):]:
+            setattr(self, name, kwargs.pop(name, UNSET))
+        if kwargs:
+            raise TypeError(f"{type(self).__name__} has no field {next(iter(kwargs))!r}")
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]):
+        return cls(**{name: data[name] for name in cls._fields if name in data})
+
+    def __getitem__(self, key: str) -> Any:
+        value = getattr(self, key, UNSET) if key in self._field_set else UNSET
+        if value is UNSET:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in self._field_set:
+            raise KeyError(f"{type(self).__name__} has no field {key!r}")
+        setattr(self, key, value)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._field_set and getattr(self, key) is not UNSET
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self) -> List[str]:
+        return [name for name in self._fields if getattr(self, name) is not UNSET]
+
+    def items(self) -> List[Tuple[str, Any]]:
+        return [(name, getattr(self, name)) for name in self.keys()]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Record):
+            other = other.to_dict()
+        return isinstance(other, dict) and self.to_dict() == other
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={value!r}" for name, value in self.items())
+        return f"{type(self).__name__}({fields})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: _plain(value) for name, value in self.items()}
+
+    def to_json(self) -> str:
+        """Compact JSON of the set fields, in field order."""
+        parts = []
+        for name, prefix in self._prefixes:
+            value = getattr(self, name)
+            if value is not UNSET:
+                parts.append(prefix + (encode_basestring_ascii(value) if value.__class__ is str else to_json(value)))
+        return "{" + ",".join(parts) + "}"
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    return value
+
+
+def to_json(value: Any) -> str:
+    """Serialize records, lists, dicts and scalars straight to a compact JSON string."""
+    cls = type(value)
+    if cls is str:
+        return encode_basestring_ascii(value)
+    if isinstance(value, Record):
+        return value.to_json()
+    if cls is list or cls is tuple:
+        return "[" + ",".join([to_json(item) for item in value]) + "]"
+    if cls is dict:
+        return "{" + ",".join([encode_basestring_ascii(str(key)) + ":" + to_json(item)
+                               for key, item in value.items()]) + "}"
+    if value is None:
+        return "null"
+    if cls is bool:
+        return "true" if value else "false"
+    if cls is int:
+        return int.__repr__(value)
+    return _encode_fallback(value)
+
+
+def _record_fields(value: Any) -> Dict[str, Any]:
+    if isinstance(value, Record):
+        return {name: field for name in value._fields if (field := getattr(value, name)) is not UNSET}
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(value: Any) -> bytes:
+    """Response body bytes for ``value``: orjson when installed, ``to_json`` otherwise."""
+    if orjson is not None:
+        return orjson.dumps(value, default=_record_fields, option=orjson.OPT_NON_STR_KEYS)
+    return to_json(value).encode("utf-8")
+
+
+class ProductData(Record):
+    __slots__ = ("product", "price", "availability", "rating")
+
+
+class MarketData(Record):
+    __slots__ = ("product", "trend", "popularity_score", "monthly_searches")
+
+
+class ThinkingStep(Record):
+    __slots__ = ("step", "content")
+
+
+class QAComparison(Record):
+    __slots__ = ("field", "reported", "actual", "matches")
+
+
+class QAResult(Record):
+    __slots__ = ("passed", "message", "comparison", "product_comparison", "market_comparison", "products")
+
+
+class ChatResponse(Record):
+    __slots__ = ("response", "data", "product_data", "market_data", "comparison_data",
+                 "thinking_steps", "qa_result", "timing")
+
+
+def _sample_payload(i: int) -> Dict:
+    """A comprehensive-query response of typical size, built from dicts as chatbot_app did."""
+    product = {"product": f"Phone {i}", "price": "$999", "availability": "In Stock", "rating": 4.8}
+    market = {"product": f"Phone {i}", "trend": "Rising", "popularity_score": 92, "monthly_searches": 45000}
+    steps = [
+        {"step": f"Agent {n} - Initial Analysis", "content": f"Analysis {i}.{n}: " + "The product shows strong demand. " * 8}
+        for n in range(8)
+    ]
+    comparisons = [
+        {"field": field, "reported": value, "actual": value, "matches": True}
+        for field, value in list(product.items())[1:] + list(market.items())[1:]
+    ]
+    return {
+        "response": f"Here's what I found about Phone {i}.",
+        "product_data": product,
+        "market_data": market,
+        "thinking_steps": steps,
+        "qa_result": {"passed": True, "product_comparison": comparisons[:3], "market_comparison": comparisons[3:],
+                      "message": "QA verification passed"}
+    }
+
+
+def _sample_records(i: int) -> "ChatResponse":
+    """The same response as ``_sample_payload``, built from records."""
+    product = ProductData(f"Phone {i}", "$999", "In Stock", 4.8)
+    market = MarketData(f"Phone {i}", "Rising", 92, 45000)
+    steps = [
+        ThinkingStep(f"Agent {n} - Initial Analysis", f"Analysis {i}.{n}: " + "The product shows strong demand. " * 8)
+        for n in range(8)
+    ]
+    comparisons = [
+        QAComparison(field, value, value, True)
+        for field, value in product.items()[1:] + market.items()[1:]
+    ]
+    return ChatResponse(
+        response=f"Here's what I found about Phone {i}.",
+        product_data=product,
+        market_data=market,
+        thinking_steps=steps,
+        qa_result=QAResult(passed=True, message="QA verification passed",
+                           product_comparison=comparisons[:3], market_comparison=comparisons[3:])
+    )
+
+
+def benchmark(count: int, rounds: int) -> Dict:
+    """Memory per retained response and serialization throughput, records versus dicts.
+
+    Dicts are serialized the way Flask's jsonify does (C encoder, sorted keys).
+    """
+    jsonify_encode = json.JSONEncoder(separators=(",", ":"), sort_keys=True).encode
+    report = {}
+    variants = [("dicts", _sample_payload, jsonify_encode), ("records", _sample_records, to_json)]
+    if orjson is not None:
+        variants.append(("records_orjson", _sample_records, dumps))
+    for label, build, encode in variants:
+        tracemalloc.start()
+        payloads = [build(i) for i in range(count)]
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for payload in payloads:
+                encode(payload)
+        encode_elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in range(count):
+            encode(build(i))
+        build_elapsed = time.perf_counter() - start
+        report[label] = {
+            "bytes_per_response": round(retained / count),
+            "serialized_per_second": round(count * rounds / encode_elapsed),
+            "built_and_serialized_per_second": round(count / build_elapsed)
+        }
+    # Both forms must serialize to the same document
+    assert json.loads(to_json(_sample_records(0))) == json.loads(jsonify_encode(_sample_payload(0)))
+    assert json.loads(dumps(_sample_records(0))) == json.loads(jsonify_encode(_sample_payload(0)))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare slotted response records with plain dicts.")
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(benchmark(args.count, args.rounds), indent=2))
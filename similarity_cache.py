@@ -0,0 +1,273 @@
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from collections import OrderedDict
+from contextlib import contextmanager
+import argparse
+import contextvars
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from langchain_core.caches import BaseCache
+
+from completion_cache import record_lookup
+from product_catalog import find_products_in_text
+
+# MinHash signature size and LSH banding (bands * rows must equal NUM_PERM)
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+DEFAULT_THRESHOLD = 0.9
+# Misses awaiting their update(); a call that raises never sends one, so the oldest are dropped
+MAX_PENDING = 256
+
+_rng = random.Random(1729)
+_MASKS = [_rng.getrandbits(64) for _ in range(NUM_PERM)]
+_WORD = re.compile(r"[a-z0-9]+")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+# Near-duplicate matching only happens inside an opted-in scope, and only between prompts stored
+# under the same scope key; exact hits are always served
+_similarity_scope = contextvars.ContextVar("similarity_scope", default=None)
+
+
+@contextmanager
+def similarity_scope(key: Optional[str] = ""):
+    """Allow near-duplicate cache hits among LLM calls made under ``key``; None forbids them."""
+    token = _similarity_scope.set(key)
+    try:
+        yield
+    finally:
+        _similarity_scope.reset(token)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase, unescape and strip punctuation so formatting noise does not affect similarity."""
+    return " ".join(_WORD.findall(prompt.replace("\\n", " ").lower()))
+
+
+def _shingles(normalized: str) -> set:
+    words = normalized.split()
+    if len(words) < SHINGLE_SIZE:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+    return {int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "big") for gram in grams}
+
+
+def minhash(shingles: set) -> Tuple[int, ...]:
+    """MinHash signature using XOR-masked 64-bit shingle hashes as the permutations."""
+    return tuple(min(shingle ^ mask for shingle in shingles) for mask in _MASKS)
+
+
+def guard_signature(prompt: str) -> Tuple:
+    """Terms that must match exactly for a near-duplicate to be reusable: products and numbers."""
+    return tuple(sorted(find_products_in_text(prompt))), tuple(sorted(set(_NUMBER.findall(prompt))))
+
+
+class _Entry:
+    __slots__ = ("llm_string", "prompt", "value", "signature", "guard", "scope", "latency")
+
+    def __init__(self, llm_string, prompt, value, signature, guard, scope, latency):
+        self.llm_string = llm_string
+        self.prompt = prompt
+        self.value = value
+        self.signature = signature
+        self.guard = guard
+        self.scope = scope
+        self.latency = latency
+
+
+class SimilarityCache(BaseCache):
+    """LLM cache that also serves near-duplicate prompts via MinHash LSH.
+
+    Near-duplicates must share the model settings (``llm_string``), the similarity scope, the
+    products and numbers in the prompt, and an estimated Jaccard similarity of at least ``threshold``.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, max_entries: int = 10000,
+                 inner: Optional[BaseCache] = None):
+        if not 0.0 <= threshold <= 1.0:
+            raise ValueError(f"threshold must be between 0 and 1, got {threshold!r}")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.inner = inner
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._buckets: Dict[Tuple, set] = {}
+        self._pending: Dict[Tuple[int, str, str], float] = {}
+        self.stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "evictions": 0, "seconds_saved": 0.0}
+
+    def _band_keys(self, llm_string: str, signature: Tuple[int, ...]) -> Iterator[Tuple]:
+        for band in range(BANDS):
+            yield (llm_string, band) + signature[band * ROWS:(band + 1) * ROWS]
+
+    def _find_similar(self, llm_string: str, prompt: str, scope: str) -> Optional[_Entry]:
+        signature = minhash(_shingles(normalize_prompt(prompt)))
+        guard = guard_signature(prompt)
+        candidates = set()
+        for key in self._band_keys(llm_string, signature):
+            candidates |= self._buckets.get(key, set())
+        best, best_score = None, self.threshold
+        for candidate_key in candidates:
+            entry = self._entries[candidate_key]
+            if entry.scope != scope or entry.guard != guard:
+                continue
+            score = sum(a == b for a, b in zip(signature, entry.signature)) / NUM_PERM
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    def _hit(self, entry: _Entry, kind: str):
+        self._entries.move_to_end((entry.llm_string, entry.prompt))
+        record_lookup(True)
+        self.stats[kind] += 1
+        self.stats["seconds_saved"] += entry.latency or 0.0
+        return entry.value
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Any]]:
+        """Return a cached generation for the prompt, or a near-duplicate's inside a similarity scope."""
+        with self._lock:
+            entry = self._entries.get((llm_string, prompt))
+            if entry is not None:
+                return self._hit(entry, "exact_hits")
+            scope = _similarity_scope.get()
+            if scope is not None:
+                entry = self._find_similar(llm_string, prompt, scope)
+                if entry is not None:
+                    return self._hit(entry, "similar_hits")
+        if self.inner is not None:
+            value = self.inner.lookup(prompt, llm_string)
+            if value is not None:
+                with self._lock:
+                    self.stats["exact_hits"] += 1
+                return value
+        if self.inner is None:
+            record_lookup(False)
+        with self._lock:
+            self.stats["misses"] += 1
+            # Remember when the miss happened so update() can record how long generation took
+            self._pending[(threading.get_ident(), llm_string, prompt)] = time.perf_counter()
+            if len(self._pending) > MAX_PENDING:
+                del self._pending[next(iter(self._pending))]
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Any], latency: Optional[float] = None):
+        """Store a generation and index it for near-duplicate lookups."""
+        with self._lock:
+            started = self._pending.pop((threading.get_ident(), llm_string, prompt), None)
+            if latency is None and started is not None:
+                latency = time.perf_counter() - started
+            key = (llm_string, prompt)
+            if key in self._entries:
+                self._remove(key)
+            signature = minhash(_shingles(normalize_prompt(prompt)))
+            entry = _Entry(llm_string, prompt, return_val, signature, guard_signature(prompt),
+                           _similarity_scope.get(), latency)
+            self._entries[key] = entry
+            for band_key in self._band_keys(llm_string, signature):
+                self._buckets.setdefault(band_key, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+        if self.inner is not None:
+            self.inner.update(prompt, llm_string, return_val)
+
+    def _remove(self, key: Tuple[str, str]):
+        entry = self._entries.pop(key)
+        for band_key in self._band_keys(entry.llm_string, entry.signature):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def clear(self, **kwargs: Any):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self._pending.clear()
+        if self.inner is not None:
+            self.inner.clear(**kwargs)
+
+    def snapshot(self) -> Dict:
+        """Hit rate and latency saved so far."""
+        with self._lock:
+            lookups = self.stats["exact_hits"] + self.stats["similar_hits"] + self.stats["misses"]
+            hits = lookups - self.stats["misses"]
+            return {
+                **self.stats,
+                "seconds_saved": round(self.stats["seconds_saved"], 3),
+                "entries": len(self._entries),
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0
+            }
+
+
+def threshold_from_env() -> Optional[float]:
+    """``SIMILARITY_CACHE_THRESHOLD`` as a number between 0 and 1, or None when it is unset."""
+    value = os.getenv("SIMILARITY_CACHE_THRESHOLD", "").strip()
+    if not value:
+        return None
+    try:
+        threshold = float(value)
+    except ValueError:
+        threshold = float("nan")
+    if not 0.0 <= threshold <= 1.0:
+        raise ValueError(f"SIMILARITY_CACHE_THRESHOLD must be a number between 0 and 1, got {value!r}")
+    return threshold
+
+
+def install_similarity_cache(threshold: float = DEFAULT_THRESHOLD, max_entries: int = 10000,
+                             inner: Optional[BaseCache] = None) -> SimilarityCache:
+    """Install a SimilarityCache as langchain's global LLM cache, so every crew uses it."""
+    from langchain.globals import set_llm_cache
+    cache = SimilarityCache(threshold=threshold, max_entries=max_entries, inner=inner)
+    set_llm_cache(cache)
+    return cache
+
+
+def _read_log(path: str) -> Iterator[Dict]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def replay(records: List[Dict], threshold: float, max_entries: int) -> Dict:
+    """Replay logged prompts through a fresh cache, storing each miss as its own answer.
+
+    Each record needs a ``prompt`` (or chat ``message``) and may carry ``llm_string``, ``latency_ms``,
+    ``scope`` (the task label; defaults to one shared scope) and ``similarity`` (defaults to true).
+    """
+    cache = SimilarityCache(threshold=threshold, max_entries=max_entries)
+    lookup_seconds = 0.0
+    for record in records:
+        prompt = record.get("prompt") or record.get("message", "")
+        llm_string = record.get("llm_string", "")
+        latency = record.get("latency_ms", 0.0) / 1000.0
+        start = time.perf_counter()
+        with similarity_scope(record.get("scope", "") if record.get("similarity", True) else None):
+            value = cache.lookup(prompt, llm_string)
+            lookup_seconds += time.perf_counter() - start
+            if value is None:
+                cache.update(prompt, llm_string, [prompt], latency=latency)
+    report = cache.snapshot()
+    report["threshold"] = threshold
+    report["mean_lookup_ms"] = round(lookup_seconds / len(records) * 1000, 3) if records else 0.0
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a prompt log through the near-duplicate cache.")
+    parser.add_argument("log", help="JSONL with one {'prompt' or 'message', 'latency_ms', ...} per line")
+    parser.add_argument("--threshold", type=float, nargs="+", default=[DEFAULT_THRESHOLD])
+    parser.add_argument("--max-entries", type=int, default=10000)
+    args = parser.parse_args()
+
+    records = list(_read_log(args.log))
+    for threshold in args.threshold:
+        print(json.dumps(replay(records, threshold, args.max_entries), indent=2))
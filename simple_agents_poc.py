@@ -1,64 +1,50 @@
 from crewai import Agent, Task, Crew, Process
 from langchain.agents import tool
-from typing import Dict, Any, Optional, Type, Union, Annotated
+from typing import Dict, Any, List, Optional, Type, Union
 import os
 from dotenv import load_dotenv
 import json
-from pydantic import BeforeValidator
+from task_checkpoint import run_with_checkpoints, format_checkpoint_report
+from crew_tasks import ManagedTask, TaskGuard, run_metadata
+from iteration_budget import iteration_budgets
+from qa_stage import DeterministicQATask, MARKET_FIELDS, PRODUCT_FIELDS, qa_stage_stats
+from qa_parser import parse_qa_report, format_qa_report
+from context_assembler import format_context_report
+from completion_cache import install_completion_cache
+from product_catalog import keyed_records, parse_products
+from llm_config import build_llm
 
 # Load environment variables from .env file
 load_dotenv()
+# Reuse completions from earlier runs and other processes
+install_completion_cache()
 
-# Helper function to extract product name from various input formats
-def parse_product_input(value: Any) -> str:
-    """Extract product name from various input formats."""
-    if isinstance(value, dict):
-        # Handle the specific case of {'description': 'iPhone', 'type': 'str'}
-        if 'description' in value and isinstance(value['description'], str):
-            return value['description']
-        # Handle other dict formats like {'product': 'iPhone'}
-        elif 'product' in value and isinstance(value['product'], str):
-            return value['product']
-    elif isinstance(value, str):
-        # Handle JSON strings
-        if value.strip().startswith('{') or value.strip().startswith('"'):
-            try:
-                parsed = json.loads(value)
-                if isinstance(parsed, dict):
-                    if 'description' in parsed and isinstance(parsed['description'], str):
-                        return parsed['description']
-                    elif 'product' in parsed and isinstance(parsed['product'], str):
-                        return parsed['product']
-                elif isinstance(parsed, str):
-                    return parsed
-                return value
-            except json.JSONDecodeError:
-                # Not valid JSON, return as is
-                pass
-    # Return value as is for other cases
-    return str(value)
-
-# Define the annotated type with validator
-ProductInput = Annotated[str, BeforeValidator(parse_product_input)]
+# Helper function to extract product names from various input formats
+def parse_product_input(value: Any) -> List[str]:
+    """Extract product names from one name, a list, a comma-separated or JSON string, or a dict."""
+    return parse_products(value)
 
 # Define tools using the simpler @tool decorator with type annotations
 @tool("Fetch Product Data")
-def fetch_product_data(product: ProductInput) -> str:
-    """Fetch product pricing, availability, and rating for a given product name."""
+def fetch_product_data(product: Union[str, List[str]]) -> str:
+    """Fetch product pricing, availability, and rating for one product name or a list of product names;
+    several products come back keyed by name."""
     try:
-        print(f"Fetching product data for: {product}")
-        data = _get_product_data(product)
-        return json.dumps(data)
+        # crewai calls tool._run(**arguments), which skips pydantic validation, so parse here
+        products = parse_product_input(product)
+        print(f"Fetching product data for: {', '.join(products)}")
+        return json.dumps(keyed_records([_get_product_data(name) for name in products]))
     except Exception as e:
         return f"Error fetching product data: {str(e)}"
 
 @tool("Fetch Market Trends")
-def fetch_market_trends(product: ProductInput) -> str:
-    """Fetch trend status and popularity metrics for the given product name."""
+def fetch_market_trends(product: Union[str, List[str]]) -> str:
+    """Fetch trend status and popularity metrics for one product name or a list of product names;
+    several products come back keyed by name."""
     try:
-        print(f"Fetching market trends for: {product}")
-        data = _get_market_trends(product)
-        return json.dumps(data)
+        products = parse_product_input(product)
+        print(f"Fetching market trends for: {', '.join(products)}")
+        return json.dumps(keyed_records([_get_market_trends(name) for name in products]))
     except Exception as e:
         return f"Error fetching market trends: {str(e)}"
 
@@ -105,192 +91,184 @@ def verify_iphone_data():
     print("=" * 50)
     return product_data, market_data
 
-# Define agents with specific instructions on tool usage
-market_analyst = Agent(
-    role="Market Research Analyst",
-    goal="Analyze market trends and product performance",
-    backstory="""You are an experienced market analyst with expertise in 
-    consumer electronics. You provide detailed analysis of product performance 
-    and market trends to help guide business decisions.""",
-    verbose=True,
-    tools=[fetch_market_trends],
-    allow_delegation=False
+# Skip the summary's LLM call entirely when the QA report (last upstream output) does not pass
+qa_failed_guard = TaskGuard(
+    name="qa_failed",
+    condition=lambda outputs: not outputs or not parse_qa_report(outputs[-1]).passed,
+    template="The summary cannot be provided until data issues are resolved: "
+             "QA verification did not pass (skipped by guard '{guard}')."
 )
 
-product_specialist = Agent(
-    role="Product Specialist",
-    goal="Analyze product specifications and availability",
-    backstory="""You are a product specialist with deep knowledge of consumer 
-    electronics. Your expertise helps companies understand product details
-    and market positioning. When describing product availability, always use the
-    exact phrase 'In Stock' when available.""",
-    verbose=True,
-    tools=[fetch_product_data],
-    allow_delegation=False
-)
 
-qa_specialist = Agent(
-    role="Data Quality Checker",
-    goal="Create detailed side-by-side comparisons of data and verify accuracy",
-    backstory="""You are a data quality checker responsible for verifying 
-    that analysts are using correct data in their reports. Your primary task
-    is to compare the data from the analyses with the source data and present
-    a detailed side-by-side comparison table showing both sets of values.
-    You understand that minor format differences (like 'Available' vs 'In Stock') 
-    are acceptable as long as the meaning is the same, and you normalize these differences 
-    in your reporting to ensure consistency.""",
-    verbose=True,
-    # QA agent uses both tools for verification
-    tools=[fetch_product_data, fetch_market_trends],
-    allow_delegation=False
-)
+def create_qa_crew(llm=None, verbose: bool = True) -> Crew:
+    """Create the iPhone market, product, QA and summary crew."""
+    # One chat model shared by the agents (LLM_PROVIDER=stub runs offline)
+    llm = llm or build_llm()
 
-# Define tasks
-research_task = Task(
-    description="""Analyze the iPhone market trends and provide insights.
-    Be sure to include popularity metrics and comparison with industry averages.
-    Your final report should include:
-    1. Current trend status
-    2. Popularity score interpretation
-    3. Monthly search volume significance
-    
-    To get market trends data, use the 'Fetch Market Trends' tool with 'iPhone' as the product.
-    IMPORTANT: When using the tool, simply pass the string "iPhone" directly.
-    """,
-    expected_output="""A comprehensive market trend analysis for iPhone including trend status, 
-    popularity score interpretation, and monthly search volume significance compared with industry averages.""",
-    agent=market_analyst
-)
+    # Define agents with specific instructions on tool usage
+    market_analyst = Agent(
+        role="Market Research Analyst",
+        goal="Analyze market trends and product performance",
+        backstory="""You are an experienced market analyst with expertise in 
+        consumer electronics. You provide detailed analysis of product performance 
+        and market trends to help guide business decisions.""",
+        verbose=verbose,
+        tools=[fetch_market_trends],
+        allow_delegation=False,
+        llm=llm
+    )
 
-product_analysis_task = Task(
-    description="""Analyze the iPhone product details and provide a comprehensive report.
-    Focus on:
-    1. Price point analysis
-    2. Availability status
-    3. Customer rating significance
-    Compare with industry standards and provide recommendations.
-    
-    To get product data, use the 'Fetch Product Data' tool with 'iPhone' as the product.
-    IMPORTANT: When using the tool, simply pass the string "iPhone" directly.
-    Be sure to use the exact availability description from the data ("In Stock" or "Out of Stock").
-    """,
-    expected_output="""A detailed product analysis for iPhone covering price point analysis, 
-    availability status, and customer rating significance, with comparisons to industry standards 
-    and actionable recommendations.""",
-    agent=product_specialist
-)
+    product_specialist = Agent(
+        role="Product Specialist",
+        goal="Analyze product specifications and availability",
+        backstory="""You are a product specialist with deep knowledge of consumer 
+        electronics. Your expertise helps companies understand product details
+        and market positioning. When describing product availability, always use the
+        exact phrase 'In Stock' when available.""",
+        verbose=verbose,
+        tools=[fetch_product_data],
+        allow_delegation=False,
+        llm=llm
+    )
 
-qa_task = Task(
-    description="""Your job is to verify data accuracy by comparing the data points in the analyses with the source data.
+    qa_specialist = Agent(
+        role="Data Quality Checker",
+        goal="Create detailed side-by-side comparisons of data and verify accuracy",
+        backstory="""You are a data quality checker responsible for verifying 
+        that analysts are using correct data in their reports. Your primary task
+        is to compare the data from the analyses with the source data and present
+        a detailed side-by-side comparison table showing both sets of values.
+        You understand that minor format differences (like 'Available' vs 'In Stock') 
+        are acceptable as long as the meaning is the same, and you normalize these differences 
+        in your reporting to ensure consistency.""",
+        verbose=verbose,
+        # QA agent uses both tools for verification
+        tools=[fetch_product_data, fetch_market_trends],
+        allow_delegation=False,
+        llm=llm
+    )
 
-    1. First, you need to extract the key data points from both analyses:
-       - From market analysis: trend status, popularity score, monthly searches
-       - From product analysis: price, availability, rating
-    
-    2. Then, use your tools to independently fetch the same data for iPhone:
-       - First, use 'Fetch Market Trends' tool with "iPhone" as input
-       - Then, use 'Fetch Product Data' tool with "iPhone" as input
-       
-    3. Create a detailed side-by-side comparison:
-    
-       You MUST format your response as follows:
-       
-       ## DATA COMPARISON
-       
-       ### Market Analysis Data
-       | Data Point | Value in Analysis | Value from Direct Fetch |
-       |------------|-------------------|-------------------------|
-       | Trend Status | (value) | (value) |
-       | Popularity Score | (value) | (value) |
-       | Monthly Searches | (value) | (value) |
-       
-       ### Product Analysis Data
-       | Data Point | Value in Analysis | Value from Direct Fetch |
-       |------------|-------------------|-------------------------|
-       | Price | (value) | (value) |
-       | Availability | (value) | (value) |
-       | Rating | (value) | (value) |
-       
-       ## VERIFICATION RESULT
-       
-       (Write "QA PASSED" or "QA FAILED" here, followed by any discrepancies you found)
-       
-    4. IMPORTANT: When comparing availability status, normalize the values:
-       - "Available", "In Stock", "Available now", etc. are all considered equivalent
-       - Similarly, normalize rating formats (e.g., "4.8/5" and "4.8" are equivalent)
-       - For monthly searches, "45,000" and "45000" are equivalent
-       
-    5. Only report QA FAILED if there's a genuine data discrepancy, not just format differences.
-       
-    This exact format is required for the data tracking system - do not deviate from it.
-    """,
-    expected_output="""A detailed data comparison in table format followed by a verification result (PASS/FAIL).""",
-    agent=qa_specialist,
-    context=[research_task, product_analysis_task]
-)
+    # Define tasks
+    research_task = ManagedTask(
+        description="""Analyze the iPhone market trends and provide insights.
+        Be sure to include popularity metrics and comparison with industry averages.
+        Your final report should include:
+        1. Current trend status
+        2. Popularity score interpretation
+        3. Monthly search volume significance
 
-# Task to produce final summary if QA passes
-summary_task = Task(
-    description="""Create a final summary of the iPhone market and product analysis ONLY IF
-    the QA verification has passed.
-    
-    If QA has passed, synthesize the key points from both the market and product analyses into
-    a concise executive summary highlighting the most important findings and recommendations.
-    
-    If QA has failed, simply state that the summary cannot be provided until data issues are resolved.
-    """,
-    expected_output="""Either a concise executive summary of market and product analyses, 
-    or a statement that the summary is pending due to data verification issues.""",
-    agent=market_analyst,  # Reusing market analyst for this task
-    context=[research_task, product_analysis_task, qa_task]
-)
+        To get market trends data, use the 'Fetch Market Trends' tool with 'iPhone' as the product.
+        IMPORTANT: When using the tool, simply pass the string "iPhone" directly.
+        """,
+        expected_output="""A comprehensive market trend analysis for iPhone including trend status, 
+        popularity score interpretation, and monthly search volume significance compared with industry averages.""",
+        agent=market_analyst
+    )
 
-# Create crew with all agents and tasks
-crew_with_qa = Crew(
-    agents=[market_analyst, product_specialist, qa_specialist],
-    tasks=[research_task, product_analysis_task, qa_task, summary_task],
-    verbose=True,
-    process=Process.sequential
-)
+    product_analysis_task = ManagedTask(
+        description="""Analyze the iPhone product details and provide a comprehensive report.
+        Focus on:
+        1. Price point analysis
+        2. Availability status
+        3. Customer rating significance
+        Compare with industry standards and provide recommendations.
 
-# Processing function to normalize availability strings
-def normalize_availability_status(status):
-    """Normalize availability status strings to match regardless of exact wording."""
-    if not status:
-        return ""
-    status = status.lower().strip()
-    if "stock" in status or "available" in status:
-        return "In Stock"
-    return status
-
-# Processing function to compare values with normalization
-def compare_values(a, b):
-    """Compare two values with normalization for certain data types."""
-    # Convert both to strings
-    str_a = str(a).strip()
-    str_b = str(b).strip()
-    
-    # Check if they're already equal
-    if str_a == str_b:
-        return True
-    
-    # Normalize ratings
-    if "/" in str_a:
-        str_a = str_a.split("/")[0]
-    if "/" in str_b:
-        str_b = str_b.split("/")[0]
-    
-    # Normalize numbers (remove commas)
-    str_a = str_a.replace(",", "")
-    str_b = str_b.replace(",", "")
-    
-    # Normalize availability
-    if any(keyword in str_a.lower() for keyword in ["available", "in stock", "stock"]):
-        str_a = "In Stock"
-    if any(keyword in str_b.lower() for keyword in ["available", "in stock", "stock"]):
-        str_b = "In Stock"
-    
-    return str_a == str_b
+        To get product data, use the 'Fetch Product Data' tool with 'iPhone' as the product.
+        IMPORTANT: When using the tool, simply pass the string "iPhone" directly.
+        Be sure to use the exact availability description from the data ("In Stock" or "Out of Stock").
+        """,
+        expected_output="""A detailed product analysis for iPhone covering price point analysis, 
+        availability status, and customer rating significance, with comparisons to industry standards 
+        and actionable recommendations.""",
+        agent=product_specialist
+    )
+
+    # QA is verified in Python against the source tools; the QA agent only runs when extraction is unsure
+    qa_task = DeterministicQATask(
+        description="""Your job is to verify data accuracy by comparing the data points in the analyses with the source data.
+
+        1. First, you need to extract the key data points from both analyses:
+           - From market analysis: trend status, popularity score, monthly searches
+           - From product analysis: price, availability, rating
+
+        2. Then, use your tools to independently fetch the same data for iPhone:
+           - First, use 'Fetch Market Trends' tool with "iPhone" as input
+           - Then, use 'Fetch Product Data' tool with "iPhone" as input
+
+        3. Create a detailed side-by-side comparison:
+
+           You MUST format your response as follows:
+
+           ## DATA COMPARISON
+
+           ### Market Analysis Data
+           | Data Point | Value in Analysis | Value from Direct Fetch |
+           |------------|-------------------|-------------------------|
+           | Trend Status | (value) | (value) |
+           | Popularity Score | (value) | (value) |
+           | Monthly Searches | (value) | (value) |
+
+           ### Product Analysis Data
+           | Data Point | Value in Analysis | Value from Direct Fetch |
+           |------------|-------------------|-------------------------|
+           | Price | (value) | (value) |
+           | Availability | (value) | (value) |
+           | Rating | (value) | (value) |
+
+           ## VERIFICATION RESULT
+
+           (Write "QA PASSED" or "QA FAILED" here, followed by any discrepancies you found)
+
+        4. IMPORTANT: When comparing availability status, normalize the values:
+           - "Available", "In Stock", "Available now", etc. are all considered equivalent
+           - Similarly, normalize rating formats (e.g., "4.8/5" and "4.8" are equivalent)
+           - For monthly searches, "45,000" and "45000" are equivalent
+
+        5. Only report QA FAILED if there's a genuine data discrepancy, not just format differences.
+
+        This exact format is required for the data tracking system - do not deviate from it.
+        """,
+        expected_output="""A detailed data comparison in table format followed by a verification result (PASS/FAIL).""",
+        agent=qa_specialist,
+        context=[research_task, product_analysis_task],
+        qa_product="iPhone",
+        qa_sources={
+            "Market Analysis Data": (_get_market_trends, MARKET_FIELDS),
+            "Product Analysis Data": (_get_product_data, PRODUCT_FIELDS)
+        }
+    )
+
+    # Task to produce final summary if QA passes
+    summary_task = ManagedTask(
+        description="""Create a final summary of the iPhone market and product analysis ONLY IF
+        the QA verification has passed.
+
+        If QA has passed, synthesize the key points from both the market and product analyses into
+        a concise executive summary highlighting the most important findings and recommendations.
+
+        If QA has failed, simply state that the summary cannot be provided until data issues are resolved.
+        """,
+        expected_output="""Either a concise executive summary of market and product analyses, 
+        or a statement that the summary is pending due to data verification issues.""",
+        agent=market_analyst,  # Reusing market analyst for this task
+        context=[research_task, product_analysis_task, qa_task],
+        # Keep the summary prompt bounded however verbose the upstream answers are
+        context_token_budget=1000,
+        guards=[qa_failed_guard]
+    )
+
+    # Create crew with all agents and tasks
+    return Crew(
+        agents=[market_analyst, product_specialist, qa_specialist],
+        tasks=[research_task, product_analysis_task, qa_task, summary_task],
+        verbose=verbose,
+        process=Process.sequential
+    )
+
+
+crew_with_qa = create_qa_crew()
+market_analyst, product_specialist, qa_specialist = crew_with_qa.agents
+research_task, product_analysis_task, qa_task, summary_task = crew_with_qa.tasks
 
 # Execute crew
 if __name__ == "__main__":
@@ -313,65 +291,54 @@ if __name__ == "__main__":
     verify_iphone_data()
     
     try:
-        result = crew_with_qa.kickoff()
+        # Unchanged stages are served from the task store, so a failed run only repeats what is left
+        result, checkpoint_report = run_with_checkpoints(crew_with_qa)
         
         print("\n==== CrewAI POC Results ====\n")
         print(result)
         
+        print("\n==== Task Checkpoints ====\n")
+        print(format_checkpoint_report(checkpoint_report))
+        
+        print("\n==== Context Prompt Tokens ====\n")
+        print(format_context_report())
+        
+        print("\n==== QA Stage ====\n")
+        print(json.dumps(qa_stage_stats.snapshot(), indent=2))
+        
+        print("\n==== Run Metadata ====\n")
+        print(json.dumps(run_metadata.snapshot(), indent=2))
+        
+        if iteration_budgets:
+            print("\n==== Iteration Budgets ====\n")
+            print(json.dumps(iteration_budgets.snapshot(), indent=2))
+        
         # Print QA result separately to highlight the verification
         print("\n==== DATA VERIFICATION RESULT ====\n")
-        qa_result = qa_task.output
+        qa_text = qa_task.output.raw_output if qa_task.output else ""
+        qa_report = parse_qa_report(qa_text)
         
-        # Check if QA passed and display appropriate output
-        if qa_result and "QA PASSED" in qa_result:
+        # The verdict is recomputed from the comparison tables with normalized values
+        if qa_report.passed:
             print("✅ QA PASSED: Data verification successful")
             print("-" * 50)
-            
-            # If there's a data comparison section, emphasize it
-            if "## DATA COMPARISON" in qa_result:
-                # Split by markdown sections and print with formatting
-                sections = qa_result.split("##")
-                for section in sections:
-                    if section.strip():
-                        print(f"## {section}")
-            else:
-                print(qa_result)
+            if qa_report.stated_verdict == "FAILED":
+                print("The QA agent reported a failure, but every value matches after normalization,")
+                print("so we're treating this as a PASS.\n")
+            print(format_qa_report(qa_report) if qa_report.rows else qa_text)
             
             print("\n==== FINAL SUMMARY ====\n")
-            summary_result = summary_task.output
+            summary_result = summary_task.output.raw_output if summary_task.output else None
             print(summary_result if summary_result else "No summary generated")
         else:
-            # Check for different availability statuses that mean the same thing
-            if "QA FAILED" in qa_result and ("Availability" in qa_result or "availability" in qa_result):
-                # If it's just a format difference, print a modified QA message
-                if "Available" in qa_result and "In Stock" in qa_result:
-                    print("✅ QA PASSED: Data verified with format normalization")
-                    print("-" * 50)
-                    print("The QA agent flagged an availability format difference, but 'Available' and 'In Stock'")
-                    print("mean the same thing, so we're treating this as a PASS.")
-                    print("\nHere's the original comparison:")
-                    
-                    # Print the comparison tables
-                    if "## DATA COMPARISON" in qa_result:
-                        # Split by markdown sections and print with formatting
-                        sections = qa_result.split("##")
-                        for section in sections:
-                            if section.strip():
-                                print(f"## {section}")
-                    else:
-                        print(qa_result)
-                    
-                    print("\n==== FINAL SUMMARY ====\n")
-                    summary_result = summary_task.output
-                    print(summary_result if summary_result else "No summary generated")
-                else:
-                    print("❌ QA FAILED: Data verification found issues")
-                    print("-" * 50)
-                    print(qa_result if qa_result else "No QA result available")
+            print("❌ QA FAILED: Data verification found issues")
+            print("-" * 50)
+            if qa_report.rows:
+                print(format_qa_report(qa_report))
+                for row in qa_report.discrepancies:
+                    print(f"- {row.data_point}: analysis has {row.analysis_value}, source has {row.fetched_value}")
             else:
-                print("❌ QA FAILED: Data verification found issues")
-                print("-" * 50)
-                print(qa_result if qa_result else "No QA result available")
+                print(qa_text if qa_text else "No QA result available")
     except KeyboardInterrupt:
         print("\n\nProcess interrupted by user. Exiting...")
     except Exception as e:
@@ -0,0 +1,129 @@
+from typing import Any, Dict, List, NamedTuple, Optional
+from collections import deque
+import json
+import os
+import threading
+import time
+
+from response_models import ThinkingStep
+
+# Tool name crewai gives the parsing errors and forced answers it feeds back to the agent
+_ERROR_TOOL = "_Exception"
+
+
+class StepEvent(NamedTuple):
+    kind: str               # "tool", "error", "finish" or "task"
+    agent: str              # exact role of the agent the event came from
+    tool: Optional[str]
+    tool_input: Any         # the arguments as the agent passed them (parsed JSON when possible)
+    result: str             # tool observation, final answer or task output, truncated to max_chars
+    started: float          # seconds from the start of the request
+    seconds: float          # time since the agent's previous event (its LLM call plus any tool run)
+
+
+def _arguments(tool_input: Any) -> Any:
+    if isinstance(tool_input, str):
+        try:
+            return json.loads(tool_input)
+        except ValueError:
+            return tool_input
+    return tool_input
+
+
+class StepRecorder:
+    """Bounded buffer of one request's agent steps, filled by step and task callbacks while the crew runs.
+
+    ``attach`` gives every task's agent a step callback and every task a completion callback
+    that know the exact agent role. Events past ``max_events`` are dropped and counted, and
+    results are cut to ``max_chars``, so one runaway agent cannot grow the buffer without bound.
+    """
+
+    def __init__(self, max_events: int = 200, max_chars: int = 2000):
+        self.max_chars = max_chars
+        self.events: deque = deque(maxlen=max_events)
+        self.dropped = 0
+        self._start = time.perf_counter()
+        self._last: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "StepRecorder":
+        """Recorder bounded by ``STEP_EVENTS_MAX`` events of ``STEP_EVENTS_MAX_CHARS`` characters."""
+        return cls(
+            max_events=int(os.getenv("STEP_EVENTS_MAX", "200")),
+            max_chars=int(os.getenv("STEP_EVENTS_MAX_CHARS", "2000"))
+        )
+
+    def _record(self, kind: str, agent: str, tool: Optional[str], tool_input: Any, result: Any):
+        now = time.perf_counter()
+        with self._lock:
+            previous = self._last.get(agent, self._start)
+            self._last[agent] = now
+            if len(self.events) == self.events.maxlen:
+                self.dropped += 1
+            text = str(result or "")
+            self.events.append(StepEvent(kind, agent, tool, tool_input,
+                                         text if len(text) <= self.max_chars else text[:self.max_chars] + "...",
+                                         round(previous - self._start, 3), round(now - previous, 3)))
+
+    def step_callback(self, role: str):
+        """Agent step callback: records tool calls, rejected outputs and the final answer."""
+        def on_step(step_output: Any):
+            # AgentFinish ends the loop; anything else is the executor's list of (AgentAction, observation) tuples
+            if not isinstance(step_output, list):
+                self._record("finish", role, None, None, getattr(step_output, "return_values", {}).get("output"))
+                return
+            for action, observation in step_output:
+                tool = getattr(action, "tool", _ERROR_TOOL)
+                if tool == _ERROR_TOOL:
+                    self._record("error", role, None, None, observation)
+                else:
+                    self._record("tool", role, tool, _arguments(getattr(action, "tool_input", None)), observation)
+        return on_step
+
+    def task_callback(self, role: str):
+        """Task callback: records the output a task finished with, including tasks completed in Python."""
+        def on_task(output: Any):
+            self._record("task", role, None, None, getattr(output, "raw_output", output))
+            # The next task's first step is timed from here, not from this agent's last step
+            with self._lock:
+                self._last = {agent: time.perf_counter() for agent in self._last}
+        return on_task
+
+    def attach(self, tasks: List[Any]):
+        """Hook the recorder into the tasks and their agents before the crew is kicked off."""
+        for task in tasks:
+            role = task.agent.role if task.agent is not None else "Agent"
+            # Tasks without an agent (completed in Python) only report their output
+            if task.agent is not None:
+                task.agent.step_callback = self.step_callback(role)
+            task.callback = self.task_callback(role)
+
+    def thinking_steps(self) -> List[ThinkingStep]:
+        """The recorded events as the chatbot's thinking steps, in the order they happened."""
+        with self._lock:
+            events = list(self.events)
+            dropped = self.dropped
+        steps = []
+        for event in events:
+            if event.kind == "tool":
+                steps.append(ThinkingStep(
+                    f"{event.agent} - Tool Execution",
+                    f"Used '{event.tool}' with {json.dumps(event.tool_input)} ({event.seconds:.2f}s):\n{event.result}"
+                ))
+            elif event.kind == "error":
+                steps.append(ThinkingStep(f"{event.agent} - Retry", f"Output could not be used: {event.result}"))
+            elif event.kind == "task":
+                steps.append(ThinkingStep(f"{event.agent} - Conclusion", event.result))
+        if dropped:
+            steps.append(ThinkingStep("Agent Processing", f"{dropped} earlier steps were dropped from the buffer."))
+        if not steps:
+            steps.append(ThinkingStep(
+                "Agent Processing",
+                "The agents processed your request, but detailed thinking steps were not available."
+            ))
+        return steps
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {"events": [event._asdict() for event in self.events], "dropped": self.dropped}
@@ -0,0 +1,268 @@
+from typing import Any, Dict, List, Optional, Tuple
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+import random
+import re
+import threading
+import time
+
+from context_assembler import count_tokens
+from product_catalog import find_products_in_text
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+_TOOL_NAMES = re.compile(r"only one name of \[(.*?)\]")
+_PRODUCT_ARGUMENT = re.compile(r"with '([^']+)' as the product")
+# Observations in the scratchpad (crewai's format instructions also show an example one)
+_OBSERVATION = re.compile(r"^Observation: (?!the result of the action$)", re.MULTILINE)
+# Where an observation ends: the next step, or the format reminder crewai appends every few tool uses
+_OBSERVATION_END = re.compile(r"\n(?:Thought:|Action:|Observation: )|\n\nYou ONLY have access")
+_CURRENT_TASK = re.compile(r"Current Task: (.*?)\n\nBegin!", re.DOTALL)
+_COWORKERS = re.compile(r"following co-workers: \[(.*?)\]")
+# Tool descriptions that advertise batch lookups
+_BATCH_HINT = "list of product names"
+# crewai's hierarchical manager, and the delegation tools every agent with allow_delegation gets
+_MANAGER = "You are Crew Manager."
+_DELEGATE = "Delegate work to co-worker"
+_DELEGATION_TOOLS = (_DELEGATE, "Ask question to co-worker")
+
+
+def _describe(data: Dict) -> str:
+    """Render tool data as analyst prose that mentions every data point once."""
+    lines = []
+    for field, value in data.items():
+        if field == "product":
+            continue
+        if field == "rating":
+            value = f"{value} out of 5"
+        lines.append(f"- {field.replace('_', ' ').title()}: {value}")
+    return "\n".join(lines)
+
+
+def _describe_observation(data: Dict) -> str:
+    """Describe one record, or each record of a batch result keyed by product name."""
+    if "product" in data or not all(isinstance(value, dict) for value in data.values()):
+        return _describe(data)
+    return "\n\n".join(f"{product}:\n{_describe(record)}" for product, record in data.items())
+
+
+def _argument_name(prompt: str, tool: str) -> str:
+    """The tool's parameter name from its rendered signature, ``product`` when it is not shown."""
+    match = re.search(re.escape(tool) + r"\((\w+)\s*:", prompt)
+    return match.group(1) if match else "product"
+
+
+def _accepts_lists(prompt: str, tool: str, tools: List[str]) -> bool:
+    """Whether the tool's description (up to the next tool's name) advertises batch lookups."""
+    start = prompt.find(tool)
+    if start < 0:
+        return False
+    end = min([position for other in tools if other != tool
+               for position in [prompt.find(other, start + len(tool))] if position > start] + [start + 600])
+    return _BATCH_HINT in prompt[start:end]
+
+
+def _observations(prompt: str) -> Tuple[List[str], int]:
+    """The observation texts in the scratchpad and where the first one starts."""
+    texts = []
+    matches = list(_OBSERVATION.finditer(prompt))
+    for match in matches:
+        end = _OBSERVATION_END.search(prompt, match.end())
+        texts.append(prompt[match.end():end.start() if end else len(prompt)].strip())
+    return texts, matches[0].start() if matches else len(prompt)
+
+
+def _delegation(prompt: str) -> Dict[str, str]:
+    """Delegate the manager's current task to the co-worker whose role shares the most words with it."""
+    current = _CURRENT_TASK.search(prompt)
+    task = current.group(1) if current else ""
+    description, _, context = task.partition("\n\nThis is the context you're working with:\n")
+    description = description.split("\nThis is the expect criteria")[0].strip()
+    coworkers = _COWORKERS.search(prompt)
+    roles = [role.strip() for role in coworkers.group(1).split(",")] if coworkers else []
+    words = set(re.findall(r"[a-z]+", description.lower()))
+    coworker = max(roles, key=lambda role: len(words & set(role.lower().split())), default="")
+    return {"coworker": coworker, "task": description, "context": context.strip()}
+
+
+def _plan(prompt: str, tools: List[str], task_text: str) -> Tuple[List[Tuple[str, Dict]], List[str]]:
+    """The (tool, input) calls a diligent agent makes before answering, and the products they cover.
+
+    A hierarchical manager delegates its task once. A task naming its product calls the first
+    tool once for it. Otherwise every tool is called for every product the task mentions: once
+    with the whole list when the tool takes lists, once per product when it does not. Agents
+    other than the manager do their own work rather than delegate.
+    """
+    if _MANAGER in prompt:
+        return ([(_DELEGATE, _delegation(prompt))] if _DELEGATE in tools else []), []
+    tools = [tool for tool in tools if tool not in _DELEGATION_TOOLS]
+    if not tools:
+        return [], []
+    product = _PRODUCT_ARGUMENT.search(prompt)
+    if product:
+        return [(tools[0], {_argument_name(prompt, tools[0]): product.group(1)})], [product.group(1)]
+    products = find_products_in_text(task_text) or ["iPhone"]
+    calls = []
+    for tool in tools:
+        argument = _argument_name(prompt, tool)
+        if _accepts_lists(prompt, tool, tools):
+            calls.append((tool, {argument: products if len(products) > 1 else products[0]}))
+        else:
+            calls += [(tool, {argument: name}) for name in products]
+    return calls, products
+
+
+def _describe_text(observation: str) -> str:
+    try:
+        data = json.loads(observation)
+    except ValueError:
+        return observation
+    return _describe_observation(data) if isinstance(data, dict) else observation
+
+
+class StubChatModel(BaseChatModel):
+    """Offline chat model that plays a ReAct agent: it makes the tool calls ``_plan`` lists, then answers.
+
+    The answer restates the tool's data, so downstream QA passes. Every call sleeps
+    ``latency_ms`` (plus up to ``jitter_ms``) plus a per-token cost for the prompt and the reply,
+    to stand in for the real model's latency.
+    """
+
+    latency_ms: float = 200.0
+    jitter_ms: float = 0.0
+    ms_per_prompt_token: float = 0.0
+    ms_per_output_token: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"latency_ms": self.latency_ms, "jitter_ms": self.jitter_ms,
+                "ms_per_prompt_token": self.ms_per_prompt_token, "ms_per_output_token": self.ms_per_output_token}
+
+    def _reply(self, prompt: str) -> str:
+        observations, first = _observations(prompt)
+        names = _TOOL_NAMES.search(prompt)
+        tools = [name.strip() for name in names.group(1).split(",") if name.strip()] if names else []
+        calls, products = _plan(prompt, tools, prompt[:first])
+        if len(observations) < len(calls):
+            tool, tool_input = calls[len(observations)]
+            return (f"Thought: Do I need to use a tool? Yes\n"
+                    f"Action: {tool}\n"
+                    f"Action Input: {json.dumps(tool_input)}")
+        if observations:
+            subject = f"Analysis of {', '.join(products)}:\n" if products else ""
+            return (f"Thought: Do I need to use a tool? No\n"
+                    f"Final Answer: {subject}" + "\n\n".join(_describe_text(o) for o in observations))
+        return "Thought: Do I need to use a tool? No\nFinal Answer: No data was available for this task."
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        reply = self._reply(prompt)
+        latency = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if self.ms_per_prompt_token or self.ms_per_output_token:
+            latency += self.ms_per_prompt_token * count_tokens(prompt) + self.ms_per_output_token * count_tokens(reply)
+        time.sleep(latency / 1000.0)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=reply))])
+
+
+class _StubLLMHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible ``/v1/chat/completions`` that answers like StubChatModel and enforces rate limits."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, {"error": {"message": f"unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+        prompt_tokens = count_tokens(prompt)
+        retry_after = server.admit(prompt_tokens)
+        if retry_after is not None:
+            self._send(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                       {"Retry-After": str(math.ceil(retry_after)), "retry-after-ms": str(int(retry_after * 1000))})
+            return
+        reply = server.model._reply(prompt)
+        for stop in body.get("stop") or []:
+            reply = reply.split(stop)[0]
+        time.sleep(server.model.latency_ms / 1000.0)
+        completion_tokens = count_tokens(reply)
+        self._send(200, {
+            "id": f"chatcmpl-stub-{server.served}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens}
+        })
+
+    def _send(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _StubLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, model: StubChatModel, rpm: int, tpm: int, window: float):
+        super().__init__(address, _StubLLMHandler)
+        self.model = model
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget the requests in the current window and the counters."""
+        with self._lock:
+            self._admitted: deque = deque()
+            self.served = 0
+            self.rejected = 0
+
+    def admit(self, tokens: int) -> Optional[float]:
+        """Admit a request within the sliding-window limits, or return seconds until it would fit."""
+        with self._lock:
+            now = time.monotonic()
+            while self._admitted and self._admitted[0][0] <= now - self.window:
+                self._admitted.popleft()
+            over_requests = self.rpm and len(self._admitted) >= self.rpm
+            over_tokens = self.tpm and sum(used for _, used in self._admitted) + tokens > self.tpm
+            if over_requests or over_tokens:
+                self.rejected += 1
+                return max(0.001, self._admitted[0][0] + self.window - now) if self._admitted else self.window
+            self._admitted.append((now, tokens))
+            self.served += 1
+            return None
+
+
+def start_stub_llm_server(host: str = "127.0.0.1", port: int = 0, latency_ms: float = 50.0, rpm: int = 0,
+                          tpm: int = 0, window: float = 60.0) -> _StubLLMServer:
+    """Start a local OpenAI-compatible stub LLM in a daemon thread.
+
+    It admits ``rpm`` requests and ``tpm`` prompt tokens per sliding ``window`` seconds (0: no
+    limit) and answers the rest with 429 and a Retry-After hint, as the real provider does.
+    """
+    server = _StubLLMServer((host, port), StubChatModel(latency_ms=latency_ms), rpm, tpm, window)
+    threading.Thread(target=server.serve_forever, daemon=True, name="stub-llm-server").start()
+    return server
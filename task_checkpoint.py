@@ -0,0 +1,146 @@
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from crewai import Crew, Process, Task
+from crewai.tasks.task_output import TaskOutput
+
+# Where task outputs are kept between runs; delete the directory to force a full re-run
+DEFAULT_STORE_DIR = os.getenv("TASK_STORE_DIR", ".task_store")
+
+
+class TaskOutputStore:
+    """Content-addressed store of raw task outputs, one JSON file per key."""
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the stored raw output for a key, or None."""
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)["raw_output"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key: str, raw_output: str, metadata: Optional[Dict] = None):
+        """Store a raw output atomically so a crash never leaves a torn entry."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"raw_output": raw_output, "metadata": metadata or {}, "stored_at": time.time()}, f)
+        os.replace(tmp_path, path)
+
+
+def _llm_fingerprint(llm: Any) -> Dict:
+    """Describe the model settings that change what an agent would answer."""
+    if llm is None:
+        return {}
+    return {
+        "class": type(llm).__name__,
+        "model": getattr(llm, "model_name", None) or getattr(llm, "model", None),
+        "temperature": getattr(llm, "temperature", None)
+    }
+
+
+def agent_fingerprint(agent) -> Dict:
+    """Collect the agent configuration that goes into a task key."""
+    return {
+        "role": agent.role,
+        "goal": agent.goal,
+        "backstory": agent.backstory,
+        "allow_delegation": getattr(agent, "allow_delegation", None),
+        "tools": sorted(f"{tool.name}: {tool.description}" for tool in (agent.tools or [])),
+        "llm": _llm_fingerprint(getattr(agent, "llm", None))
+    }
+
+
+def task_key(task: Task, inputs: Dict, upstream_outputs: List[str]) -> str:
+    """Hash the task description, agent configuration, inputs and upstream outputs."""
+    payload = {
+        "description": task.description,
+        "expected_output": task.expected_output,
+        "agent": agent_fingerprint(task.agent) if task.agent else None,
+        "inputs": inputs,
+        "upstream": [hashlib.sha256(output.encode("utf-8")).hexdigest() for output in upstream_outputs]
+    }
+    canonical = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def restore_output(task: Task, raw_output: str):
+    """Attach a stored output to a task as if it had just run."""
+    task.output = TaskOutput(description=task.description, exported_output=raw_output, raw_output=raw_output)
+
+
+def run_with_checkpoints(crew: Crew, store: Optional[TaskOutputStore] = None,
+                         inputs: Optional[Dict] = None) -> Tuple[str, List[Dict]]:
+    """Run a sequential crew task by task, reusing stored outputs for unchanged stages.
+
+    Returns the final output and a per-stage report of which stages were reused or executed.
+    """
+    if crew.process != Process.sequential:
+        raise ValueError("Task checkpointing only supports sequential crews")
+    store = store or TaskOutputStore()
+    inputs = inputs or {}
+    report = []
+    previous = None
+    final_output = ""
+
+    for index, task in enumerate(crew.tasks):
+        # Sequential crews feed the previous output to tasks that declare no context
+        upstream = list(task.context) if task.context else ([previous] if previous else [])
+        key = task_key(task, inputs, [upstream_task.output.raw_output for upstream_task in upstream])
+        role = task.agent.role if task.agent else "None"
+        start = time.perf_counter()
+
+        stored = store.get(key)
+        if stored is not None:
+            restore_output(task, stored)
+            status = "reused"
+        else:
+            original_context = task.context
+            if not task.context and previous is not None:
+                task.context = [previous]
+            try:
+                Crew(
+                    agents=[task.agent],
+                    tasks=[task],
+                    verbose=crew.verbose,
+                    process=Process.sequential,
+                    step_callback=crew.step_callback
+                ).kickoff(inputs=inputs)
+            finally:
+                task.context = original_context
+            store.put(key, task.output.raw_output, {"agent": role, "stage": index})
+            status = "executed"
+
+        report.append({
+            "stage": index,
+            "agent": role,
+            "status": status,
+            "key": key[:16],
+            "seconds": round(time.perf_counter() - start, 3)
+        })
+        final_output = task.output.raw_output
+        if not task.async_execution:
+            previous = task
+
+    return final_output, report
+
+
+def format_checkpoint_report(report: List[Dict]) -> str:
+    """Render the stage report as a small text table."""
+    lines = [f"{'Stage':<6}{'Agent':<30}{'Status':<10}{'Seconds':>8}  Key"]
+    for entry in report:
+        lines.append(f"{entry['stage']:<6}{entry['agent']:<30}{entry['status']:<10}{entry['seconds']:>8}  {entry['key']}")
+    reused = sum(1 for entry in report if entry["status"] == "reused")
+    lines.append(f"{reused}/{len(report)} stages reused from the task store")
+    return "\n".join(lines)
@@ -0,0 +1,22 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("crewai")
+pytest.importorskip("flask")
+
+os.environ.setdefault("LLM_PROVIDER", "stub")
+os.environ.setdefault("LLM_CACHE", "off")
+
+import chatbot_app  # noqa: E402
+
+
+def test_tool_run_parses_a_plain_product_string():
+    # crewai's ToolUsage calls tool._run(**arguments), bypassing the tool's argument schema
+    record = json.loads(chatbot_app.fetch_product_data._run(product="iPhone"))
+    assert record["product"] == "iPhone"
+    assert record["price"] == "$999"
+
+    records = json.loads(chatbot_app.fetch_market_trends._run(product="iPhone, Google Pixel"))
+    assert set(records) == {"iPhone", "Google Pixel"}
@@ -0,0 +1,34 @@
+import pytest
+
+agents = pytest.importorskip("langchain_core.agents")
+
+from step_events import StepRecorder  # noqa: E402
+
+
+def test_step_callback_records_executor_steps():
+    recorder = StepRecorder()
+    on_step = recorder.step_callback("Product Specialist")
+    # What AgentExecutor._consume_next_step hands the step callback: (AgentAction, observation) tuples
+    on_step([(agents.AgentAction("Fetch Product Data", '{"product": "iPhone"}', "log"), '{"price": "$999"}')])
+    on_step([(agents.AgentAction("_Exception", "", "log"), "Invalid Format")])
+    on_step(agents.AgentFinish({"output": "The iPhone costs $999."}, "log"))
+
+    tool, error, finish = recorder.events
+    assert (tool.kind, tool.tool, tool.tool_input, tool.result) == (
+        "tool", "Fetch Product Data", {"product": "iPhone"}, '{"price": "$999"}')
+    assert (error.kind, error.result) == ("error", "Invalid Format")
+    assert (finish.kind, finish.result) == ("finish", "The iPhone costs $999.")
+    assert recorder.thinking_steps()[0].step == "Product Specialist - Tool Execution"
+
+
+def test_attach_skips_step_callback_for_tasks_without_agent():
+    from types import SimpleNamespace
+
+    recorder = StepRecorder()
+    agent = SimpleNamespace(role="Product Specialist", step_callback=None)
+    tasks = [SimpleNamespace(agent=agent, callback=None), SimpleNamespace(agent=None, callback=None)]
+    recorder.attach(tasks)
+
+    assert agent.step_callback is not None
+    tasks[1].callback("QA report")
+    assert (recorder.events[-1].kind, recorder.events[-1].agent) == ("task", "Agent")
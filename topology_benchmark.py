@@ -0,0 +1,198 @@
+from typing import Any, Callable, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import contextvars
+import json
+import os
+import threading
+import time
+
+# Benchmark the crews against the offline stub, never a paid model
+os.environ.setdefault("LLM_PROVIDER", "stub")
+
+from crewai import Crew, Process
+from langchain_core.callbacks import BaseCallbackHandler
+
+from context_assembler import count_tokens
+from stub_llm import StubChatModel
+
+TOPOLOGIES = ("sequential", "hierarchical", "parallel")
+DEFAULT_PRODUCTS = ["iPhone", "Samsung Galaxy", "Google Pixel"]
+
+# Deterministic stub latency (no jitter): a fixed cost per call plus per-token costs, in ms
+BASE_LATENCY_MS = 250.0
+MS_PER_PROMPT_TOKEN = 0.05
+MS_PER_OUTPUT_TOKEN = 4.0
+
+
+class PromptCounter(BaseCallbackHandler):
+    """Counts chat model calls and their prompt tokens across threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        tokens = sum(count_tokens("\n".join(str(message.content) for message in batch)) for batch in messages)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += tokens
+
+
+def _advanced_market(llm) -> Crew:
+    from advanced_crew_poc import create_market_crew
+    return create_market_crew(DEFAULT_PRODUCTS, verbose=False, llm=llm)
+
+
+def _custom_tools(llm) -> Crew:
+    from custom_tools_poc import create_analysis_crew
+    return create_analysis_crew(llm=llm, verbose=False)
+
+
+def _simple_qa(llm) -> Crew:
+    from simple_agents_poc import create_qa_crew
+    return create_qa_crew(llm=llm, verbose=False)
+
+
+def _chatbot(llm) -> Crew:
+    from chatbot_app import create_agents_and_tasks
+    tasks = create_agents_and_tasks("iPhone", "comprehensive", llm=llm)
+    agents = list(dict.fromkeys(task.agent for task in tasks))
+    return Crew(agents=agents, tasks=tasks, verbose=False, process=Process.sequential)
+
+
+# Crew factories by name; each call builds fresh agents and tasks on the given model
+CREWS: Dict[str, Callable[[Any], Crew]] = {
+    "advanced_market": _advanced_market,
+    "custom_tools": _custom_tools,
+    "simple_qa": _simple_qa,
+    "chatbot_comprehensive": _chatbot
+}
+
+
+def _dependencies(tasks: List[Any]) -> Dict[int, List[int]]:
+    """Upstream task indexes of each task: its explicit ``context``; tasks without one are independent."""
+    position = {id(task): index for index, task in enumerate(tasks)}
+    return {index: [position[id(upstream)] for upstream in task.context or [] if id(upstream) in position]
+            for index, task in enumerate(tasks)}
+
+
+def _levels(dependencies: Dict[int, List[int]]) -> List[List[int]]:
+    """Group tasks into waves; every task runs one wave after its latest upstream task."""
+    level: Dict[int, int] = {}
+    for index in sorted(dependencies):
+        level[index] = 1 + max((level[upstream] for upstream in dependencies[index]), default=-1)
+    waves: List[List[int]] = [[] for _ in range(max(level.values(), default=-1) + 1)]
+    for index, wave in level.items():
+        waves[wave].append(index)
+    return waves
+
+
+def run_parallel(crew: Crew) -> Dict[int, float]:
+    """Run the crew's tasks as a dependency graph and return each task's seconds.
+
+    Each wave runs concurrently, one worker per agent: an agent's executor is rebuilt for every
+    task it runs, so two tasks of the same agent in one wave run back to back on its worker.
+    """
+    tasks = crew.tasks
+    for agent in crew.agents:
+        agent.crew = crew
+    seconds: Dict[int, float] = {}
+
+    def run_agent_tasks(indexes: List[int]):
+        for index in indexes:
+            start = time.perf_counter()
+            tasks[index].execute()
+            seconds[index] = time.perf_counter() - start
+
+    for wave in _levels(_dependencies(tasks)):
+        by_agent: Dict[int, List[int]] = {}
+        for index in wave:
+            by_agent.setdefault(id(tasks[index].agent), []).append(index)
+        with ThreadPoolExecutor(max_workers=len(by_agent), thread_name_prefix="topology") as pool:
+            # Copy the caller's context so per-task scopes (similarity cache, lookup tallies) carry over
+            futures = [pool.submit(contextvars.copy_context().run, run_agent_tasks, indexes)
+                       for indexes in by_agent.values()]
+            for future in futures:
+                future.result()
+    return seconds
+
+
+def run_kickoff(crew: Crew) -> Dict[int, float]:
+    """Kick the crew off and return each task's seconds, measured between task completions."""
+    finished: List[float] = []
+    # kickoff() hands the crew's task_callback to every task, which calls it once done
+    crew.task_callback = lambda output: finished.append(time.perf_counter())
+    start = time.perf_counter()
+    crew.kickoff()
+    marks = [start] + finished
+    return {index: marks[index + 1] - marks[index] for index in range(len(finished))}
+
+
+def _critical_path(dependencies: Dict[int, List[int]], seconds: Dict[int, float]) -> Dict:
+    """Longest chain of dependent tasks by their measured seconds."""
+    finish: Dict[int, float] = {}
+    length: Dict[int, int] = {}
+    for index in sorted(dependencies):
+        upstream = max(dependencies[index], key=lambda other: finish[other], default=None)
+        finish[index] = seconds.get(index, 0.0) + (finish[upstream] if upstream is not None else 0.0)
+        length[index] = 1 + (length[upstream] if upstream is not None else 0)
+    last = max(finish, key=finish.get, default=None)
+    return {"tasks": length.get(last, 0), "seconds": round(finish.get(last, 0.0), 2)}
+
+
+def run_topology(crew_name: str, topology: str, time_scale: float = 1.0) -> Dict:
+    """Build a fresh crew on a counting stub and run it under one topology."""
+    counter = PromptCounter()
+    llm = StubChatModel(latency_ms=BASE_LATENCY_MS * time_scale,
+                        ms_per_prompt_token=MS_PER_PROMPT_TOKEN * time_scale,
+                        ms_per_output_token=MS_PER_OUTPUT_TOKEN * time_scale,
+                        callbacks=[counter])
+    crew = CREWS[crew_name](llm)
+    start = time.perf_counter()
+    if topology == "parallel":
+        critical_path = _critical_path(_dependencies(crew.tasks), run_parallel(crew))
+    else:
+        if topology == "hierarchical":
+            crew = Crew(agents=crew.agents, tasks=crew.tasks, verbose=False,
+                        process=Process.hierarchical, manager_llm=llm)
+        # Every task waits for the one before it
+        chain = {index: [index - 1] if index else [] for index in range(len(crew.tasks))}
+        critical_path = _critical_path(chain, run_kickoff(crew))
+    wall = time.perf_counter() - start
+    return {
+        "llm_calls": counter.calls,
+        "prompt_tokens": counter.prompt_tokens,
+        "wall_seconds": round(wall, 2),
+        "critical_path_tasks": critical_path["tasks"],
+        "critical_path_seconds": critical_path["seconds"]
+    }
+
+
+def benchmark(crews: Optional[List[str]] = None, topologies: Optional[List[str]] = None,
+              time_scale: float = 1.0) -> Dict:
+    """Run every crew under every topology and report calls, prompt tokens, wall time and critical path."""
+    # Measure the crews, not completions replayed from the cache
+    from langchain.globals import set_llm_cache
+    set_llm_cache(None)
+    return {crew_name: {topology: run_topology(crew_name, topology, time_scale)
+                        for topology in topologies or TOPOLOGIES}
+            for crew_name in crews or CREWS}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare sequential, hierarchical and parallel crew topologies.")
+    parser.add_argument("--crew", action="append", choices=list(CREWS), help="Crew to run (default: all)")
+    parser.add_argument("--topology", action="append", choices=TOPOLOGIES, help="Topology to run (default: all)")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Multiply the stub's simulated latency (e.g. 0.1 for a quick run)")
+    parser.add_argument("--output", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    report = benchmark(args.crew, args.topology, args.time_scale)
+    print("\n==== Topology Benchmark ====\n")
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,124 @@
+from typing import Dict, Iterator, List, Optional
+import json
+import os
+import queue
+import random
+import threading
+
+DEFAULT_CAPTURE_PATH = os.path.join("traffic", "requests.jsonl")
+
+
+class TrafficRecorder:
+    """Appends sampled chat requests to a size-rotated JSONL file from a background thread.
+
+    Request threads only draw the sampling decision and enqueue a dict; serialization, writes
+    and rotation happen on the writer thread. When the queue is full records are dropped and
+    counted rather than slowing requests down. Rotation follows logging's RotatingFileHandler:
+    ``path`` -> ``path.1`` -> ... -> ``path.<backups>``.
+    """
+
+    def __init__(self, path: str = DEFAULT_CAPTURE_PATH, sample_rate: float = 1.0,
+                 max_bytes: int = 10 * 1024 * 1024, backups: int = 5, queue_size: int = 10000):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.dropped = 0
+        self.written = 0
+        self._queue: "queue.Queue[Optional[Dict]]" = queue.Queue(maxsize=queue_size)
+        self._writer = threading.Thread(target=self._write_loop, name="traffic-capture", daemon=True)
+        self._writer.start()
+
+    @classmethod
+    def from_env(cls) -> Optional["TrafficRecorder"]:
+        """Recorder configured by ``TRAFFIC_CAPTURE_*`` variables, or None unless capture is enabled."""
+        if os.getenv("TRAFFIC_CAPTURE", "off").lower() not in ("1", "on", "true", "yes"):
+            return None
+        return cls(
+            path=os.getenv("TRAFFIC_CAPTURE_PATH", DEFAULT_CAPTURE_PATH),
+            sample_rate=float(os.getenv("TRAFFIC_CAPTURE_SAMPLE_RATE", "1.0")),
+            max_bytes=int(float(os.getenv("TRAFFIC_CAPTURE_MAX_MB", "10")) * 1024 * 1024),
+            backups=int(os.getenv("TRAFFIC_CAPTURE_BACKUPS", "5"))
+        )
+
+    def sampled(self) -> bool:
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def record(self, entry: Dict):
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _rotate(self):
+        if not self.backups:
+            os.remove(self.path)
+            return
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def _write_loop(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        while True:
+            batch = [self._queue.get()]
+            # Drain whatever else is waiting so bursts become one write
+            while len(batch) < 1000:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                batch = batch[:batch.index(None)]
+                stop = True
+            else:
+                stop = False
+            if batch:
+                data = "".join(json.dumps(entry) + "\n" for entry in batch)
+                if os.path.exists(self.path) and os.path.getsize(self.path) + len(data) > self.max_bytes:
+                    self._rotate()
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(data)
+                self.written += len(batch)
+            if stop:
+                return
+
+    def close(self, timeout: float = 5.0):
+        """Flush queued records and stop the writer thread."""
+        self._queue.put(None)
+        self._writer.join(timeout)
+
+    def snapshot(self) -> Dict:
+        return {
+            "path": self.path,
+            "sample_rate": self.sample_rate,
+            "written": self.written,
+            "dropped": self.dropped,
+            "queued": self._queue.qsize()
+        }
+
+
+def captured_files(path: str = DEFAULT_CAPTURE_PATH) -> List[str]:
+    """The capture file and its rotated backups, oldest first."""
+    backups = []
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        backups.append(f"{path}.{index}")
+        index += 1
+    files = list(reversed(backups))
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_captured(path: str = DEFAULT_CAPTURE_PATH) -> Iterator[Dict]:
+    """Yield captured requests from the file and its backups, oldest first, skipping torn lines."""
+    for name in captured_files(path):
+        with open(name, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
@@ -0,0 +1,110 @@
+from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import contextlib
+import json
+import os
+import time
+
+from load_test import ChatClient, Result, latency_summary, local_chatbot, summarize
+from traffic_capture import DEFAULT_CAPTURE_PATH, read_captured
+
+
+def replay(client: ChatClient, records: List[Dict], speed: float = 1.0, max_inflight: int = 256) -> List[Result]:
+    """Re-issue captured requests with their original spacing divided by ``speed``.
+
+    Requests are sent open-loop: each goes out at its scheduled offset whether or not earlier
+    ones have returned, and its latency counts from that offset.
+    """
+    records = sorted(records, key=lambda record: record["timestamp"])
+    futures = []
+    first = records[0]["timestamp"] if records else 0.0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="replay") as pool:
+        for record in records:
+            scheduled = start + (record["timestamp"] - first) / speed
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(client.send, record.get("query_type", "unknown"), record["message"], scheduled))
+    return [future.result() for future in futures]
+
+
+def compare(records: List[Dict], results: List[Result]) -> Dict:
+    """Captured versus replayed latency, fallbacks and QA verdicts, overall and per query type."""
+    records = sorted(records, key=lambda record: record["timestamp"])
+    captured = [Result(r.get("query_type", "unknown"), r["latency_ms"] / 1000.0, 200,
+                       "fallback" if r.get("fallback") else None, r.get("qa_passed")) for r in records]
+
+    def side(subset: List[Result]) -> Dict:
+        return {
+            "requests": len(subset),
+            "errors": sum(1 for result in subset if result.error),
+            "latency_ms": latency_summary(subset)
+        }
+
+    by_type = {}
+    for query_type in sorted({result.query_type for result in captured}):
+        by_type[query_type] = {
+            "captured": side([result for result in captured if result.query_type == query_type]),
+            "replayed": side([result for result in results if result.query_type == query_type])
+        }
+    return {
+        "captured": side(captured),
+        "replayed": side(results),
+        "qa_verdict_changed": sum(
+            1 for before, after in zip(captured, results)
+            if before.qa_passed is not None and after.qa_passed is not None and before.qa_passed != after.qa_passed
+        ),
+        "by_query_type": by_type
+    }
+
+
+def format_comparison(report: Dict) -> str:
+    lines = [f"{'Query type':<16}{'Requests':>9}{'p50 before':>12}{'p50 after':>11}{'p95 before':>12}{'p95 after':>11}"]
+    rows = [("all", report["comparison"]["captured"], report["comparison"]["replayed"])]
+    rows += [(name, sides["captured"], sides["replayed"]) for name, sides in report["comparison"]["by_query_type"].items()]
+    for name, before, after in rows:
+        lines.append(f"{name:<16}{before['requests']:>9}{before['latency_ms']['p50']:>12.1f}"
+                     f"{after['latency_ms']['p50']:>11.1f}{before['latency_ms']['p95']:>12.1f}{after['latency_ms']['p95']:>11.1f}")
+    lines.append(f"QA verdicts changed: {report['comparison']['qa_verdict_changed']}")
+    return "\n".join(lines)
+
+
+def run(url: str, args) -> Dict:
+    records = list(read_captured(args.capture))
+    if args.limit:
+        records = sorted(records, key=lambda record: record["timestamp"])[:args.limit]
+    client = ChatClient(url, timeout=args.timeout)
+    start = time.perf_counter()
+    results = replay(client, records, speed=args.speed, max_inflight=args.max_inflight)
+    return {
+        "replay": summarize(results, time.perf_counter() - start, mode="replay", speed=args.speed),
+        "comparison": compare(records, results)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay captured /api/chat traffic and compare it with the capture.")
+    parser.add_argument("--capture", default=DEFAULT_CAPTURE_PATH, help="Capture file (rotated backups are included)")
+    parser.add_argument("--url", help="Chatbot base URL; omit to start a local instance with the stub LLM")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay rate multiplier (2 = twice as fast)")
+    parser.add_argument("--limit", type=int, help="Replay only the first N captured requests")
+    parser.add_argument("--max-inflight", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    if args.url:
+        report = run(args.url, args)
+    else:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            with local_chatbot() as url:
+                report = run(url, args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    print(format_comparison(report))